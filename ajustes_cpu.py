@@ -0,0 +1,51 @@
+"""
+Ajustes de CPU - Hilos de torch y afinidad de núcleos para la inferencia
+"""
+import logging
+import os
+
+# psutil es opcional: solo hace falta para fijar la afinidad en Windows
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+def fijar_afinidad(cpus):
+    """Restringe el proceso a los núcleos indicados"""
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    elif psutil is not None:
+        psutil.Process().cpu_affinity(list(cpus))
+    else:
+        logger.warning("No se puede fijar la afinidad de CPU en este sistema sin psutil")
+        return False
+    return True
+
+def aplicar_ajustes_cpu(opciones):
+    """Aplica hilos intra-op/inter-op y afinidad; 0 o lista vacía deja el valor de torch"""
+    import torch
+
+    afinidad = opciones.get('afinidad_cpu') or []
+    intra = opciones.get('hilos_intra', 0)
+    inter = opciones.get('hilos_inter', 0)
+
+    if afinidad and fijar_afinidad(afinidad) and intra <= 0:
+        # Sin un valor explícito, un hilo por núcleo asignado
+        intra = len(afinidad)
+
+    if intra > 0:
+        torch.set_num_threads(intra)
+    if inter > 0 and torch.get_num_interop_threads() != inter:
+        try:
+            torch.set_num_interop_threads(inter)
+        except RuntimeError as e:
+            # Solo se puede cambiar antes del primer trabajo paralelo del proceso
+            logger.warning(f"No se pudieron fijar los hilos inter-op: {e}")
+
+    logger.info(
+        f"Hilos de torch: intra-op {torch.get_num_threads()}, "
+        f"inter-op {torch.get_num_interop_threads()}"
+        + (f", núcleos {afinidad}" if afinidad else "")
+    )
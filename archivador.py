@@ -0,0 +1,226 @@
+"""
+Archivado de grabaciones - Compresión FLAC/Opus en segundo plano y política de retención
+"""
+import hashlib
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+import wave
+from pathlib import Path
+
+from escritor_wav import SUFIJO_DIARIO
+from utils import EXTENSIONES_SALIDA, extensiones_activadas
+
+EXTENSIONES_AUDIO = ('.wav', '.flac', '.opus')
+ESPERA_OCUPADO = 5  # Segundos entre comprobaciones mientras se graba o transcribe
+TAM_BLOQUE = 1 << 16  # Bytes (o tramas del WAV) por lectura al calcular huellas
+
+def _comando_baja_prioridad(comando):
+    """Antepone 'nice' en Unix; en Windows la prioridad se fija al crear el proceso"""
+    if os.name != 'nt' and shutil.which('nice'):
+        return ['nice', '-n', '19'] + comando
+    return comando
+
+def _opciones_prioridad():
+    if os.name == 'nt':
+        return {'creationflags': subprocess.BELOW_NORMAL_PRIORITY_CLASS}
+    return {}
+
+def _ejecutar(comando):
+    """Lanza ffmpeg/ffprobe con baja prioridad y devuelve su salida estándar"""
+    return subprocess.run(
+        _comando_baja_prioridad(comando), capture_output=True, check=True, **_opciones_prioridad()
+    ).stdout
+
+def _huella_pcm(comando_decodificar):
+    """SHA-256 del PCM s16le mono que produce ffmpeg, leído por bloques (grabaciones de horas)"""
+    comando = comando_decodificar + ['-f', 's16le', '-acodec', 'pcm_s16le', '-ac', '1', '-']
+    huella = hashlib.sha256()
+    # Con -v error ffmpeg apenas escribe en stderr: se descarta para no tener que leerlo a la vez
+    with subprocess.Popen(_comando_baja_prioridad(comando), stdout=subprocess.PIPE,
+                          stderr=subprocess.DEVNULL, **_opciones_prioridad()) as proceso:
+        for bloque in iter(lambda: proceso.stdout.read(TAM_BLOQUE), b''):
+            huella.update(bloque)
+    if proceso.returncode != 0:
+        raise subprocess.CalledProcessError(proceso.returncode, comando)
+    return huella.hexdigest()
+
+def _huella_wav(f):
+    """SHA-256 de las tramas de un WAV abierto, leídas por bloques"""
+    huella = hashlib.sha256()
+    for bloque in iter(lambda: f.readframes(TAM_BLOQUE), b''):
+        huella.update(bloque)
+    return huella.hexdigest()
+
+class Archivador:
+    def __init__(self, config, ocupado=None):
+        opciones = config.get('archivado', {})
+        self.activado = opciones.get('activado', False)
+        self.formato = opciones.get('formato', 'flac')
+        self.bitrate_opus = opciones.get('bitrate_opus', '32k')
+        self.conservar_dias = opciones.get('conservar_dias', 0)
+        self.max_gb = opciones.get('max_gb', 0)
+        self.directorio = Path(config['directorio_salida'])
+        self.config = config
+        # Función que indica si hay una grabación o transcripción en curso
+        self.ocupado = ocupado or (lambda: False)
+        # Callback (wav, comprimido) tras sustituir un WAV, p. ej. para actualizar el catálogo
+        self.on_archivado = None
+
+        self._cola = queue.Queue()
+        self._hilo = None
+
+        if self.activado and not shutil.which('ffmpeg'):
+            print("⚠️ Archivado desactivado: no se encontró ffmpeg")
+            self.activado = False
+        if self.formato not in ('flac', 'opus'):
+            print(f"⚠️ Formato de archivado desconocido '{self.formato}'; se usa flac")
+            self.formato = 'flac'
+
+    def iniciar(self):
+        """Arranca el hilo de archivado con las grabaciones ya transcritas que sigan en WAV"""
+        if not self.activado and not (self.conservar_dias or self.max_gb):
+            return
+        self._hilo = threading.Thread(target=self._bucle, name="archivado", daemon=True)
+        self._hilo.start()
+        if self.activado:
+            for ruta in sorted(self.directorio.glob("*.wav")):
+                if self._transcrita(ruta):
+                    self.encolar(str(ruta))
+        else:
+            self._cola.put(None)  # Solo aplicar la retención
+
+    def encolar(self, audio_file):
+        """Programa la compresión de una grabación ya transcrita (no bloquea)"""
+        if self._hilo is not None:
+            self._cola.put(audio_file if self.activado else None)
+
+    def detener(self):
+        """Detiene el hilo al terminar el archivo en curso; los WAV pendientes se retoman al arrancar"""
+        if self._hilo is not None:
+            self._cola.put(False)
+
+    def _bucle(self):
+        """Hilo de baja prioridad: comprime de uno en uno y aplica la retención tras cada archivo"""
+        while True:
+            audio_file = self._cola.get()
+            if audio_file is False:
+                return
+            # Cede la CPU y el disco a la grabación y a la inferencia
+            while self.ocupado():
+                time.sleep(ESPERA_OCUPADO)
+            if audio_file:
+                try:
+                    if self.archivar(Path(audio_file)) is False:
+                        # El WAV aún se está cerrando: se reintenta más tarde
+                        time.sleep(ESPERA_OCUPADO)
+                        self._cola.put(audio_file)
+                        continue
+                except Exception as e:
+                    print(f"⚠️ No se pudo archivar {audio_file}: {e}")
+            try:
+                self.aplicar_retencion()
+            except Exception as e:
+                print(f"⚠️ Error al aplicar la retención: {e}")
+
+    def _transcrita(self, ruta):
+        """Grabación cerrada y con al menos una de las salidas en archivo configuradas"""
+        if Path(f"{ruta}{SUFIJO_DIARIO}").exists():
+            return False  # Todavía grabándose o pendiente de recuperar
+        # Solo portapapeles: cualquier salida que haya quedado de una configuración anterior
+        extensiones = extensiones_activadas(self.config) or EXTENSIONES_SALIDA.values()
+        return any(ruta.with_suffix(ext).exists() for ext in extensiones)
+
+    def archivar(self, ruta):
+        """Comprime el WAV, verifica el resultado y solo entonces borra el original"""
+        if not ruta.exists():
+            return None
+        if Path(f"{ruta}{SUFIJO_DIARIO}").exists():
+            return False
+        destino = ruta.with_suffix(f".{self.formato}")
+        temporal = ruta.with_suffix(f".{self.formato}.part")
+
+        inicio = time.perf_counter()
+        comando = ['ffmpeg', '-nostdin', '-v', 'error', '-y', '-threads', '1', '-i', str(ruta)]
+        if self.formato == 'flac':
+            comando += ['-c:a', 'flac', '-compression_level', '8', '-f', 'flac']
+        else:
+            comando += ['-c:a', 'libopus', '-b:a', self.bitrate_opus, '-f', 'ogg']
+        try:
+            _ejecutar(comando + [str(temporal)])
+            self._verificar(ruta, temporal)
+        except Exception:
+            temporal.unlink(missing_ok=True)
+            raise
+
+        os.replace(temporal, destino)
+        tam_wav = ruta.stat().st_size
+        ruta.unlink()
+        if self.on_archivado:
+            self.on_archivado(ruta, destino)
+        print(
+            f"🗜️ Archivado {destino.name}: {tam_wav / 1024 / 1024:.1f} MB → "
+            f"{destino.stat().st_size / 1024 / 1024:.1f} MB en {time.perf_counter() - inicio:.1f}s"
+        )
+        return destino
+
+    def _verificar(self, ruta_wav, ruta_comprimida):
+        """FLAC: mismo PCM que el WAV. Opus (con pérdidas): misma duración"""
+        with wave.open(str(ruta_wav), 'rb') as f:
+            duracion_wav = f.getnframes() / f.getframerate()
+            if self.formato == 'flac' and f.getnchannels() == 1:
+                original = _huella_wav(f)
+                decodificado = _huella_pcm(['ffmpeg', '-nostdin', '-v', 'error', '-i', str(ruta_comprimida)])
+                if original != decodificado:
+                    raise ValueError("el FLAC no coincide con el WAV")
+                return
+
+        salida = _ejecutar([
+            'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+            '-of', 'default=noprint_wrappers=1:nokey=1', str(ruta_comprimida)
+        ])
+        duracion = float(salida.decode().strip())
+        # Opus añade un pre-roll de unos milisegundos
+        if abs(duracion - duracion_wav) > 0.1:
+            raise ValueError(f"duración {duracion:.2f}s frente a {duracion_wav:.2f}s del WAV")
+
+    def aplicar_retencion(self):
+        """Borra el audio más antiguo que conservar_dias y, si hace falta, hasta bajar de max_gb"""
+        if not (self.conservar_dias or self.max_gb):
+            return
+        audios = []
+        for ruta in self.directorio.iterdir():
+            if ruta.suffix not in EXTENSIONES_AUDIO:
+                continue
+            # Un WAV sin transcribir (en curso, recuperado o en cola) nunca se borra
+            if ruta.suffix == '.wav' and not self._transcrita(ruta):
+                continue
+            estado = ruta.stat()
+            audios.append((estado.st_mtime, estado.st_size, ruta))
+        audios.sort()
+
+        borrar = []
+        if self.conservar_dias:
+            limite = time.time() - self.conservar_dias * 86400
+            borrar = [a for a in audios if a[0] < limite]
+            audios = audios[len(borrar):]
+        if self.max_gb:
+            total = sum(tam for _, tam, _ in audios)
+            maximo = self.max_gb * 1024 ** 3
+            while audios and total > maximo:
+                total -= audios[0][1]
+                borrar.append(audios.pop(0))
+
+        liberados = 0
+        for _, tam, ruta in borrar:
+            try:
+                ruta.unlink()
+                liberados += tam
+            except OSError as e:
+                print(f"⚠️ No se pudo borrar {ruta}: {e}")
+        if borrar:
+            # Las transcripciones (.txt/.json/.srt) se conservan
+            print(f"🧹 Retención: {len(borrar)} grabaciones borradas ({liberados / 1024 / 1024:.0f} MB)")
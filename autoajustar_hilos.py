@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Autoajuste de hilos - Busca el número de hilos intra-op más rápido para esta máquina
+
+Uso:
+    python autoajustar_hilos.py grabaciones/ejemplo.wav
+    python autoajustar_hilos.py grabaciones/ejemplo.wav --hilos 1 2 4 6 --no-guardar
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+from ajustes_cpu import aplicar_ajustes_cpu
+from cuantizacion import cargar_modelo_whisper
+from perfiles_decodificacion import parametros_decodificacion
+from utils import cargar_configuracion
+
+RUTA_CONFIG = "config.json"
+
+def candidatos_por_defecto():
+    """Potencias de dos hasta el número de núcleos disponibles, incluido este"""
+    if hasattr(os, 'sched_getaffinity'):
+        nucleos = len(os.sched_getaffinity(0))
+    else:
+        nucleos = os.cpu_count() or 1
+    candidatos = []
+    n = 1
+    while n < nucleos:
+        candidatos.append(n)
+        n *= 2
+    candidatos.append(nucleos)
+    return candidatos
+
+def medir(modelo, audio, hilos, repeticiones, parametros):
+    """Mejor tiempo de transcripción del clip con el número de hilos dado"""
+    import torch
+
+    torch.set_num_threads(hilos)
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        modelo.transcribe(audio, **parametros)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+def guardar_hilos(hilos, ruta=RUTA_CONFIG):
+    """Escribe rendimiento_cpu.hilos_intra en config.json sin volcar los valores por defecto"""
+    with open(ruta, 'r', encoding='utf-8') as f:
+        texto = f.read()
+    # Si la clave ya está, solo se cambia el número: el resto del archivo conserva su formato
+    nuevo, cambios = re.subn(r'("hilos_intra"\s*:\s*)-?\d+', rf'\g<1>{hilos}', texto)
+    if cambios != 1 or json.loads(nuevo).get('rendimiento_cpu', {}).get('hilos_intra') != hilos:
+        config = json.loads(texto)
+        config.setdefault('rendimiento_cpu', {})['hilos_intra'] = hilos
+        # Misma sangría que config.json y utils
+        nuevo = json.dumps(config, indent=4, ensure_ascii=False)
+    temporal = ruta + ".tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write(nuevo)
+    os.replace(temporal, ruta)
+
+def main():
+    """Barre los candidatos sobre un clip de referencia y guarda el más rápido"""
+    parser = argparse.ArgumentParser(description="Ajusta los hilos de torch para la transcripción")
+    parser.add_argument("clip", help="Audio de referencia (10-30 s es suficiente)")
+    parser.add_argument("--hilos", type=int, nargs="+", help="Candidatos a probar")
+    parser.add_argument("--repeticiones", type=int, default=2, help="Medidas por candidato")
+    parser.add_argument("--no-guardar", action="store_true", help="Solo mostrar el resultado")
+    args = parser.parse_args()
+
+    import whisper
+
+    config = cargar_configuracion()
+    # Afinidad e inter-op de la configuración: solo se barre intra-op
+    opciones = {**config.get('rendimiento_cpu', {}), 'hilos_intra': 0}
+    aplicar_ajustes_cpu(opciones)
+    modelo = cargar_modelo_whisper(config['whisper_model'], config.get('whisper_quantization', 'none'))
+    audio = whisper.load_audio(args.clip)
+    duracion = len(audio) / whisper.audio.SAMPLE_RATE
+
+    # Se mide con el perfil de decodificación configurado, el que se usa al transcribir
+    parametros = parametros_decodificacion(config)
+    # Primera pasada descartada: reserva de memoria y caches en frío
+    modelo.transcribe(audio, **parametros)
+
+    candidatos = args.hilos or candidatos_por_defecto()
+    print(f"🔄 Modelo '{config['whisper_model']}', clip de {duracion:.1f}s, candidatos {candidatos}")
+    resultados = {}
+    for hilos in candidatos:
+        resultados[hilos] = medir(modelo, audio, hilos, args.repeticiones, parametros)
+        print(f"   {hilos:>3} hilos: {resultados[hilos]:.2f}s (RTF {resultados[hilos] / duracion:.3f})")
+
+    mejor = min(resultados, key=resultados.get)
+    print(f"\n✅ Más rápido: {mejor} hilos")
+    if not args.no_guardar:
+        guardar_hilos(mejor)
+        print(f"💾 Guardado en {RUTA_CONFIG} (rendimiento_cpu.hilos_intra = {mejor})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Latencia por etapa del flujo grabación → texto, sin micrófono ni interfaz
+
+Uso:
+    python benchmark.py --simulado                        # solo el coste fuera de la inferencia
+    python benchmark.py --duraciones 5 30 120 --json resultados.json
+    python benchmark.py --audio grabaciones/ejemplo.wav --modelo base
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from archivador import Archivador
+from controlador import ControladorPrincipal
+from despachador import Despachador, MaquinaEstados, DETENIENDO
+from evaluacion import memoria_pico_mb
+from grabador import Grabador
+from metricas import Metricas
+from planificador import PlanificadorTrabajos
+from procesamiento_audio import FS_WHISPER, duracion_audio, remuestrear
+from salidas import CanalSalidas
+from transcriptor import Transcriptor
+from utils import cargar_configuracion, guardar_transcripcion
+
+DURACIONES = (5, 30, 120)
+FRAMES_POR_BLOQUE = 1024  # Tamaño típico de bloque de PortAudio
+ARCHIVOS_CAPTURA = ("grabador.py", "buffer_audio.py")
+
+def audio_sintetico(segundos, fs, semilla=0):
+    """Tramos de 'voz' (armónicos modulados) separados por silencios, int16 mono"""
+    rng = np.random.default_rng(semilla)
+    t = np.arange(int(segundos * fs)) / fs
+    voz = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((140, 280, 420, 910)))
+    voz *= 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)  # Sílabas
+    voz[(t % 2.0) >= 1.5] = 0  # Medio segundo de silencio cada dos
+    audio = 0.3 * voz / np.max(np.abs(voz)) + 0.003 * rng.standard_normal(len(t))
+    return (audio * 32767).astype(np.int16).reshape(-1, 1)
+
+def audio_de_referencia(ruta, segundos, fs):
+    """WAV mono de 16 bits repetido o recortado hasta la duración pedida"""
+    with wave.open(ruta, 'rb') as f:
+        datos = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+        datos = datos.reshape(-1, f.getnchannels())[:, 0]
+        fs_origen = f.getframerate()
+    if fs_origen != fs:
+        datos = (remuestrear(datos, fs_origen, fs) * 32767).astype(np.int16)
+    n = int(segundos * fs)
+    return np.resize(datos, n).reshape(-1, 1)
+
+class ModeloSimulado:
+    """Sustituye a Whisper: segmentos de texto fijo tras un tiempo proporcional al audio"""
+    def __init__(self, rtf=0.0):
+        self.rtf = rtf
+
+    def transcribe(self, audio, **parametros):
+        duracion = duracion_audio(audio)
+        if self.rtf > 0:
+            time.sleep(duracion * self.rtf)
+        segmentos = [
+            {'id': i, 'start': float(inicio), 'end': float(min(inicio + 5, duracion)),
+             'text': f" Segmento simulado {i}."}
+            for i, inicio in enumerate(np.arange(0, duracion, 5))
+        ]
+        return {
+            'text': "".join(s['text'] for s in segmentos),
+            'segments': segmentos,
+            'language': parametros.get('language', 'es')
+        }
+
+class TranscriptorSimulado(Transcriptor):
+    """Transcriptor real (VAD, caché, bloqueo, métricas) con el modelo simulado"""
+    def _cargar_modelo(self, relanzar=True):
+        self.model = ModeloSimulado()
+        self._modelo_listo.set()
+
+class GrabadorSimulado(Grabador):
+    """Grabador real que recibe el audio sintético por audio_callback en vez del micrófono"""
+    def __init__(self, config, audio):
+        super().__init__(config)
+        self.audio_entrada = audio
+        self.alimentado = threading.Event()
+
+    def iniciar_grabacion(self):
+        """Entrega el audio en bloques como lo haría PortAudio y espera a la parada"""
+        for inicio in range(0, len(self.audio_entrada), FRAMES_POR_BLOQUE):
+            bloque = self.audio_entrada[inicio:inicio + FRAMES_POR_BLOQUE]
+            self.audio_callback(bloque, len(bloque), None, None)
+        self.alimentado.set()
+        self._detenido.wait()
+
+class _InterfazNula:
+    """Indicador visual vacío que anota cuánto tarda en llegarle cada cambio de estado"""
+    def __init__(self):
+        self.retrasos = []
+
+    def set_estado(self, estado, marca=None):
+        if marca is not None:
+            self.retrasos.append(time.perf_counter() - marca)
+
+    def actualizar_tiempo(self, mensaje):
+        pass
+
+class ControladorSinInterfaz(ControladorPrincipal):
+    """Controlador con grabador, cola y transcriptor reales, sin teclado ni ventana"""
+    def __init__(self, config, transcriptor, audio):
+        self.config = config
+        self.estado = MaquinaEstados(on_cambio=self._on_cambio_estado)
+        self.despachador = Despachador(0)  # Sin antirrebote: las pulsaciones son del benchmark
+        self.despachador.registrar('alternar', self.alternar_grabacion, antirrebote=True)
+        self.despachador.registrar('trabajo_terminado', self._trabajo_terminado)
+        self._dictados = set()
+        self._atajo_recibido = None
+        self.hilo_grabacion = None
+        self.sesion_streaming = None
+        self.timer_notificacion = None
+        self.tiempo_inicio_grabacion = None
+        self.grabador = GrabadorSimulado(config, audio)
+        self.transcriptor = transcriptor
+        self.interfaz = _InterfazNula()
+        self.metricas = Metricas(config)
+        self.archivador = Archivador(config)  # Sin iniciar: no comprime ni borra nada
+        self.catalogo = None
+        self.salidas = CanalSalidas(config, self.metricas)
+        self.planificador = PlanificadorTrabajos(
+            self._procesar_trabajo,
+            Path(config['directorio_salida']) / "cola_trabajos.json"
+        )
+        self.terminado = threading.Event()
+        self.parado = threading.Event()
+        self.fin_parada = None
+
+    def _on_cambio_estado(self, anterior, nuevo, marca):
+        super()._on_cambio_estado(anterior, nuevo, marca)
+        if anterior == DETENIENDO:
+            self.fin_parada = marca
+            self.parado.set()
+
+    def _procesar_trabajo(self, trabajo, datos):
+        try:
+            super()._procesar_trabajo(trabajo, datos)
+        finally:
+            self.terminado.set()
+
+def _percentiles_us(tiempos):
+    """Mediana, p99 y máximo en microsegundos"""
+    ordenados = sorted(tiempos)
+    p99 = ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.99))]
+    return {
+        'p50_us': round(statistics.median(ordenados) * 1e6, 1),
+        'p99_us': round(p99 * 1e6, 1),
+        'max_us': round(ordenados[-1] * 1e6, 1)
+    }
+
+def medir_captura(config, audio, nombre):
+    """Tiempo por callback y, en una segunda pasada, memoria reservada dentro del callback"""
+    grabador = Grabador(config)
+    grabador.start_recording(f"{nombre}-captura.wav")
+    tiempos = []
+    for inicio in range(0, len(audio), FRAMES_POR_BLOQUE):
+        bloque = audio[inicio:inicio + FRAMES_POR_BLOQUE]
+        t0 = time.perf_counter()
+        grabador.audio_callback(bloque, len(bloque), None, None)
+        tiempos.append(time.perf_counter() - t0)
+    grabador.stop_recording()
+
+    # tracemalloc ralentiza el callback: se mide aparte. Solo cuentan las reservas hechas
+    # desde el código de captura, no las del hilo que vuelca el WAV
+    grabador = Grabador(config)
+    grabador.start_recording(f"{nombre}-memoria.wav")
+    filtros = [tracemalloc.Filter(True, f"*{archivo}") for archivo in ARCHIVOS_CAPTURA]
+    tracemalloc.start()
+    antes = tracemalloc.take_snapshot().filter_traces(filtros)
+    for inicio in range(0, len(audio), FRAMES_POR_BLOQUE):
+        bloque = audio[inicio:inicio + FRAMES_POR_BLOQUE]
+        grabador.audio_callback(bloque, len(bloque), None, None)
+    despues = tracemalloc.take_snapshot().filter_traces(filtros)
+    tracemalloc.stop()
+    grabador.stop_recording()
+
+    diferencias = [d for d in despues.compare_to(antes, 'lineno') if d.size_diff > 0]
+    return {
+        'callbacks': len(tiempos),
+        **_percentiles_us(tiempos),
+        'asignaciones': sum(d.count_diff for d in diferencias),
+        'asignaciones_kb': round(sum(d.size_diff for d in diferencias) / 1024, 1)
+    }
+
+def medir_etapas(config, transcriptor, audio, nombre):
+    """Parada, preparación del audio, inferencia y salidas, cada una por separado"""
+    grabador = Grabador(config)
+    grabador.start_recording(f"{nombre}.wav")
+    for inicio in range(0, len(audio), FRAMES_POR_BLOQUE):
+        bloque = audio[inicio:inicio + FRAMES_POR_BLOQUE]
+        grabador.audio_callback(bloque, len(bloque), None, None)
+
+    etapas = {}
+    t0 = time.perf_counter()
+    grabador.detener_captura()
+    audio_whisper = grabador.audio_para_whisper()
+    etapas['preparar_audio'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    ruta = grabador.stop_recording()
+    etapas['cerrar_wav'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    texto = transcriptor.transcribir_audio(audio_whisper)
+    etapas['transcribir'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    guardar_transcripcion(
+        texto, ruta, config, transcriptor.ultimos_metadatos, transcriptor.ultimos_segmentos
+    )
+    etapas['guardar_salidas'] = time.perf_counter() - t0
+    return etapas
+
+def medir_flujo(config, transcriptor, audio):
+    """Latencias del atajo a la captura y de la parada al texto, por el despachador y la cola"""
+    controlador = ControladorSinInterfaz(config, transcriptor, audio)
+    controlador.planificador.iniciar()
+    controlador.despachador.iniciar()
+    try:
+        t0 = time.perf_counter()
+        controlador.grabar_y_transcribir()
+        controlador.grabador.alimentado.wait()
+        atajo_a_captura = controlador.grabador.primer_bloque - t0
+        t0 = time.perf_counter()
+        controlador.grabar_y_transcribir()
+        controlador.parado.wait()
+        parada = controlador.fin_parada - t0
+        controlador.terminado.wait()
+        total = time.perf_counter() - t0
+    finally:
+        controlador.despachador.detener()
+        controlador.planificador.detener()
+        controlador.salidas.detener()
+    return {
+        'atajo_a_captura': atajo_a_captura,
+        'estado_a_indicador': max(controlador.interfaz.retrasos),
+        'parada': parada,
+        'parada_a_texto': total
+    }
+
+def _mediana(medidas, clave):
+    """Mediana de una clave a lo largo de las repeticiones, en segundos"""
+    return round(statistics.median(m[clave] for m in medidas), 4)
+
+def commit_actual():
+    """Hash del commit en curso para comparar resultados entre versiones"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def configuracion_benchmark(args, directorio):
+    """Configuración del usuario con salidas a un directorio temporal y sin efectos externos"""
+    config = cargar_configuracion()
+    config.update({
+        'directorio_salida': directorio,
+        'notificar_cada_minutos': 0,
+        'formatos_salida': {
+            'clipboard': False,  # No pisar el portapapeles del usuario
+            'txt_file': True,
+            'json_with_metadata': True,
+            'srt_subtitles': True,
+            'vtt_subtitles': True
+        },
+        # Sin caché: las repeticiones acertarían y no medirían la inferencia
+        'cache_transcripciones': {**config['cache_transcripciones'], 'activado': False},
+        'cascada_modelos': {**config['cascada_modelos'], 'activado': False},
+        'transcripcion_streaming': {**config['transcripcion_streaming'], 'activado': False},
+        'gestion_memoria': {'descargar_tras_minutos': 0, 'umbral_memoria_libre_mb': 0},
+        'metricas': {'activado': False}  # No mezclar con las métricas de uso real
+    })
+    if args.modelo:
+        config['whisper_model'] = args.modelo
+    if args.fs:
+        config['frecuencia_muestreo'] = args.fs
+    return config
+
+def main():
+    """Ejecuta el benchmark para cada duración y guarda el resultado en JSON"""
+    parser = argparse.ArgumentParser(description="Mide la latencia del flujo de grabación y transcripción")
+    parser.add_argument("--duraciones", type=float, nargs="+", default=DURACIONES,
+                        help="Duraciones del audio en segundos")
+    parser.add_argument("--audio", help="WAV de referencia (por defecto, audio sintético)")
+    parser.add_argument("--modelo", help="Modelo Whisper (por defecto, el de config.json)")
+    parser.add_argument("--fs", type=int, help="Frecuencia de captura (por defecto, la de config.json)")
+    parser.add_argument("--simulado", action="store_true",
+                        help="Usar un modelo simulado para medir solo el resto del flujo")
+    parser.add_argument("--rtf-simulado", type=float, default=0.0,
+                        help="Factor de tiempo real del modelo simulado")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Repeticiones por duración")
+    parser.add_argument("--json", default="benchmark.json", help="Archivo de resultados")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as directorio:
+        config = configuracion_benchmark(args, directorio)
+        fs = config['frecuencia_muestreo']
+
+        t0 = time.perf_counter()
+        if args.simulado:
+            transcriptor = TranscriptorSimulado(config)
+            transcriptor.model.rtf = args.rtf_simulado
+        else:
+            transcriptor = Transcriptor(config)
+        carga = time.perf_counter() - t0
+
+        resultados = []
+        for segundos in args.duraciones:
+            print(f"🔄 Audio de {segundos:g}s ({args.repeticiones} repeticiones)...")
+            if args.audio:
+                audio = audio_de_referencia(args.audio, segundos, fs)
+            else:
+                audio = audio_sintetico(segundos, fs)
+
+            capturas, etapas, flujos = [], [], []
+            for rep in range(args.repeticiones):
+                nombre = f"{segundos:g}s-{rep}"
+                capturas.append(medir_captura(config, audio, nombre))
+                etapas.append(medir_etapas(config, transcriptor, audio, nombre))
+                flujos.append(medir_flujo(config, transcriptor, audio))
+
+            transcribir = _mediana(etapas, 'transcribir')
+            resultados.append({
+                'duracion_segundos': segundos,
+                'captura': capturas[-1],
+                'etapas': {clave: _mediana(etapas, clave) for clave in etapas[0]},
+                'rtf': round(transcribir / segundos, 4),
+                'flujo_controlador': {clave: _mediana(flujos, clave) for clave in flujos[0]},
+                'rss_pico_mb': round(memoria_pico_mb() or 0, 1)
+            })
+        transcriptor.liberar_modelo()
+
+    informe = {
+        'fecha': datetime.now().isoformat(),
+        'commit': commit_actual(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'modelo': 'simulado' if args.simulado else config['whisper_model'],
+        'cuantizacion': config.get('whisper_quantization', 'none'),
+        'frecuencia_muestreo': fs,
+        'fs_whisper': FS_WHISPER,
+        'audio': args.audio or 'sintetico',
+        'repeticiones': args.repeticiones,
+        'carga_modelo_segundos': round(carga, 3),
+        'resultados': resultados
+    }
+    with open(args.json, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+
+    print(f"\n📊 Modelo '{informe['modelo']}', captura a {fs} Hz")
+    print(f"{'audio':>8}{'callback p99':>14}{'asign.':>8}{'preparar':>10}{'wav':>8}"
+          f"{'transcribir':>13}{'salidas':>9}{'RTF':>8}{'parada→texto':>14}{'RSS MB':>9}")
+    for r in resultados:
+        e = r['etapas']
+        print(f"{r['duracion_segundos']:>7g}s{r['captura']['p99_us']:>12.0f}µs"
+              f"{r['captura']['asignaciones']:>8}{e['preparar_audio']:>9.3f}s{e['cerrar_wav']:>7.3f}s"
+              f"{e['transcribir']:>12.3f}s{e['guardar_salidas']:>8.3f}s{r['rtf']:>8.3f}"
+              f"{r['flujo_controlador']['parada_a_texto']:>13.3f}s{r['rss_pico_mb']:>9}")
+    print(f"\n💾 Resultados en {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Almacén de audio - Bloques int16 preasignados para la captura sin copias por callback
+"""
+import numpy as np
+
+class BufferAudio:
+    def __init__(self, fs, canales=1, segundos_por_bloque=60):
+        self.fs = fs
+        self.canales = canales
+        self.muestras_por_bloque = int(fs * segundos_por_bloque)
+        self._bloques = []
+        self.muestras = 0  # Muestras completas disponibles para los lectores
+        self._bloque(0)  # Reservar fuera del hilo de audio
+
+    def _bloque(self, indice):
+        """Devuelve el bloque indicado, reservándolo si todavía no existe"""
+        if indice == len(self._bloques):
+            # Una reserva por bloque (~1 minuto de audio), nunca por callback
+            self._bloques.append(
+                np.empty((self.muestras_por_bloque, self.canales), dtype=np.int16)
+            )
+        return self._bloques[indice]
+
+    def escribir(self, datos):
+        """Copia un bloque de captura (frames x canales) al final del buffer"""
+        total = len(datos)
+        escritas = 0
+        posicion = self.muestras
+        while escritas < total:
+            indice, desplazamiento = divmod(posicion, self.muestras_por_bloque)
+            n = min(total - escritas, self.muestras_por_bloque - desplazamiento)
+            self._bloque(indice)[desplazamiento:desplazamiento + n] = datos[escritas:escritas + n]
+            escritas += n
+            posicion += n
+        # Publicar el nuevo total solo cuando los datos ya están copiados
+        self.muestras = posicion
+
+    def iterar(self, desde=0, hasta=None):
+        """Recorre el rango [desde, hasta) como vistas sin copia de cada bloque"""
+        hasta = self.muestras if hasta is None else min(hasta, self.muestras)
+        posicion = desde
+        while posicion < hasta:
+            indice, desplazamiento = divmod(posicion, self.muestras_por_bloque)
+            n = min(hasta - posicion, self.muestras_por_bloque - desplazamiento)
+            yield self._bloques[indice][desplazamiento:desplazamiento + n]
+            posicion += n
+
+    def leer(self, desde=0, hasta=None):
+        """Devuelve el rango como un único array (vista si cae en un solo bloque)"""
+        vistas = list(self.iterar(desde, hasta))
+        if not vistas:
+            return np.zeros((0, self.canales), dtype=np.int16)
+        if len(vistas) == 1:
+            return vistas[0]
+        return np.concatenate(vistas, axis=0)
+
+    def duracion(self):
+        """Duración del audio almacenado en segundos"""
+        return self.muestras / self.fs
+
+    def __len__(self):
+        return self.muestras
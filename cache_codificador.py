@@ -0,0 +1,102 @@
+"""
+Caché del codificador - Salida del codificador de Whisper por ventana, compartida entre reintentos
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+class CacheCodificador:
+    """Calcula el codificador una vez por ventana de 30 s; los reintentos solo repiten el decodificador
+
+    model.transcribe vuelve a decodificar una ventana a más temperatura cuando el resultado no
+    pasa los umbrales, y transcribir_audio repite la transcripción entera si falla. En ambos casos
+    whisper pasaría otra vez el mismo mel por el codificador. Las ventanas se identifican por el
+    contenido del mel, así que también se reconocen en una segunda llamada a transcribe.
+    """
+    def __init__(self, max_ventanas=16):
+        self.max_ventanas = max_ventanas
+        self._salidas = OrderedDict()  # huella del mel -> salida del codificador (LRU)
+        self._decodificaciones = {}  # huella -> veces que se ha decodificado la ventana
+        self._modelo = None
+        self.reiniciar_estadisticas()
+
+    def reiniciar_estadisticas(self):
+        self.ventanas = 0
+        self.reutilizadas = 0
+        self.decodificaciones = 0
+        self.reintentos = 0
+        self.segundos_codificador = 0.0
+        self.segundos_decodificador = 0.0
+        self.segundos_reintentos = 0.0
+
+    def vaciar(self):
+        """Libera las salidas guardadas y la referencia al modelo (al terminar cada trabajo)"""
+        self._salidas.clear()
+        self._decodificaciones.clear()
+        self._modelo = None
+
+    @contextmanager
+    def envolver(self, modelo):
+        """Durante el bloque, model.decode pasa por la caché; usar con el modelo bloqueado"""
+        if modelo is not self._modelo:
+            self.vaciar()  # Las salidas de otro modelo no sirven
+            self._modelo = modelo
+        modelo.decode = lambda mel, opciones=None, **kwargs: self._decodificar(
+            modelo, mel, opciones, **kwargs
+        )
+        try:
+            yield self
+        finally:
+            del modelo.decode  # Vuelve al método de la clase
+
+    def _decodificar(self, modelo, mel, opciones=None, **kwargs):
+        """Como whisper.decoding.decode, pero con la salida del codificador guardada"""
+        import torch
+        from whisper.decoding import DecodingOptions, decode
+
+        opciones = opciones or DecodingOptions()
+        lote = mel.unsqueeze(0) if mel.ndim == 2 else mel
+        if lote.shape[-2:] == (modelo.dims.n_audio_ctx, modelo.dims.n_audio_state):
+            return decode(modelo, mel, opciones, **kwargs)  # Ya es la salida del codificador
+
+        # Hashear el mel de una ventana (80x3000) cuesta ~1 ms; el codificador, cientos
+        huella = (opciones.fp16, hashlib.blake2b(lote.detach().cpu().numpy().tobytes(),
+                                                 digest_size=16).digest())
+        salida = self._salidas.get(huella)
+        if salida is None:
+            inicio = time.perf_counter()
+            with torch.no_grad():
+                salida = modelo.encoder(lote.half() if opciones.fp16 else lote)
+            self.segundos_codificador += time.perf_counter() - inicio
+            self.ventanas += 1
+            self._salidas[huella] = salida
+            if len(self._salidas) > self.max_ventanas:
+                antigua, _ = self._salidas.popitem(last=False)
+                self._decodificaciones.pop(antigua, None)
+        else:
+            self._salidas.move_to_end(huella)
+            self.reutilizadas += 1
+
+        reintento = huella in self._decodificaciones
+        self._decodificaciones[huella] = self._decodificaciones.get(huella, 0) + 1
+        inicio = time.perf_counter()
+        resultado = decode(modelo, salida[0] if mel.ndim == 2 else salida, opciones, **kwargs)
+        segundos = time.perf_counter() - inicio
+        self.decodificaciones += 1
+        self.segundos_decodificador += segundos
+        if reintento:
+            self.reintentos += 1
+            self.segundos_reintentos += segundos
+        return resultado
+
+    def resumen(self):
+        """Tiempos del codificador, del decodificador y de los reintentos, para ultimos_metadatos"""
+        return {
+            'ventanas_codificadas': self.ventanas,
+            'ventanas_reutilizadas': self.reutilizadas,
+            'codificador_segundos': round(self.segundos_codificador, 3),
+            'decodificador_segundos': round(self.segundos_decodificador, 3),
+            'reintentos_decodificacion': self.reintentos,
+            'reintentos_segundos': round(self.segundos_reintentos, 3)
+        }
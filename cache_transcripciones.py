@@ -0,0 +1,141 @@
+"""
+Caché de transcripciones - Resultados de Whisper indexados por el contenido del audio
+"""
+import hashlib
+import json
+import os
+import threading
+import wave
+from collections import OrderedDict
+from pathlib import Path
+
+TAM_LECTURA = 1 << 20  # Bytes leídos por iteración al calcular la huella de un archivo
+
+def _actualizar_huella(huella, audio):
+    """Añade a la huella el PCM de un array o de un archivo de audio"""
+    if isinstance(audio, str):
+        try:
+            # Solo el PCM: dos WAV con el mismo audio y distinta cabecera comparten entrada
+            with wave.open(audio, 'rb') as f:
+                huella.update(f"wav:{f.getframerate()}:{f.getnchannels()}:{f.getsampwidth()}".encode())
+                while True:
+                    datos = f.readframes(TAM_LECTURA)
+                    if not datos:
+                        break
+                    huella.update(datos)
+            return
+        except (wave.Error, EOFError):
+            pass
+        # Otros formatos: se usa el contenido del archivo completo
+        with open(audio, 'rb') as f:
+            while True:
+                datos = f.read(TAM_LECTURA)
+                if not datos:
+                    break
+                huella.update(datos)
+    else:
+        huella.update(f"array:{audio.dtype}:{audio.shape}".encode())
+        huella.update(audio if audio.flags.c_contiguous else audio.copy())
+
+def _a_json(valor):
+    """Convierte escalares de numpy/torch a tipos nativos al serializar"""
+    if hasattr(valor, 'item'):
+        return valor.item()
+    if hasattr(valor, 'tolist'):
+        return valor.tolist()
+    return str(valor)
+
+class CacheTranscripciones:
+    def __init__(self, directorio, max_mb=200):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+        self._indice = OrderedDict()  # clave -> tamaño en bytes, del menos al más reciente
+        self._total_bytes = 0
+        self._cargar_indice()
+
+    def _cargar_indice(self):
+        """Reconstruye el orden LRU a partir de la fecha de modificación de cada entrada"""
+        entradas = []
+        for ruta in self.directorio.glob("*.json"):
+            estado = ruta.stat()
+            entradas.append((estado.st_mtime, ruta.stem, estado.st_size))
+        for _, clave, tam in sorted(entradas):
+            self._indice[clave] = tam
+            self._total_bytes += tam
+
+    def _ruta(self, clave):
+        return self.directorio / f"{clave}.json"
+
+    @staticmethod
+    def calcular_clave(audio, modelo, parametros):
+        """Huella SHA-256 del PCM, el modelo y los parámetros de decodificación"""
+        huella = hashlib.sha256()
+        _actualizar_huella(huella, audio)
+        huella.update(modelo.encode())
+        huella.update(json.dumps(parametros, sort_keys=True, default=_a_json).encode())
+        return huella.hexdigest()
+
+    def obtener(self, clave):
+        """Devuelve el resultado guardado o None, y actualiza los contadores"""
+        with self._lock:
+            if clave not in self._indice:
+                self.fallos += 1
+                return None
+            self._indice.move_to_end(clave)
+
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                resultado = json.load(f)
+            os.utime(ruta)  # Persistir el orden LRU entre sesiones
+        except Exception:
+            with self._lock:
+                self._olvidar(clave)
+                self.fallos += 1
+            return None
+
+        with self._lock:
+            self.aciertos += 1
+        return resultado
+
+    def guardar(self, clave, resultado):
+        """Guarda el resultado completo y expulsa las entradas menos usadas si se supera el límite"""
+        ruta = self._ruta(clave)
+        try:
+            temporal = ruta.with_suffix('.tmp')
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(resultado, f, ensure_ascii=False, default=_a_json)
+            os.replace(temporal, ruta)
+        except Exception as e:
+            print(f"⚠️ Error al guardar en la caché: {e}")
+            return
+
+        with self._lock:
+            self._olvidar(clave)
+            self._indice[clave] = ruta.stat().st_size
+            self._total_bytes += self._indice[clave]
+            while self._total_bytes > self.max_bytes and len(self._indice) > 1:
+                antigua = next(iter(self._indice))
+                self._olvidar(antigua)
+                self._ruta(antigua).unlink(missing_ok=True)
+
+    def _olvidar(self, clave):
+        """Quita una entrada del índice (con el lock adquirido)"""
+        tam = self._indice.pop(clave, None)
+        if tam is not None:
+            self._total_bytes -= tam
+
+    def estadisticas(self):
+        """Contadores de aciertos/fallos y ocupación actual"""
+        with self._lock:
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'entradas': len(self._indice),
+                'mb': round(self._total_bytes / 1024 / 1024, 2)
+            }
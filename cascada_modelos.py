@@ -0,0 +1,55 @@
+"""
+Cascada de modelos - Elige el modelo Whisper de cada trabajo según su duración y la latencia objetivo
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Factor de tiempo real aproximado en CPU (segundos de cómputo por segundo de audio)
+RTF_INICIAL = {
+    "tiny": 0.05,
+    "base": 0.1,
+    "small": 0.3,
+    "medium": 0.9,
+    "large": 2.0
+}
+
+PESO_MEDICION = 0.3  # Peso de cada nueva medición en la media móvil del RTF
+
+class PoliticaCascada:
+    def __init__(self, config):
+        opciones = config.get('cascada_modelos', {})
+        self.activado = opciones.get('activado', False)
+        # Ordenados del más rápido al más preciso; sin lista, solo el modelo principal
+        self.modelos = opciones.get('modelos', ["tiny", "base", "small"])
+        if not self.modelos:
+            self.modelos = [config.get('whisper_model', 'base')]
+        self.latencia_objetivo = opciones.get('latencia_objetivo_segundos', 5)
+        self.mantener_cargados = opciones.get('mantener_cargados', True)
+        self.borrador_rapido = opciones.get('borrador_rapido', False)
+        self.modelo_borrador = opciones.get('modelo_borrador', self.modelos[0])
+        self.rtf = {**RTF_INICIAL, **opciones.get('rtf_estimado', {})}
+
+    def elegir(self, duracion):
+        """El modelo más preciso cuya latencia estimada cabe en el objetivo (o el más rápido)"""
+        elegido = self.modelos[0]
+        for modelo in self.modelos:
+            if duracion * self.rtf.get(modelo, 1.0) <= self.latencia_objetivo:
+                elegido = modelo
+        logger.info(
+            f"Cascada: {duracion:.1f}s de audio → '{elegido}' "
+            f"(estimado {duracion * self.rtf.get(elegido, 1.0):.1f}s, objetivo {self.latencia_objetivo}s)"
+        )
+        return elegido
+
+    def registrar(self, modelo, duracion, segundos):
+        """Ajusta el RTF estimado del modelo con el tiempo medido"""
+        if duracion < 1:
+            return  # Audios muy cortos: domina el coste fijo y distorsionan la estimación
+        medido = segundos / duracion
+        anterior = self.rtf.get(modelo, medido)
+        self.rtf[modelo] = (1 - PESO_MEDICION) * anterior + PESO_MEDICION * medido
+
+    def usar_borrador(self, modelo):
+        """Indica si conviene adelantar un borrador rápido antes del resultado final"""
+        return self.activado and self.borrador_rapido and modelo != self.modelo_borrador
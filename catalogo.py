@@ -0,0 +1,257 @@
+"""
+Catálogo de grabaciones - Índice SQLite con búsqueda de texto completo (FTS5) de las transcripciones
+"""
+import json
+import sqlite3
+import threading
+import wave
+from datetime import datetime
+from pathlib import Path
+
+from utils import EXTENSIONES_SALIDA
+
+EXTENSIONES_AUDIO = ('.wav', '.flac', '.opus')
+# Columna con la ruta de cada archivo de salida: .txt -> txt_file, .vtt -> vtt_file...
+COLUMNAS_SALIDA = {ext: f"{ext[1:]}_file" for ext in EXTENSIONES_SALIDA.values()}
+FORMATO_NOMBRE = "%Y-%m-%d_%H-%M-%S"  # Nombre de las grabaciones del controlador
+# Archivos propios de la aplicación que viven junto a las grabaciones y no son transcripciones
+ARCHIVOS_INTERNOS = ('cola_trabajos', 'cola_demonio', 'lote_checkpoint', 'metricas')
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS grabaciones (
+    id INTEGER PRIMARY KEY,
+    clave TEXT NOT NULL UNIQUE,
+    nombre TEXT NOT NULL,
+    fecha TEXT,
+    audio_file TEXT,
+    txt_file TEXT,
+    json_file TEXT,
+    srt_file TEXT,
+    vtt_file TEXT,
+    duracion_audio REAL,
+    modelo TEXT,
+    segundos REAL,
+    rtf REAL,
+    texto TEXT NOT NULL,
+    actualizado TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_grabaciones_fecha ON grabaciones(fecha);
+
+-- Índice de texto externo: el texto vive solo en la tabla grabaciones
+CREATE VIRTUAL TABLE IF NOT EXISTS transcripciones_fts USING fts5(
+    texto, content='grabaciones', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS grabaciones_ai AFTER INSERT ON grabaciones BEGIN
+    INSERT INTO transcripciones_fts(rowid, texto) VALUES (new.id, new.texto);
+END;
+CREATE TRIGGER IF NOT EXISTS grabaciones_ad AFTER DELETE ON grabaciones BEGIN
+    INSERT INTO transcripciones_fts(transcripciones_fts, rowid, texto) VALUES ('delete', old.id, old.texto);
+END;
+CREATE TRIGGER IF NOT EXISTS grabaciones_au AFTER UPDATE OF texto ON grabaciones BEGIN
+    INSERT INTO transcripciones_fts(transcripciones_fts, rowid, texto) VALUES ('delete', old.id, old.texto);
+    INSERT INTO transcripciones_fts(rowid, texto) VALUES (new.id, new.texto);
+END;
+"""
+
+COLUMNAS = ('clave', 'nombre', 'fecha', 'audio_file', *COLUMNAS_SALIDA.values(),
+            'duracion_audio', 'modelo', 'segundos', 'rtf', 'texto', 'actualizado')
+
+INSERTAR = f"""
+INSERT INTO grabaciones ({', '.join(COLUMNAS)}) VALUES ({', '.join('?' * len(COLUMNAS))})
+ON CONFLICT(clave) DO UPDATE SET
+    {', '.join(f'{c} = COALESCE(excluded.{c}, {c})' for c in COLUMNAS[1:])}
+"""
+
+def _fecha(nombre, respaldo=None):
+    """Fecha ISO a partir del nombre con timestamp, o del valor de respaldo"""
+    try:
+        return datetime.strptime(nombre, FORMATO_NOMBRE).isoformat()
+    except ValueError:
+        return respaldo
+
+def _consulta_fts(texto):
+    """Convierte palabras sueltas en una consulta FTS5 segura (todas las palabras, en cualquier orden)"""
+    palabras = [p.replace('"', '') for p in texto.split()]
+    return " ".join(f'"{p}"' for p in palabras if p)
+
+def _clave(carpeta, nombre):
+    """Identifica la grabación por carpeta y nombre sin extensión (el audio puede cambiar de formato)"""
+    return str(Path(carpeta).resolve() / nombre)
+
+def _duracion_wav(ruta):
+    """Duración de un WAV en segundos, o None si no se puede leer"""
+    try:
+        with wave.open(str(ruta), 'rb') as f:
+            return round(f.getnframes() / f.getframerate(), 2)
+    except Exception:
+        return None
+
+class Catalogo:
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        # Se usa desde el hilo de inferencia y desde el de archivado
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(str(self.ruta), check_same_thread=False)
+        self._conexion.row_factory = sqlite3.Row
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.executescript(ESQUEMA)
+        self._migrar()
+
+    def _migrar(self):
+        """Añade a un catálogo antiguo las columnas de salida que le falten (p. ej. vtt_file)"""
+        existentes = {fila['name'] for fila in self._conexion.execute("PRAGMA table_info(grabaciones)")}
+        with self._conexion:
+            for columna in COLUMNAS_SALIDA.values():
+                if columna not in existentes:
+                    self._conexion.execute(f"ALTER TABLE grabaciones ADD COLUMN {columna} TEXT")
+
+    def _fila(self, nombre, texto, audio_file, metadatos, directorio, fecha=None):
+        """Valores de una grabación en el orden de COLUMNAS"""
+        metadatos = metadatos or {}
+        directorio = Path(directorio)
+        salidas = []
+        for ext in COLUMNAS_SALIDA:
+            ruta = directorio / f"{nombre}{ext}"
+            salidas.append(str(ruta) if ruta.exists() else None)
+        return (
+            _clave(directorio, nombre),
+            nombre,
+            _fecha(nombre, fecha or metadatos.get('timestamp')),
+            audio_file,
+            *salidas,
+            metadatos.get('duracion_audio'),
+            metadatos.get('modelo'),
+            metadatos.get('segundos'),
+            metadatos.get('rtf'),
+            texto,
+            datetime.now().isoformat()
+        )
+
+    def registrar(self, texto, audio_file, config, metadatos=None):
+        """Añade o actualiza una grabación al terminar su transcripción"""
+        nombre = Path(audio_file).stem
+        fila = self._fila(nombre, texto, str(audio_file), metadatos, config['directorio_salida'])
+        with self._lock, self._conexion:
+            self._conexion.execute(INSERTAR, fila)
+
+    def actualizar_audio(self, audio_origen, audio_destino):
+        """Apunta la grabación al archivo comprimido que sustituye al WAV"""
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "UPDATE grabaciones SET audio_file = ?, actualizado = ? WHERE clave = ?",
+                (str(audio_destino), datetime.now().isoformat(),
+                 _clave(Path(audio_origen).parent, Path(audio_origen).stem))
+            )
+
+    def buscar(self, consulta, limite=20, desde=None, hasta=None, modelo=None, relevancia=False):
+        """Grabaciones cuya transcripción contiene todas las palabras, las más recientes primero"""
+        fts = _consulta_fts(consulta)
+        if not fts:
+            return []  # Sin palabras no hay nada que buscar (un MATCH vacío es un error de FTS5)
+        condiciones = ["transcripciones_fts MATCH ?"]
+        parametros = [fts]
+        if desde:
+            condiciones.append("g.fecha >= ?")
+            parametros.append(desde)
+        if hasta:
+            condiciones.append("g.fecha < ?")
+            parametros.append(hasta)
+        if modelo:
+            condiciones.append("g.modelo = ?")
+            parametros.append(modelo)
+        # Por fecha de grabación, no por orden de inserción (las importadas llegan tarde); el
+        # id desempata como en idx_grabaciones_fecha, que también sirve a desde/hasta
+        orden = "bm25(transcripciones_fts)" if relevancia else "g.fecha DESC, g.id DESC"
+        sql = f"""
+            SELECT g.*, snippet(transcripciones_fts, 0, '[', ']', '…', 12) AS fragmento
+            FROM transcripciones_fts JOIN grabaciones g ON g.id = transcripciones_fts.rowid
+            WHERE {' AND '.join(condiciones)}
+            ORDER BY {orden} LIMIT ?
+        """
+        with self._lock:
+            return [dict(fila) for fila in self._conexion.execute(sql, parametros + [limite])]
+
+    def recientes(self, limite=20):
+        """Últimas grabaciones por fecha"""
+        with self._lock:
+            return [dict(fila) for fila in self._conexion.execute(
+                "SELECT * FROM grabaciones ORDER BY fecha DESC LIMIT ?", (limite,)
+            )]
+
+    def estadisticas(self):
+        """Número de grabaciones, horas de audio y RTF medio por modelo"""
+        with self._lock:
+            total = self._conexion.execute(
+                "SELECT COUNT(*), COALESCE(SUM(duracion_audio), 0) FROM grabaciones"
+            ).fetchone()
+            modelos = self._conexion.execute(
+                "SELECT modelo, COUNT(*), AVG(rtf) FROM grabaciones GROUP BY modelo ORDER BY 2 DESC"
+            ).fetchall()
+        return {
+            'grabaciones': total[0],
+            'horas_audio': round(total[1] / 3600, 2),
+            'modelos': {m or 'desconocido': {'grabaciones': n, 'rtf_medio': round(r, 3) if r else None}
+                        for m, n, r in modelos}
+        }
+
+    def _fila_importada(self, carpeta, nombre, archivos):
+        """Fila de una grabación existente a partir de sus archivos; None si no hay transcripción"""
+        metadatos = {}
+        if '.json' in archivos:
+            try:
+                with open(archivos['.json'], 'r', encoding='utf-8') as f:
+                    metadatos = json.load(f)
+            except json.JSONDecodeError:
+                metadatos = {}
+            if not isinstance(metadatos, dict):
+                metadatos = {}  # Otro JSON (una lista, un número): no son metadatos de grabación
+        if '.txt' in archivos:
+            texto = archivos['.txt'].read_text(encoding='utf-8')
+        else:
+            texto = metadatos.get('transcripcion')
+        if not texto or not isinstance(texto, str):
+            return None  # Audio sin transcribir: no hay nada que buscar
+
+        audio = next((archivos[ext] for ext in EXTENSIONES_AUDIO if ext in archivos), None)
+        if 'duracion_audio' not in metadatos and audio is not None and audio.suffix == '.wav':
+            metadatos['duracion_audio'] = _duracion_wav(audio)
+        respaldo = datetime.fromtimestamp(
+            next(iter(archivos.values())).stat().st_mtime
+        ).isoformat()
+        return self._fila(
+            nombre, texto.strip(), str(audio) if audio else metadatos.get('audio_file'),
+            metadatos, carpeta, metadatos.get('timestamp') or respaldo
+        )
+
+    def importar(self, directorio):
+        """Importa las transcripciones existentes de un directorio (recursivo); devuelve cuántas"""
+        grupos = {}
+        for ruta in Path(directorio).rglob("*"):
+            if ruta.suffix in (*COLUMNAS_SALIDA, *EXTENSIONES_AUDIO) and ruta.is_file():
+                grupos.setdefault((ruta.parent, ruta.stem), {})[ruta.suffix] = ruta
+
+        filas = []
+        for (carpeta, nombre), archivos in grupos.items():
+            if nombre in ARCHIVOS_INTERNOS or '.journal' in nombre:
+                continue
+            try:
+                fila = self._fila_importada(carpeta, nombre, archivos)
+            except (OSError, UnicodeDecodeError, ValueError) as e:
+                # Un archivo dañado no debe abortar la importación del resto
+                print(f"⚠️ Se omite {carpeta / nombre}: {e}")
+                continue
+            if fila is not None:
+                filas.append(fila)
+
+        # En orden cronológico, como las que registra el controlador
+        filas.sort(key=lambda fila: fila[COLUMNAS.index('fecha')] or "")
+        # Una sola transacción: decenas de miles de filas en segundos
+        with self._lock, self._conexion:
+            self._conexion.executemany(INSERTAR, filas)
+        return len(filas)
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Comparación fp32 vs int8 - Factor de tiempo real, memoria y diferencias de transcripción
+
+Uso:
+    python comparar_cuantizacion.py grabaciones/ejemplo.wav [otro.wav ...] --modelo base
+    python comparar_cuantizacion.py grabaciones/*.wav --perfil rapido_voraz
+"""
+import argparse
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cuantizacion import cargar_modelo_whisper
+from evaluacion import memoria_pico_mb, tasa_error_palabras
+from perfiles_decodificacion import nombres_perfiles, parametros_decodificacion
+from utils import cargar_configuracion
+
+MODOS = ("none", "int8")
+
+def _medir_modo(modelo_nombre, cuantizacion, archivos, parametros):
+    """Carga el modelo en un proceso limpio, transcribe los archivos y mide tiempos y memoria"""
+    import whisper
+
+    inicio = time.perf_counter()
+    modelo = cargar_modelo_whisper(modelo_nombre, cuantizacion)
+    carga = time.perf_counter() - inicio
+
+    textos = {}
+    segundos_audio = 0.0
+    segundos_computo = 0.0
+    for ruta in archivos:
+        # La decodificación con ffmpeg queda fuera de la medida: es igual en ambos modos
+        audio = whisper.load_audio(ruta)
+        inicio = time.perf_counter()
+        resultado = modelo.transcribe(audio, **parametros)
+        segundos_computo += time.perf_counter() - inicio
+        segundos_audio += len(audio) / whisper.audio.SAMPLE_RATE
+        textos[ruta] = resultado['text'].strip()
+
+    return {
+        'cuantizacion': cuantizacion,
+        'carga_segundos': round(carga, 2),
+        'rtf': round(segundos_computo / segundos_audio, 3) if segundos_audio else None,
+        'rss_pico_mb': round(memoria_pico_mb() or 0, 1),
+        'textos': textos
+    }
+
+def main():
+    """Ejecuta cada modo en su propio proceso y muestra la comparación"""
+    config = cargar_configuracion()
+
+    parser = argparse.ArgumentParser(description="Compara el modelo fp32 con el cuantizado a int8")
+    parser.add_argument("archivos", nargs="+", help="Audios de referencia")
+    parser.add_argument("--modelo", default=config.get('whisper_model', 'base'), help="Modelo Whisper")
+    parser.add_argument("--perfil", choices=nombres_perfiles(config),
+                        help="Perfil de decodificación (por defecto, el de config.json)")
+    parser.add_argument("--json", help="Guardar también los resultados en este archivo")
+    args = parser.parse_args()
+    # Los mismos parámetros que usa la aplicación: la comparación vale para su configuración
+    parametros = parametros_decodificacion(config, args.perfil)
+
+    # Un proceso nuevo por modo para que el RSS de uno no contamine al otro
+    contexto = multiprocessing.get_context("spawn")
+    resultados = {}
+    for modo in MODOS:
+        print(f"🔄 Midiendo modo '{modo}'...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+            resultados[modo] = pool.submit(
+                _medir_modo, args.modelo, modo, args.archivos, parametros
+            ).result()
+
+    base, cuantizado = resultados["none"], resultados["int8"]
+    print(f"\n📊 Modelo '{args.modelo}' ({len(args.archivos)} archivos)")
+    print(f"{'':12}{'fp32':>12}{'int8':>12}")
+    for clave, etiqueta in (('carga_segundos', 'carga (s)'), ('rtf', 'RTF'), ('rss_pico_mb', 'RSS (MB)')):
+        print(f"{etiqueta:12}{base[clave]:>12}{cuantizado[clave]:>12}")
+
+    # Diferencias de transcripción tomando fp32 como referencia
+    diferencias = {}
+    for ruta in args.archivos:
+        wer = tasa_error_palabras(base['textos'][ruta], cuantizado['textos'][ruta])
+        diferencias[ruta] = round(wer, 4)
+        if wer > 0:
+            print(f"\n✏️ {ruta} (WER int8 vs fp32: {wer:.1%})")
+            print(f"   fp32: {base['textos'][ruta]}")
+            print(f"   int8: {cuantizado['textos'][ruta]}")
+    iguales = sum(1 for wer in diferencias.values() if wer == 0)
+    print(f"\n✅ {iguales}/{len(args.archivos)} transcripciones idénticas")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'modelo': args.modelo, 'perfil': args.perfil, 'parametros': parametros,
+                       'modos': resultados, 'wer_int8_vs_fp32': diferencias},
+                      f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Comparación de perfiles de decodificación - Factor de tiempo real y WER sobre un conjunto de referencia
+
+Cada audio necesita al lado su transcripción de referencia: ejemplo.wav -> ejemplo.ref.txt
+
+Uso:
+    python comparar_perfiles.py referencias/*.wav --wer-maximo 0.10
+    python comparar_perfiles.py referencias/*.wav --perfiles rapido_voraz equilibrado --json perfiles.json
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from cuantizacion import cargar_modelo_whisper
+from evaluacion import normalizar, tasa_error_palabras
+from perfiles_decodificacion import nombres_perfiles, parametros_decodificacion
+from utils import cargar_configuracion
+
+def leer_referencias(archivos):
+    """{ruta: texto de referencia}; los audios sin <nombre>.ref.txt se omiten con un aviso"""
+    referencias = {}
+    for ruta in archivos:
+        ruta_ref = Path(ruta).with_suffix(".ref.txt")
+        if not ruta_ref.exists():
+            print(f"⚠️ Sin referencia, se omite: {ruta} (falta {ruta_ref.name})")
+            continue
+        referencias[ruta] = ruta_ref.read_text(encoding='utf-8').strip()
+    return referencias
+
+def medir_perfil(modelo, parametros, audios, referencias):
+    """Transcribe todos los audios con un perfil: RTF y WER ponderado por palabras de referencia"""
+    import whisper
+
+    segundos_audio = 0.0
+    segundos_computo = 0.0
+    errores = 0.0
+    palabras = 0
+    textos = {}
+    for ruta, audio in audios.items():
+        inicio = time.perf_counter()
+        resultado = modelo.transcribe(audio, **parametros)
+        segundos_computo += time.perf_counter() - inicio
+        segundos_audio += len(audio) / whisper.audio.SAMPLE_RATE
+
+        textos[ruta] = resultado['text'].strip()
+        # WER por archivo ponderado: los audios largos pesan según su número de palabras
+        n = len(normalizar(referencias[ruta]))
+        errores += tasa_error_palabras(referencias[ruta], textos[ruta]) * n
+        palabras += n
+
+    return {
+        'rtf': round(segundos_computo / segundos_audio, 3) if segundos_audio else None,
+        'wer': round(errores / palabras, 4) if palabras else 0.0,
+        'segundos_computo': round(segundos_computo, 2),
+        'textos': textos
+    }
+
+def main():
+    """Mide cada perfil con el mismo modelo cargado y recomienda el más barato que cumple"""
+    config = cargar_configuracion()
+    disponibles = nombres_perfiles(config)
+
+    parser = argparse.ArgumentParser(description="Compara los perfiles de decodificación (RTF y WER)")
+    parser.add_argument("archivos", nargs="+", help="Audios con su <nombre>.ref.txt al lado")
+    parser.add_argument("--perfiles", nargs="+", choices=disponibles, default=disponibles,
+                        help="Perfiles a medir (por defecto, todos los de config.json)")
+    parser.add_argument("--modelo", default=config.get('whisper_model', 'base'), help="Modelo Whisper")
+    parser.add_argument("--wer-maximo", type=float, default=0.10,
+                        help="WER aceptable para la recomendación (0.10 = 10%%)")
+    parser.add_argument("--json", help="Guardar también los resultados en este archivo")
+    args = parser.parse_args()
+
+    referencias = leer_referencias(args.archivos)
+    if not referencias:
+        sys.exit("❌ Ningún audio tiene transcripción de referencia")
+
+    import whisper
+
+    print(f"🔄 Cargando modelo '{args.modelo}'...")
+    modelo = cargar_modelo_whisper(args.modelo, config.get('whisper_quantization', 'none'))
+    # La decodificación con ffmpeg queda fuera de la medida: es igual para todos los perfiles
+    audios = {ruta: whisper.load_audio(ruta) for ruta in referencias}
+    # Calentamiento: la primera inferencia paga la inicialización de torch
+    modelo.transcribe(next(iter(audios.values()))[:whisper.audio.SAMPLE_RATE],
+                      **parametros_decodificacion(config))
+
+    resultados = {}
+    for perfil in args.perfiles:
+        print(f"🔄 Midiendo perfil '{perfil}'...")
+        resultados[perfil] = medir_perfil(
+            modelo, parametros_decodificacion(config, perfil), audios, referencias
+        )
+
+    print(f"\n📊 Modelo '{args.modelo}' ({len(referencias)} archivos)")
+    print(f"{'perfil':16}{'RTF':>10}{'WER':>10}")
+    for perfil, medida in resultados.items():
+        print(f"{perfil:16}{medida['rtf']:>10}{medida['wer']:>10.1%}")
+
+    # El más barato (menor RTF) entre los que cumplen el umbral de precisión
+    aptos = [p for p, m in resultados.items() if m['wer'] <= args.wer_maximo]
+    recomendado = min(aptos, key=lambda p: resultados[p]['rtf']) if aptos else None
+    if recomendado:
+        print(f"\n✅ Recomendado: '{recomendado}' (WER ≤ {args.wer_maximo:.1%} con el menor RTF)")
+        print(f"   Para usarlo: \"decodificacion\": {{\"perfil\": \"{recomendado}\"}} en config.json")
+    else:
+        print(f"\n⚠️ Ningún perfil cumple WER ≤ {args.wer_maximo:.1%}; prueba un modelo mayor")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'modelo': args.modelo, 'wer_maximo': args.wer_maximo,
+                       'recomendado': recomendado, 'perfiles': resultados},
+                      f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Consulta del catálogo - Busca en las transcripciones e importa grabaciones antiguas
+
+Uso:
+    python consultar_catalogo.py buscar "presupuesto reunión" --desde 2025-06-01
+    python consultar_catalogo.py recientes -n 10
+    python consultar_catalogo.py importar grabaciones/
+    python consultar_catalogo.py estadisticas
+"""
+import argparse
+import json
+import time
+
+from catalogo import Catalogo
+from utils import cargar_configuracion
+
+def mostrar(grabaciones):
+    """Una línea por grabación con fecha, duración y fragmento"""
+    for g in grabaciones:
+        duracion = f"{g['duracion_audio']:.0f}s" if g['duracion_audio'] else "?"
+        texto = g.get('fragmento') or g['texto'][:100]
+        print(f"🎙️ {g['fecha'] or g['nombre']}  ({duracion}, {g['modelo'] or '?'})")
+        print(f"   {texto}")
+        print(f"   {g['txt_file'] or g['json_file'] or g['audio_file']}")
+
+def main():
+    """Punto de entrada de la consulta del catálogo"""
+    parser = argparse.ArgumentParser(description="Busca en el catálogo de grabaciones")
+    parser.add_argument("--catalogo", help="Base de datos (por defecto, la de config.json)")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    buscar = subcomandos.add_parser("buscar", help="Búsqueda de texto completo")
+    buscar.add_argument("consulta", help="Palabras que deben aparecer (sin importar tildes)")
+    buscar.add_argument("-n", "--limite", type=int, default=20)
+    buscar.add_argument("--desde", help="Fecha mínima (AAAA-MM-DD)")
+    buscar.add_argument("--hasta", help="Fecha máxima, excluida (AAAA-MM-DD)")
+    buscar.add_argument("--modelo", help="Solo transcripciones de este modelo")
+    buscar.add_argument("--relevancia", action="store_true",
+                        help="Ordenar por relevancia en vez de por fecha (más lento)")
+
+    recientes = subcomandos.add_parser("recientes", help="Últimas grabaciones")
+    recientes.add_argument("-n", "--limite", type=int, default=20)
+
+    importar = subcomandos.add_parser("importar", help="Indexa las transcripciones existentes")
+    importar.add_argument("directorio", help="Carpeta de grabaciones (se recorre recursivamente)")
+
+    subcomandos.add_parser("estadisticas", help="Grabaciones, horas de audio y RTF por modelo")
+    args = parser.parse_args()
+
+    config = cargar_configuracion()
+    catalogo = Catalogo(args.catalogo or config['catalogo']['ruta'])
+
+    inicio = time.perf_counter()
+    if args.comando == "buscar":
+        resultados = catalogo.buscar(
+            args.consulta, args.limite, args.desde, args.hasta, args.modelo, args.relevancia
+        )
+        mostrar(resultados)
+        print(f"\n🔎 {len(resultados)} resultados en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    elif args.comando == "recientes":
+        mostrar(catalogo.recientes(args.limite))
+    elif args.comando == "importar":
+        importadas = catalogo.importar(args.directorio)
+        print(f"📥 {importadas} transcripciones importadas en {time.perf_counter() - inicio:.1f}s")
+    else:
+        print(json.dumps(catalogo.estadisticas(), indent=2, ensure_ascii=False))
+    catalogo.cerrar()
+
+if __name__ == "__main__":
+    main()
@@ -6,124 +6,395 @@ import sys
 import os
 import time
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 from grabador import Grabador
 from transcriptor import Transcriptor
+from transcripcion_streaming import SesionStreaming
 from gestor_teclado import GestorTeclado
 from interfaz import InterfazVisual
+from escritor_wav import recuperar_grabaciones
+from archivador import Archivador
+from catalogo import Catalogo
+from demonio import TranscriptorRemoto
+from despachador import Despachador, MaquinaEstados, IDLE, GRABANDO, DETENIENDO, TRANSCRIBIENDO
+from metricas import Metricas
+from procesamiento_audio import preparar_para_whisper
+from recarga_config import (
+    VigilanteConfiguracion, actualizar_secciones, SECCIONES_EN_CALIENTE, SECCIONES_MODELO
+)
+from planificador import (
+    PlanificadorTrabajos, PRIORIDAD_DICTADO, PRIORIDAD_RECUPERACION, PRIORIDAD_BACKLOG,
+    ESTADOS_ACTIVOS
+)
+from salidas import CanalSalidas
 from utils import (
     cargar_configuracion, 
     copiar_al_portapapeles, 
     notificar,
-    guardar_transcripcion
+    MedidorFases
 )
 
 class ControladorPrincipal:
-    def __init__(self):
+    def __init__(self, medidor=None):
+        self.medidor = medidor or MedidorFases()
+        
         # Cargar configuración
         self.config = cargar_configuracion()
+        self.medidor.marcar("configuración")
         
-        # Variables de control (mantener como en el original)
-        self.grabando = False
+        # Máquina de estados manejada solo desde el hilo del despachador
+        self.estado = MaquinaEstados(on_cambio=self._on_cambio_estado)
+        self.despachador = Despachador(self.config['atajos'].get('antirrebote_ms', 250))
+        self.despachador.registrar('alternar', self.alternar_grabacion, antirrebote=True)
+        self.despachador.registrar('cancelar', self._cancelar, antirrebote=True)
+        self.despachador.registrar('trabajo_terminado', self._trabajo_terminado)
+        self.despachador.registrar('configuracion', self._aplicar_configuracion)
+        self._dictados = set()  # Trabajos de dictado que mantienen el estado 'transcribiendo'
+        self._atajo_recibido = None
         self.hilo_grabacion = None
+        self.sesion_streaming = None
         
         # Inicializar componentes
         self.grabador = Grabador(self.config)
-        self.transcriptor = Transcriptor(self.config)
+        self.transcriptor = self._crear_transcriptor()
         self.gestor_teclado = GestorTeclado(self.config)
         self.interfaz = InterfazVisual(self.config)
+        self.metricas = Metricas(self.config)
+        self.interfaz.on_pintado = lambda segundos: self.metricas.registrar('estado_a_indicador', segundos)
+        
+        # Cola persistente con un único hilo de inferencia dueño del modelo
+        self.planificador = PlanificadorTrabajos(
+            self._procesar_trabajo,
+            Path(self.config['directorio_salida']) / "cola_trabajos.json"
+        )
         
-        # ThreadPool para mejor gestión
-        self.executor = ThreadPoolExecutor(max_workers=2)
+        # Compresión y retención de grabaciones, fuera del camino de la transcripción
+        self.archivador = Archivador(self.config, ocupado=self._ocupado)
+        
+        # Salidas fuera del hilo de inferencia: archivos, catálogo, archivado y avisos
+        self.salidas = CanalSalidas(self.config, self.metricas)
+        self.catalogo = None
+        if self.config['catalogo']['activado']:
+            # Índice de búsqueda de las transcripciones
+            self.catalogo = Catalogo(self.config['catalogo']['ruta'])
+            self.archivador.on_archivado = self.catalogo.actualizar_audio
+            self.salidas.agregar('catalogo', self._registrar_en_catalogo)
+        # Solo se encola: la compresión espera a que no haya grabación ni trabajos
+        self.salidas.agregar('archivado', lambda salida: self.archivador.encolar(salida['audio_file']))
         
         # Configurar callbacks
         self.gestor_teclado.on_grabar = self.grabar_y_transcribir
         self.gestor_teclado.on_cerrar = self.cerrar_programa
+        self.gestor_teclado.on_cancelar = self.cancelar_transcripcion
+        
+        # Cambios de config.json aplicados en el hilo del despachador, sin reiniciar
+        self.vigilante = None
+        opciones_recarga = self.config['recarga_configuracion']
+        if opciones_recarga['activado']:
+            self.vigilante = VigilanteConfiguracion(
+                self.config,
+                lambda nueva, cambiadas: self.despachador.enviar(
+                    'configuracion', nueva=nueva, cambiadas=cambiadas
+                ),
+                intervalo=opciones_recarga['intervalo_segundos']
+            )
         
         # Timer para notificaciones durante grabación
         self.timer_notificacion = None
         self.tiempo_inicio_grabacion = None
+        self.medidor.marcar("componentes")
         
-    def iniciar(self):
-        """Inicia la aplicación"""
+    def _crear_transcriptor(self):
+        """Cliente del demonio compartido si está configurado y responde; si no, modelo propio"""
+        if self.config['demonio']['usar_demonio']:
+            remoto = TranscriptorRemoto(self.config)
+            if remoto.disponible():
+                print("🔗 Usando el demonio de transcripción compartido")
+                return remoto
+            print("⚠️ El demonio de transcripción no responde; se carga un modelo propio")
+        # El modelo se carga en segundo plano; los trabajos esperan en la cola a que esté listo
+        return Transcriptor(self.config, en_segundo_plano=True)
+        
+    def iniciar(self, retranscribir=()):
+        """Inicia la aplicación; retranscribir son grabaciones antiguas para la cola de fondo"""
         print("⚡ Presiona Alt + Shift + X para iniciar/detener la grabación.")
         print("🛑 Presiona F8 para salir.")
         
         # Iniciar interfaz visual si está habilitada
         if self.config['interfaz']['mostrar_indicador']:
             self.interfaz.iniciar()
+        self.medidor.marcar("interfaz")
             
-        # Iniciar gestor de teclado (bloquea hasta salir)
-        self.gestor_teclado.iniciar()
+        # Reanudar la cola y reparar grabaciones interrumpidas en la sesión anterior
+        self.planificador.iniciar()
+        self._recuperar_grabaciones()
+        self.retranscribir(retranscribir)
+        self.archivador.iniciar()
+        self.medidor.marcar("cola")
         
-    def grabar_y_transcribir(self):
-        """Lógica original de grabación y transcripción"""
-        if not self.grabando:
-            # Inicia la grabación en un hilo aparte
-            self.grabando = True
-            self.tiempo_inicio_grabacion = time.time()
-            print("🎙️ Grabación iniciada. Pulsa Alt + Shift + X para detener.")
-            
-            # Actualizar interfaz visual
-            self.interfaz.set_estado('grabando')
+        # Micrófono abierto desde el arranque: grabar no espera a abrir el dispositivo
+        if self.grabador.siempre_abierta:
+            self.grabador.abrir_entrada()
+            self.medidor.marcar("entrada de audio")
+        
+        # Registrar atajos: a partir de aquí la aplicación ya responde
+        self.despachador.iniciar()
+        self.gestor_teclado.registrar_atajos()
+        if self.vigilante:
+            self.vigilante.iniciar()
+        self.medidor.marcar("atajos")
+        self.medidor.informe()
             
-            # Generar nombre de archivo con timestamp
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            self.audio_filename = f"{timestamp}.wav"
+        # Esperar eventos de teclado (bloquea hasta salir)
+        self.gestor_teclado.esperar()
+        
+    @property
+    def grabando(self):
+        """Hay una grabación en curso"""
+        return self.estado.actual == GRABANDO
+        
+    def grabar_y_transcribir(self):
+        """Atajo de grabación: encola el evento (el despachador descarta las pulsaciones dobles)"""
+        self.despachador.enviar('alternar')
+        
+    def alternar_grabacion(self, recibido=None):
+        """Inicia o detiene la grabación según el estado (hilo del despachador)"""
+        if self.estado.actual in (IDLE, TRANSCRIBIENDO):
+            self._iniciar_grabacion(recibido)
+        elif self.estado.actual == GRABANDO:
+            self._detener_grabacion()
             
-            self.grabador.start_recording()
+    def _on_cambio_estado(self, anterior, nuevo, marca):
+        """Refleja cada transición en el indicador"""
+        self.interfaz.set_estado(nuevo, marca)
+        
+    def _iniciar_grabacion(self, recibido=None):
+        """Abre el WAV y empieza a capturar"""
+        self._atajo_recibido = recibido
+        self.tiempo_inicio_grabacion = time.time()
+        print("🎙️ Grabación iniciada. Pulsa Alt + Shift + X para detener.")
+        self.estado.cambiar(GRABANDO)
+        
+        # Si el modelo se descargó por inactividad, se recarga mientras el usuario habla
+        self.transcriptor.precalentar()
+        
+        # Generar nombre de archivo con timestamp
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        self.audio_filename = f"{timestamp}.wav"
+        
+        with self.metricas.tramo('abrir_wav'):
+            self.grabador.start_recording(self.audio_filename)
+        # Con la entrada siempre abierta el audio ya está llegando: no hace falta hilo
+        if not self.grabador.entrada_abierta():
             self.hilo_grabacion = threading.Thread(target=self.grabador.iniciar_grabacion)
             self.hilo_grabacion.start()
-            
-            # Iniciar timer de notificaciones
-            self._iniciar_timer_notificacion()
-            
+        
+        # Transcribir por ventanas mientras se graba
+        if self.config['transcripcion_streaming']['activado']:
+            self.sesion_streaming = SesionStreaming(
+                self.grabador, self.transcriptor, self.config, self.planificador
+            )
+            self.sesion_streaming.iniciar()
+        
+        # Iniciar timer de notificaciones
+        self._iniciar_timer_notificacion()
+        
+    def _detener_grabacion(self):
+        """Detiene la captura, encola la transcripción y cierra el WAV"""
+        inicio_parada = time.perf_counter()
+        self.estado.cambiar(DETENIENDO)
+        self._detener_timer_notificacion()
+        self.grabador.detener_captura()
+        
+        sesion, self.sesion_streaming = self.sesion_streaming, None
+        audio_file = str(self.grabador.filepath)
+        grabacion = Path(audio_file).stem
+        if self.grabador.desbordamientos:
+            self.metricas.contar(
+                'desbordamientos_audio', self.grabador.desbordamientos, grabacion=grabacion
+            )
+        if self._atajo_recibido is not None and self.grabador.primer_bloque is not None:
+            # Desde la pulsación hasta el primer bloque de audio de la grabación
+            self.metricas.registrar(
+                'atajo_a_captura', self.grabador.primer_bloque - self._atajo_recibido,
+                grabacion=grabacion
+            )
+        
+        # Validar que se capturó audio antes de transcribir
+        if len(self.grabador.audio) > 0:
+            # El buffer de la captura pasa en memoria a Whisper y se convierte a 16 kHz en el
+            # hilo de inferencia: el despachador queda libre y el WAV se cierra en paralelo
+            self._dictados.add(self.planificador.enviar(audio_file, PRIORIDAD_DICTADO, {
+                'sesion': sesion,
+                'audio': None if sesion else self.grabador.audio,
+                'fs': self.grabador.fs,
+                'inicio_parada': inicio_parada
+            }))
+            with self.metricas.tramo('cerrar_wav', grabacion=grabacion):
+                self.grabador.stop_recording()
         else:
-            # Detener la grabación
-            self.grabando = False
-            self._detener_timer_notificacion()
-            
-            # Actualizar interfaz visual
-            self.interfaz.set_estado('transcribiendo')
-            
-            audio_file = self.grabador.stop_recording(self.audio_filename)
-            print("✅ Grabación detenida.")
+            self.grabador.stop_recording()
+            print("❌ Error: Archivo de audio inválido")
+            notificar("Error al grabar audio")
+            if sesion:
+                sesion.cancelar()
+        self._actualizar_reposo()
+        
+    def _actualizar_reposo(self, terminado=None):
+        """Pasa a 'transcribiendo' o a 'idle' según queden dictados activos en la cola"""
+        self._dictados.discard(terminado)
+        self._dictados = {
+            id_trabajo for id_trabajo in self._dictados
+            if (self.planificador.estado(id_trabajo) or {}).get('estado') in ESTADOS_ACTIVOS
+        }
+        if self.estado.actual in (DETENIENDO, TRANSCRIBIENDO):
+            self.estado.cambiar(TRANSCRIBIENDO if self._dictados else IDLE)
             
-            # Validar archivo de audio antes de transcribir
-            if os.path.exists(audio_file) and os.path.getsize(audio_file) > 0:
-                # Ejecutar transcripción en el ThreadPool
-                future = self.executor.submit(self._procesar_transcripcion, audio_file)
-            else:
-                print("❌ Error: Archivo de audio inválido")
-                notificar("Error al grabar audio")
-                self.interfaz.set_estado('idle')
+    def _trabajo_terminado(self, recibido=None, id_trabajo=None):
+        """El hilo de inferencia terminó un trabajo (hilo del despachador)"""
+        self._actualizar_reposo(id_trabajo)
                 
-    def _procesar_transcripcion(self, audio_file):
+    def _procesar_trabajo(self, trabajo, datos):
+        """Ejecuta en el hilo de inferencia un trabajo de la cola"""
+        # Las re-transcripciones de fondo no pisan el portapapeles del dictado
+        self._procesar_transcripcion(trabajo['audio_file'], id_trabajo=trabajo['id'],
+                                     portapapeles=trabajo['prioridad'] < PRIORIDAD_BACKLOG, **datos)
+        
+    def _procesar_transcripcion(self, audio_file, sesion=None, audio=None, fs=None,
+                                inicio_parada=None, id_trabajo=None, portapapeles=True):
         """Procesa la transcripción y guarda los resultados"""
+        grabacion = Path(audio_file).stem
+        resultado = 'error'
+        if inicio_parada is not None:
+            # Parada y espera en la cola hasta que el trabajo arranca
+            self.metricas.registrar('espera_cola', time.perf_counter() - inicio_parada, grabacion=grabacion)
         try:
-            texto = self.transcriptor.transcribir_audio(audio_file)
+            if audio is not None and fs is not None:
+                # Buffer de la captura: float32 a 16 kHz por bloques, sin bloquear el despachador
+                with self.metricas.tramo('preparar_audio', grabacion=grabacion):
+                    audio = preparar_para_whisper(audio, fs)
+            if sesion:
+                # Solo queda por decodificar la última ventana de la grabación
+                with self.metricas.tramo('streaming_final', grabacion=grabacion):
+                    final = sesion.finalizar()
+                texto, segmentos = final['text'], final['segments']
+            else:
+                # Sin audio en memoria (p. ej. grabación recuperada) se lee el WAV
+                entrada = audio if audio is not None else audio_file
+                modelo = self.transcriptor.elegir_modelo(entrada)
+                
+                # Borrador rápido al portapapeles mientras se calcula el resultado final
+                if portapapeles and self.transcriptor.politica.usar_borrador(modelo):
+                    modelo_borrador = self.transcriptor.politica.modelo_borrador
+                    with self.metricas.tramo('borrador', modelo=modelo_borrador, grabacion=grabacion):
+                        borrador = self.transcriptor.transcribir_audio(entrada, modelo_borrador)
+                    if borrador and self.config['formatos_salida']['clipboard']:
+                        copiar_al_portapapeles(borrador)
+                        print("✏️ Borrador copiado; se reemplazará con el resultado final.")
+                        
+                with self.metricas.tramo('transcribir', modelo=modelo, grabacion=grabacion):
+                    texto = self.transcriptor.transcribir_audio(entrada, modelo)
+                segmentos = self.transcriptor.ultimos_segmentos
+            self.metricas.registrar_inferencia(self.transcriptor.ultimos_metadatos, grabacion=grabacion)
+                
+            if id_trabajo and self.planificador.esta_cancelado(id_trabajo):
+                print("🚫 Transcripción cancelada; se descarta el resultado.")
+                resultado = 'cancelado'
+                return
             
             if texto:
-                # Guardar según configuración
-                if self.config['formatos_salida']['clipboard']:
-                    copiar_al_portapapeles(texto)
+                # Portapapeles ya; archivos, catálogo y aviso en el hilo de salidas
+                self.salidas.publicar(
+                    texto, audio_file, self.transcriptor.ultimos_metadatos, segmentos, portapapeles
+                )
                     
-                if self.config['formatos_salida']['txt_file']:
-                    guardar_transcripcion(texto, audio_file, self.config)
+                if inicio_parada is not None:
+                    latencia = time.perf_counter() - inicio_parada
+                    self.metricas.registrar('parada_a_texto', latencia, grabacion=grabacion)
+                    print(f"⏱️ Latencia fin de grabación → texto: {latencia:.2f}s")
                     
-                notificar("La transcripción está lista para pegar.")
                 print(f"🗒️ Transcripción: {texto}")
+                resultado = 'ok'
             else:
-                notificar("Error en la transcripción")
+                self.salidas.notificar("Error en la transcripción")
+                resultado = 'vacio'
                 
         except Exception as e:
             print(f"❌ Error al procesar transcripción: {e}")
-            notificar("Error al procesar transcripción")
+            self.salidas.notificar("Error al procesar transcripción")
             
         finally:
-            # Volver a estado idle
-            self.interfaz.set_estado('idle')
+            self.metricas.contar('trabajos', resultado=resultado, grabacion=grabacion)
+            self.metricas.exportar()
+            # El despachador decide si se vuelve a 'idle'
+            self.despachador.enviar('trabajo_terminado', id_trabajo=id_trabajo)
+            
+    def _recuperar_grabaciones(self):
+        """Encola para transcripción los WAV reparados tras un cierre inesperado"""
+        recuperadas = recuperar_grabaciones(self.config['directorio_salida'])
+        for audio_file in recuperadas:
+            self.planificador.enviar(audio_file, PRIORIDAD_RECUPERACION)
+        if recuperadas:
+            notificar(f"Recuperadas {len(recuperadas)} grabaciones interrumpidas")
+            
+    def retranscribir(self, audio_files):
+        """Encola grabaciones antiguas con la menor prioridad: solo usan el modelo en los huecos"""
+        encoladas = 0
+        for audio_file in audio_files:
+            if not Path(audio_file).is_file():
+                print(f"⚠️ No existe, se omite: {audio_file}")
+                continue
+            self.planificador.enviar(str(Path(audio_file).resolve()), PRIORIDAD_BACKLOG)
+            encoladas += 1
+        if encoladas:
+            print(f"📋 {encoladas} grabaciones en cola para re-transcribir")
+            
+    def _aplicar_configuracion(self, recibido=None, nueva=None, cambiadas=()):
+        """Aplica un config.json modificado (hilo del despachador)"""
+        secciones = {clave.split('.')[0] for clave in cambiadas}
+        aplicables = secciones & (SECCIONES_EN_CALIENTE | SECCIONES_MODELO)
+        # En sitio: los componentes conservan sus referencias a config y a sus secciones.
+        # Las demás (directorio_salida, la cola...) conservan su valor hasta reiniciar
+        actualizar_secciones(self.config, nueva, aplicables)
+        recargadas = [clave for clave in cambiadas if clave.split('.')[0] in aplicables]
+        if recargadas:
+            print(f"🔄 Configuración recargada: {', '.join(sorted(recargadas))}")
+        
+        if 'atajos' in secciones:
+            self.despachador.antirrebote = self.config['atajos'].get('antirrebote_ms', 250) / 1000
+            self.gestor_teclado.recargar_atajos()
+        if 'salidas' in secciones:
+            self.salidas.aplicar_configuracion()
+        if 'interfaz' in secciones:
+            self.interfaz.aplicar_configuracion()
+            self.interfaz.set_estado(self.estado.actual)
+        if secciones & SECCIONES_MODELO:
+            self.transcriptor.recargar_modelo()
+            
+        pendientes = secciones - SECCIONES_EN_CALIENTE - SECCIONES_MODELO
+        if pendientes:
+            print(f"ℹ️ Se aplicarán al reiniciar: {', '.join(sorted(pendientes))}")
+            
+    def _registrar_en_catalogo(self, salida):
+        """Indexa la transcripción, después de escribir sus archivos"""
+        self.catalogo.registrar(salida['texto'], salida['audio_file'], self.config, salida['metadatos'])
+            
+    def _ocupado(self):
+        """Hay una grabación en curso o trabajos en la cola"""
+        activos = self.planificador.resumen()
+        return self.grabando or bool(activos.get('pendiente') or activos.get('procesando'))
+            
+    def cancelar_transcripcion(self):
+        """Atajo de cancelación: encola el evento"""
+        self.despachador.enviar('cancelar')
+            
+    def _cancelar(self, recibido=None):
+        """Cancela la transcripción más reciente que siga pendiente o en curso"""
+        if self.planificador.cancelar_ultimo():
+            notificar("Transcripción cancelada")
+        print(f"📋 Cola de trabajos: {self.planificador.resumen()}")
+        self._actualizar_reposo()
             
     def _iniciar_timer_notificacion(self):
         """Inicia el timer para notificaciones periódicas"""
@@ -159,14 +430,23 @@ class ControladorPrincipal:
         """Lógica original de cierre limpio"""
         print("🛑 Cerrando programa...")
         
+        # No atender más eventos: a partir de aquí nadie más toca el estado
+        if self.vigilante:
+            self.vigilante.detener()
+        self.despachador.detener()
+        
         # Detener timer de notificaciones
         self._detener_timer_notificacion()
         
         # Asegurar que la grabación esté detenida
         if self.grabando:
             print("🔴 Deteniendo grabación antes de salir...")
-            self.grabando = False
+            self.estado.cambiar(IDLE)
             self.grabador.stop_recording()
+            if self.sesion_streaming:
+                self.sesion_streaming.cancelar()
+            
+        self.grabador.cerrar_entrada()
             
         # Intentar liberar recursos del teclado
         try:
@@ -178,8 +458,10 @@ class ControladorPrincipal:
         # Cerrar interfaz visual
         self.interfaz.cerrar()
         
-        # Cerrar ThreadPool
-        self.executor.shutdown(wait=False)
+        # Detener el hilo de inferencia (los trabajos pendientes quedan en disco)
+        self.planificador.detener()
+        self.salidas.detener()
+        self.archivador.detener()
         
         # Asegurar el cierre de hilos activos (excluyendo el principal)
         for thread in threading.enumerate():
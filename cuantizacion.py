@@ -0,0 +1,54 @@
+"""
+Carga de modelos Whisper con cuantización int8 opcional y caché de los pesos cuantizados
+"""
+import logging
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_CACHE = Path.home() / ".cache" / "transcriptor"
+
+def cuantizar_int8(modelo):
+    """Cuantización dinámica int8 de las capas lineales (pesos int8, activaciones float)"""
+    import torch
+    import whisper.model
+
+    # Whisper usa una subclase de Linear que quantize_dynamic no reconoce; en CPU y fp32
+    # se comporta igual que nn.Linear, así que basta con cambiarle la clase
+    for modulo in modelo.modules():
+        if type(modulo) is whisper.model.Linear:
+            modulo.__class__ = torch.nn.Linear
+
+    return torch.ao.quantization.quantize_dynamic(modelo, {torch.nn.Linear}, dtype=torch.qint8)
+
+def cargar_modelo_whisper(nombre, cuantizacion="none", directorio_cache=DIRECTORIO_CACHE):
+    """Carga un modelo en CPU; con 'int8' reutiliza los pesos cuantizados guardados en disco"""
+    import whisper
+
+    if cuantizacion != "int8":
+        return whisper.load_model(nombre, device="cpu")
+
+    import torch
+    # La versión de torch va en el nombre: un pickle de otra versión puede no cargar
+    ruta = Path(directorio_cache) / f"whisper-{nombre}-int8-torch{torch.__version__}.pt"
+    if ruta.exists():
+        try:
+            inicio = time.perf_counter()
+            modelo = torch.load(ruta, weights_only=False)
+            logger.info(f"Modelo int8 '{nombre}' leído de {ruta} en {time.perf_counter() - inicio:.1f}s")
+            return modelo.eval()
+        except Exception as e:
+            logger.warning(f"No se pudo leer el modelo cuantizado ({e}); se regenera")
+
+    inicio = time.perf_counter()
+    modelo = cuantizar_int8(whisper.load_model(nombre, device="cpu"))
+    logger.info(f"Modelo '{nombre}' cuantizado a int8 en {time.perf_counter() - inicio:.1f}s")
+    try:
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        temporal = ruta.with_suffix('.tmp')
+        torch.save(modelo, temporal)
+        temporal.replace(ruta)
+    except Exception as e:
+        logger.warning(f"No se pudo guardar el modelo cuantizado: {e}")
+    return modelo
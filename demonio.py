@@ -0,0 +1,520 @@
+#!/usr/bin/env python3
+"""
+Demonio de transcripción - Un único modelo compartido por varios clientes locales
+
+El servidor escucha en HTTP de loopback y, opcionalmente, en un socket Unix. Los trabajos
+(PCM o rutas de archivo) pasan por un único hilo de inferencia con una cola limitada.
+TranscriptorRemoto es el cliente ligero con la misma interfaz que Transcriptor.
+
+Uso:
+    python demonio.py
+    python demonio.py --socket /run/transcriptor/transcriptor.sock
+    python demonio.py --estado
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import threading
+import time
+import wave
+from concurrent.futures import wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import numpy as np
+
+from cascada_modelos import PoliticaCascada
+from procesamiento_audio import FS_WHISPER, preparar_para_whisper
+
+logger = logging.getLogger(__name__)
+
+HOSTS_LOCALES = ('127.0.0.1', '::1', 'localhost')
+FORMATOS_PCM = {'f32': np.float32, 's16': np.int16}
+SEGUNDOS_POR_TRABAJO = 5  # Estimación para la cabecera Retry-After cuando la cola está llena
+
+class ColaLlena(Exception):
+    """El demonio rechazó el trabajo por tener la cola llena"""
+
+def _leer_wav_pcm(ruta):
+    """(bytes PCM, fs) de un WAV mono de 16 bits, o None si hay que enviar la ruta"""
+    try:
+        with wave.open(str(ruta), 'rb') as f:
+            if f.getnchannels() != 1 or f.getsampwidth() != 2:
+                return None
+            return f.readframes(f.getnframes()), f.getframerate()
+    except (OSError, wave.Error, EOFError):
+        return None
+
+def _consulta(**parametros):
+    """Query string sin los parámetros opcionales vacíos (modelo, perfil)"""
+    return urlencode({k: v for k, v in parametros.items() if v is not None})
+
+def _segmentos_serializables(segmentos):
+    """Segmentos sin tokens: menos datos por el socket y siempre serializables a JSON"""
+    return [{k: v for k, v in s.items() if k != 'tokens'} for s in segmentos or []]
+
+class ServidorTranscripcion:
+    def __init__(self, config):
+        # Importación diferida: el cliente no necesita torch ni whisper
+        from planificador import PlanificadorTrabajos
+        from transcriptor import Transcriptor
+
+        self.config = config
+        opciones = config['demonio']
+        self.max_cola = opciones.get('max_cola', 8)
+        self.max_bytes = int(opciones.get('max_mb', 100) * 1024 * 1024)
+        self.timeout = opciones.get('timeout_segundos', 300)
+        self.rutas_permitidas = [Path(r).resolve() for r in opciones.get('rutas_permitidas', [])]
+
+        # El modelo se carga en segundo plano: el servidor acepta conexiones desde el arranque
+        self.transcriptor = Transcriptor(config, en_segundo_plano=True)
+        # Solo se usa ejecutar(): los trabajos del demonio no se persisten
+        self.planificador = PlanificadorTrabajos(
+            lambda trabajo, datos: None,
+            Path(config['directorio_salida']) / "cola_demonio.json"
+        )
+        self._lock = threading.Lock()
+        self._en_cola = 0  # Trabajos aceptados que aún no han terminado
+        self.atendidos = 0
+        self.rechazados = 0
+        self.inicio = time.time()
+        self._servidores = []
+        self.vigilante = None
+
+    def escuchar(self, host, puerto, ruta_socket=None, permisos_socket="660"):
+        """Abre el puerto HTTP de loopback y, si se indica, el socket Unix"""
+        if host not in HOSTS_LOCALES:
+            raise ValueError(f"El demonio no tiene autenticación: solo escucha en loopback, no en {host}")
+        self.planificador.iniciar()
+
+        servidor = ThreadingHTTPServer((host, puerto), _ManejadorHTTP)
+        servidor.demonio = self
+        self._servidores.append(servidor)
+        print(f"🌐 Escuchando en http://{host}:{puerto}")
+
+        if ruta_socket:
+            if not hasattr(socket, 'AF_UNIX'):
+                print("⚠️ Esta plataforma no admite sockets Unix; solo se usa HTTP")
+            else:
+                ruta = Path(ruta_socket)
+                ruta.parent.mkdir(parents=True, exist_ok=True)
+                if ruta.exists():
+                    ruta.unlink()  # Socket de una ejecución anterior
+                servidor_unix = _ServidorUnix(str(ruta), _ManejadorHTTP)
+                servidor_unix.demonio = self
+                os.chmod(ruta, int(str(permisos_socket), 8))
+                self._servidores.append(servidor_unix)
+                print(f"🔌 Escuchando en {ruta}")
+
+        for servidor in self._servidores:
+            threading.Thread(target=servidor.serve_forever, name="demonio", daemon=True).start()
+
+    def vigilar_configuracion(self, intervalo):
+        """Cambia de modelo sin cortar el servicio cuando se edita config.json"""
+        from recarga_config import (
+            VigilanteConfiguracion, actualizar_secciones, SECCIONES_EN_CALIENTE, SECCIONES_MODELO
+        )
+
+        def aplicar(nueva, cambiadas):
+            # Los parámetros de escucha, la cola y los directorios se leen solo al arrancar
+            secciones = {clave.split('.')[0] for clave in cambiadas}
+            actualizar_secciones(
+                self.config, nueva, secciones & (SECCIONES_EN_CALIENTE | SECCIONES_MODELO)
+            )
+            if secciones & SECCIONES_MODELO:
+                self.transcriptor.recargar_modelo()
+
+        self.vigilante = VigilanteConfiguracion(self.config, aplicar, intervalo=intervalo)
+        self.vigilante.iniciar()
+
+    def detener(self):
+        """Deja de aceptar conexiones y libera el modelo"""
+        if self.vigilante:
+            self.vigilante.detener()
+        for servidor in self._servidores:
+            servidor.shutdown()
+            servidor.server_close()
+            if isinstance(servidor, _ServidorUnix):
+                Path(servidor.server_address).unlink(missing_ok=True)
+        self.planificador.detener()
+        self.transcriptor.liberar_modelo()
+
+    def aceptar(self):
+        """Reserva un hueco en la cola; devuelve la posición o lanza ColaLlena"""
+        with self._lock:
+            if self._en_cola >= self.max_cola:
+                self.rechazados += 1
+                raise ColaLlena(self._en_cola)
+            self._en_cola += 1
+            return self._en_cola
+
+    def liberar(self):
+        with self._lock:
+            self._en_cola -= 1
+            self.atendidos += 1
+
+    def ruta_permitida(self, ruta):
+        """Los clientes solo pueden pedir archivos de los directorios configurados"""
+        ruta = Path(ruta).resolve()
+        return ruta.is_file() and any(ruta.is_relative_to(d) for d in self.rutas_permitidas)
+
+    def modelo_permitido(self, modelo):
+        """Solo los modelos configurados: un nombre o ruta arbitrarios cargarían otro modelo en memoria"""
+        cascada = self.config.get('cascada_modelos', {})
+        permitidos = {self.config.get('whisper_model', 'base'), self.transcriptor.nombre_modelo,
+                      *cascada.get('modelos', []), cascada.get('modelo_borrador')}
+        return modelo is None or (isinstance(modelo, str) and modelo in permitidos)
+
+    def transcribir(self, entrada, modelo, perfil, abandonado, iniciado=None):
+        """Encola el trabajo en el hilo de inferencia; devuelve un Future con el resultado
+
+        iniciado (opcional) se activa cuando el hilo de inferencia empieza con el trabajo.
+        """
+        def trabajo():
+            if abandonado.is_set():
+                return None  # El cliente se desconectó mientras esperaba
+            if iniciado is not None:
+                iniciado.set()
+            texto = self.transcriptor.transcribir_audio(entrada, modelo, perfil)
+            return {
+                'texto': texto,
+                'segmentos': _segmentos_serializables(self.transcriptor.ultimos_segmentos),
+                'metadatos': dict(self.transcriptor.ultimos_metadatos)
+            }
+        return self.planificador.ejecutar(trabajo)
+
+    def estado(self):
+        """Resumen para GET /estado"""
+        with self._lock:
+            en_cola = self._en_cola
+        return {
+            'modelo': self.config.get('whisper_model', 'base'),
+            'modelo_cargado': self.transcriptor.model is not None,
+            'en_cola': en_cola,
+            'max_cola': self.max_cola,
+            'atendidos': self.atendidos,
+            'rechazados': self.rechazados,
+            'activo_segundos': round(time.time() - self.inicio)
+        }
+
+class _ServidorUnix(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class _ManejadorHTTP(BaseHTTPRequestHandler):
+    """POST /transcribir (PCM o JSON con 'ruta'; ?stream=1 para espera larga en NDJSON) y GET /estado"""
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        self.demonio = self.server.demonio
+        self.timeout = self.demonio.timeout  # Un cliente colgado no retiene el hilo para siempre
+        super().setup()
+
+    def address_string(self):
+        # Por el socket Unix no hay dirección de cliente
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, formato, *args):
+        logger.debug(f"{self.address_string()} {formato % args}")
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/estado":
+            self._responder(200, self.demonio.estado())
+        else:
+            self._responder(404, {'error': 'ruta desconocida'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/transcribir":
+            self._responder(404, {'error': 'ruta desconocida'})
+            return
+        parametros = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        longitud = int(self.headers.get('Content-Length') or 0)
+        if longitud > self.demonio.max_bytes:
+            self._responder(413, {'error': f'máximo {self.demonio.max_bytes} bytes'})
+            return
+        try:
+            entrada, modelo, perfil = self._leer_trabajo(self.rfile.read(longitud), parametros)
+        except (ValueError, KeyError) as e:
+            self._responder(400, {'error': str(e)})
+            return
+        except PermissionError as e:
+            self._responder(403, {'error': str(e)})
+            return
+
+        # Contrapresión: con la cola llena se rechaza enseguida en vez de acumular memoria
+        try:
+            posicion = self.demonio.aceptar()
+        except ColaLlena as e:
+            self._responder(503, {'error': 'cola llena', 'en_cola': e.args[0]}, {
+                'Retry-After': str(e.args[0] * SEGUNDOS_POR_TRABAJO)
+            })
+            return
+
+        abandonado = threading.Event()
+        iniciado = threading.Event()
+        try:
+            futuro = self.demonio.transcribir(entrada, modelo, perfil, abandonado, iniciado)
+            if parametros.get('stream') == '1':
+                self._responder_espera_larga(futuro, posicion, iniciado)
+            else:
+                self._responder(200, futuro.result())
+        except (BrokenPipeError, ConnectionResetError):
+            abandonado.set()
+        except Exception as e:
+            logger.error(f"Error en el trabajo del demonio: {e}")
+            self._responder(500, {'error': str(e)})
+        finally:
+            self.demonio.liberar()
+
+    def _leer_trabajo(self, cuerpo, parametros):
+        """Entrada para Transcriptor.transcribir_audio (array float32 a 16 kHz o ruta), modelo y perfil"""
+        tipo = self.headers.get('Content-Type', '')
+        if tipo.startswith('application/json'):
+            peticion = json.loads(cuerpo)
+            if not isinstance(peticion, dict):
+                raise ValueError("se esperaba un objeto JSON")
+            ruta = peticion['ruta']
+            if not isinstance(ruta, str) or not self.demonio.ruta_permitida(ruta):
+                raise PermissionError(f"ruta no permitida: {ruta}")
+            modelo, perfil = self._validar_opciones(peticion)
+            return str(Path(ruta).resolve()), modelo, perfil
+
+        modelo, perfil = self._validar_opciones(parametros)
+        formato = parametros.get('formato', 'f32')
+        if formato not in FORMATOS_PCM:
+            raise ValueError(f"formato desconocido: {formato}")
+        fs = int(parametros.get('fs', FS_WHISPER))
+        if fs <= 0:
+            raise ValueError(f"frecuencia de muestreo no válida: {fs}")
+        audio = np.frombuffer(cuerpo, dtype=FORMATOS_PCM[formato])
+        return preparar_para_whisper(audio, fs), modelo, perfil
+
+    def _validar_opciones(self, opciones):
+        """Modelo y perfil pedidos; un modelo fuera de la configuración es un 400"""
+        modelo, perfil = opciones.get('modelo'), opciones.get('perfil')
+        if not self.demonio.modelo_permitido(modelo):
+            raise ValueError(f"modelo no permitido: {modelo}")
+        if perfil is not None and not isinstance(perfil, str):
+            raise ValueError(f"perfil no válido: {perfil}")
+        return modelo, perfil
+
+    def _responder(self, codigo, cuerpo, cabeceras=None):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(datos)))
+        self.send_header('Connection', 'close')
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _responder_espera_larga(self, futuro, posicion, iniciado):
+        """Espera larga en NDJSON por bloques: posición en cola, latidos y, al final, el resultado
+
+        Los segmentos no salen según se decodifican: model.transcribe no avisa por ventana, así
+        que llegan todos juntos con el evento 'fin'. Los latidos dicen si el trabajo sigue en la
+        cola ('esperando') o ya en inferencia ('procesando'), y detectan al cliente desconectado.
+        """
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        self._evento({'evento': 'en_cola', 'posicion': posicion})
+        # Latido mientras espera: un cliente desconectado se detecta antes de que llegue su turno
+        while not wait([futuro], timeout=1).done:
+            self._evento({'evento': 'procesando' if iniciado.is_set() else 'esperando'})
+        try:
+            resultado = futuro.result()
+        except Exception as e:
+            # Las cabeceras ya se enviaron: el error viaja como un evento más
+            logger.error(f"Error en el trabajo del demonio: {e}")
+            self._evento({'evento': 'error', 'error': str(e)})
+        else:
+            for segmento in resultado['segmentos']:
+                self._evento({'evento': 'segmento', **segmento})
+            self._evento({'evento': 'fin', 'texto': resultado['texto'], 'metadatos': resultado['metadatos']})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _evento(self, evento):
+        datos = (json.dumps(evento, ensure_ascii=False) + "\n").encode('utf-8')
+        self.wfile.write(f"{len(datos):X}\r\n".encode() + datos + b"\r\n")
+        self.wfile.flush()
+
+class _ConexionUnix(http.client.HTTPConnection):
+    """HTTPConnection sobre un socket Unix"""
+    def __init__(self, ruta, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.ruta = ruta
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.ruta)
+
+class TranscriptorRemoto:
+    """Cliente del demonio con la interfaz de Transcriptor que usa el controlador"""
+    def __init__(self, config):
+        self.config = config
+        opciones = config['demonio']
+        self.host = opciones.get('host', '127.0.0.1')
+        self.puerto = opciones.get('puerto', 8765)
+        self.ruta_socket = opciones.get('socket_unix') if hasattr(socket, 'AF_UNIX') else None
+        self.timeout = opciones.get('timeout_segundos', 300)
+        self.reintentos = opciones.get('reintentos_cola_llena', 3)
+        # La cascada se decide aquí con las estimaciones por defecto; el modelo vive en el demonio
+        self.politica = PoliticaCascada(config)
+        self.ultimos_metadatos = {}
+        self.ultimos_segmentos = []
+
+    def _conexion(self):
+        if self.ruta_socket and Path(self.ruta_socket).exists():
+            return _ConexionUnix(self.ruta_socket, self.timeout)
+        return http.client.HTTPConnection(self.host, self.puerto, timeout=self.timeout)
+
+    def _peticion(self, metodo, ruta, cuerpo=None, cabeceras=None):
+        """Devuelve la respuesta abierta; reintenta si la cola del demonio está llena"""
+        for intento in range(self.reintentos + 1):
+            conexion = self._conexion()
+            conexion.request(metodo, ruta, body=cuerpo, headers=cabeceras or {})
+            respuesta = conexion.getresponse()
+            if respuesta.status != 503 or intento == self.reintentos:
+                return respuesta
+            espera = int(respuesta.getheader('Retry-After') or SEGUNDOS_POR_TRABAJO)
+            respuesta.read()
+            conexion.close()
+            logger.info(f"Demonio ocupado; reintento en {espera}s")
+            time.sleep(espera)
+
+    def disponible(self):
+        """Indica si el demonio responde"""
+        try:
+            return self.estado() is not None
+        except OSError:
+            return False
+
+    def estado(self):
+        respuesta = self._peticion("GET", "/estado")
+        return json.loads(respuesta.read()) if respuesta.status == 200 else None
+
+    def _enviar(self, audio, modelo, perfil=None, stream=False):
+        """Abre la petición de transcripción de un array float32 a 16 kHz o de una ruta"""
+        opciones = {'modelo': modelo, 'perfil': perfil}
+        if isinstance(audio, str):
+            # Un WAV se envía como PCM: el demonio no necesita poder leer el archivo
+            wav = _leer_wav_pcm(audio)
+            if wav is not None:
+                cuerpo, fs = wav
+                consulta = _consulta(formato='s16', fs=fs, stream=int(stream), **opciones)
+                return self._peticion("POST", f"/transcribir?{consulta}", cuerpo,
+                                      {'Content-Type': 'application/octet-stream'})
+            cuerpo = json.dumps({'ruta': str(Path(audio).resolve()), **opciones}).encode('utf-8')
+            return self._peticion("POST", f"/transcribir?stream={int(stream)}", cuerpo,
+                                  {'Content-Type': 'application/json'})
+        consulta = _consulta(formato='f32', fs=FS_WHISPER, stream=int(stream), **opciones)
+        cuerpo = np.ascontiguousarray(audio, dtype=np.float32).tobytes()
+        return self._peticion("POST", f"/transcribir?{consulta}", cuerpo,
+                              {'Content-Type': 'application/octet-stream'})
+
+    def transcribir_stream(self, audio, modelo=None, perfil=None):
+        """Genera los eventos NDJSON del demonio (en_cola, esperando/procesando, segmento, fin)"""
+        respuesta = self._enviar(audio, modelo, perfil, stream=True)
+        if respuesta.status != 200:
+            raise RuntimeError(json.loads(respuesta.read()).get('error'))
+        for linea in respuesta:
+            if linea.strip():
+                yield json.loads(linea)
+
+    def elegir_modelo(self, audio):
+        """Modelo por cascada si está activada; si no, el que tenga el demonio (None)"""
+        if self.politica.activado:
+            from procesamiento_audio import duracion_audio
+            return self.politica.elegir(duracion_audio(audio))
+        return None
+
+    def transcribir_audio(self, audio, modelo=None, perfil=None):
+        """Transcribe en el demonio; como Transcriptor, devuelve "" si falla"""
+        print("📝 Transcribiendo en el demonio...")
+        self.ultimos_segmentos = []
+        try:
+            respuesta = self._enviar(audio, modelo, perfil)
+            resultado = json.loads(respuesta.read())
+            if respuesta.status != 200:
+                logger.error(f"El demonio rechazó el trabajo ({respuesta.status}): {resultado.get('error')}")
+                return ""
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            logger.error(f"Error al comunicar con el demonio: {e}")
+            return ""
+        self.ultimos_metadatos = resultado['metadatos']
+        self.ultimos_segmentos = resultado['segmentos']
+        print("✅ Transcripción completa.")
+        return resultado['texto'].strip()
+
+    def transcribir_resultado(self, audio):
+        """Resultado completo (texto y segmentos) con el modelo principal, para el streaming"""
+        texto = self.transcribir_audio(audio, self.config.get('whisper_model', 'base'))
+        if not texto and not self.ultimos_segmentos:
+            return None
+        return {'text': texto, 'segments': self.ultimos_segmentos}
+
+    def precalentar(self):
+        """El demonio mantiene el modelo cargado: nada que hacer"""
+
+    def recargar_modelo(self):
+        """El demonio recarga su modelo al cambiar su propio config.json"""
+        
+    def liberar_modelo(self):
+        """El modelo pertenece al demonio: no se libera desde el cliente"""
+
+def main():
+    """Punto de entrada del demonio"""
+    from utils import cargar_configuracion
+
+    parser = argparse.ArgumentParser(description="Demonio de transcripción compartido")
+    parser.add_argument("--host", help="Dirección de loopback (por defecto, la de config.json)")
+    parser.add_argument("--puerto", type=int, help="Puerto HTTP")
+    parser.add_argument("--socket", help="Ruta del socket Unix adicional")
+    parser.add_argument("--estado", action="store_true", help="Consulta un demonio en marcha y sale")
+    args = parser.parse_args()
+
+    config = cargar_configuracion()
+    opciones = config['demonio']
+    if args.host:
+        opciones['host'] = args.host
+    if args.puerto:
+        opciones['puerto'] = args.puerto
+    if args.socket:
+        opciones['socket_unix'] = args.socket
+
+    if args.estado:
+        try:
+            print(json.dumps(TranscriptorRemoto(config).estado(), indent=2, ensure_ascii=False))
+        except OSError as e:
+            print(f"❌ El demonio no responde: {e}")
+        return
+
+    servidor = ServidorTranscripcion(config)
+    servidor.escuchar(opciones['host'], opciones['puerto'], opciones.get('socket_unix'),
+                      opciones.get('permisos_socket', "660"))
+    if config['recarga_configuracion']['activado']:
+        servidor.vigilar_configuracion(config['recarga_configuracion']['intervalo_segundos'])
+    parada = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: parada.set())
+    try:
+        parada.wait()
+    except KeyboardInterrupt:
+        pass
+    print("🛑 Deteniendo el demonio...")
+    servidor.detener()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Despachador de eventos - Un único hilo con la máquina de estados del controlador
+"""
+import queue
+import threading
+import time
+
+# Estados del dictado y transiciones permitidas
+IDLE = 'idle'
+GRABANDO = 'grabando'
+DETENIENDO = 'deteniendo'
+TRANSCRIBIENDO = 'transcribiendo'
+
+TRANSICIONES = {
+    IDLE: (GRABANDO,),
+    GRABANDO: (DETENIENDO, IDLE),
+    DETENIENDO: (TRANSCRIBIENDO, IDLE),
+    # Se puede volver a grabar mientras se transcribe la grabación anterior
+    TRANSCRIBIENDO: (GRABANDO, IDLE),
+}
+
+class TransicionInvalida(Exception):
+    """Cambio de estado no permitido por TRANSICIONES"""
+
+class MaquinaEstados:
+    def __init__(self, on_cambio=None):
+        self.actual = IDLE
+        self.desde = time.perf_counter()  # Momento de la última transición
+        # Callback (anterior, nuevo, marca) tras cada transición
+        self.on_cambio = on_cambio
+
+    def cambiar(self, nuevo):
+        """Aplica una transición; solo la llama el hilo del despachador"""
+        if nuevo == self.actual:
+            return
+        if nuevo not in TRANSICIONES[self.actual]:
+            raise TransicionInvalida(f"{self.actual} → {nuevo}")
+        anterior, self.actual = self.actual, nuevo
+        self.desde = time.perf_counter()
+        if self.on_cambio:
+            self.on_cambio(anterior, nuevo, self.desde)
+
+class Despachador:
+    """Serializa los eventos (teclado, fin de trabajos...) en un hilo propio
+
+    Los callbacks del teclado solo encolan, así que el hook nunca se bloquea, y la lógica de
+    control no necesita locks porque todos los manejadores se ejecutan en el mismo hilo.
+    """
+    def __init__(self, antirrebote_ms=250):
+        self.antirrebote = antirrebote_ms / 1000
+        self._manejadores = {}
+        self._ultimo = {}  # evento -> marca del último aceptado (solo los que tienen antirrebote)
+        self._cola = queue.Queue()
+        self._hilo = None
+
+    def registrar(self, evento, funcion, antirrebote=False):
+        """Asocia un manejador; con antirrebote se descartan repeticiones muy seguidas"""
+        self._manejadores[evento] = (funcion, antirrebote)
+
+    def enviar(self, evento, **datos):
+        """Encola un evento con su marca de llegada; devuelve False si se descarta por rebote"""
+        recibido = time.perf_counter()
+        if self._manejadores.get(evento, (None, False))[1]:
+            if recibido - self._ultimo.get(evento, float('-inf')) < self.antirrebote:
+                return False
+            self._ultimo[evento] = recibido
+        self._cola.put((evento, recibido, datos))
+        return True
+
+    def iniciar(self):
+        """Arranca el hilo del despachador"""
+        self._hilo = threading.Thread(target=self._bucle, name="despachador", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout=5):
+        """Termina tras el evento en curso; los que queden en cola se descartan"""
+        if self._hilo is None:
+            return
+        self._cola.put(None)
+        if threading.current_thread() is not self._hilo:
+            self._hilo.join(timeout)
+        self._hilo = None
+
+    def _bucle(self):
+        while True:
+            elemento = self._cola.get()
+            if elemento is None:
+                return
+            evento, recibido, datos = elemento
+            funcion = self._manejadores.get(evento, (None, False))[0]
+            if funcion is None:
+                print(f"⚠️ Evento sin manejador: {evento}")
+                continue
+            try:
+                funcion(recibido=recibido, **datos)
+            except Exception as e:
+                print(f"❌ Error al procesar el evento '{evento}': {e}")
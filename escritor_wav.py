@@ -0,0 +1,126 @@
+"""
+Escritor WAV incremental - Vuelca el audio a disco durante la captura y repara grabaciones interrumpidas
+"""
+import json
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+TAM_CABECERA = 44
+SUFIJO_DIARIO = ".journal"
+
+def _cabecera_wav(fs, canales, bytes_datos):
+    """Cabecera RIFF/WAVE PCM de 16 bits para la cantidad de datos indicada"""
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + bytes_datos, b'WAVE',
+        b'fmt ', 16, 1, canales, fs, fs * canales * 2, canales * 2, 16,
+        b'data', bytes_datos
+    )
+
+class EscritorWAV:
+    def __init__(self, ruta, buffer, intervalo=0.5, intervalo_cabecera=5.0):
+        self.ruta = Path(ruta)
+        self.ruta_diario = Path(f"{ruta}{SUFIJO_DIARIO}")
+        self.buffer = buffer
+        self.intervalo = intervalo
+        self.intervalo_cabecera = intervalo_cabecera
+
+        self._archivo = None
+        self._escritas = 0  # Muestras ya volcadas al archivo
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        """Crea el archivo y el diario, y arranca el hilo de volcado"""
+        self._archivo = open(self.ruta, 'wb')
+        self._archivo.write(_cabecera_wav(self.buffer.fs, self.buffer.canales, 0))
+        self._escribir_diario()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def _bucle(self):
+        """Vuelca el audio nuevo periódicamente y corrige la cabecera cada cierto tiempo"""
+        ultima_cabecera = time.monotonic()
+        while not self._detener.wait(self.intervalo):
+            try:
+                self._volcar()
+                if time.monotonic() - ultima_cabecera >= self.intervalo_cabecera:
+                    self._actualizar_cabecera()
+                    self._escribir_diario()
+                    ultima_cabecera = time.monotonic()
+            except Exception as e:
+                print(f"❌ Error al escribir audio en disco: {e}")
+
+    def _volcar(self):
+        """Escribe al final del archivo las muestras capturadas desde el último volcado"""
+        for vista in self.buffer.iterar(self._escritas):
+            self._archivo.write(vista)
+            self._escritas += len(vista)
+
+    def _actualizar_cabecera(self):
+        """Reescribe los tamaños de la cabecera y fuerza los datos a disco"""
+        bytes_datos = self._escritas * self.buffer.canales * 2
+        self._archivo.seek(0)
+        self._archivo.write(_cabecera_wav(self.buffer.fs, self.buffer.canales, bytes_datos))
+        self._archivo.seek(0, os.SEEK_END)
+        self._archivo.flush()
+        os.fsync(self._archivo.fileno())
+
+    def _escribir_diario(self):
+        """Registra que la grabación está en curso para poder repararla tras un cierre abrupto"""
+        diario = {
+            "ruta": str(self.ruta),
+            "fs": self.buffer.fs,
+            "canales": self.buffer.canales,
+            "muestras": self._escritas,
+            "actualizado": datetime.now().isoformat()
+        }
+        with open(self.ruta_diario, 'w', encoding='utf-8') as f:
+            json.dump(diario, f)
+
+    def finalizar(self):
+        """Vuelca lo que falta, cierra la cabecera y elimina el diario; devuelve las muestras escritas"""
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join()
+        self._volcar()
+        self._actualizar_cabecera()
+        self._archivo.close()
+        self.ruta_diario.unlink(missing_ok=True)
+        return self._escritas
+
+def recuperar_grabaciones(directorio):
+    """Repara los WAV que quedaron a medias (con diario) y devuelve sus rutas"""
+    recuperadas = []
+    for ruta_diario in Path(directorio).glob(f"*.wav{SUFIJO_DIARIO}"):
+        ruta_wav = Path(str(ruta_diario)[:-len(SUFIJO_DIARIO)])
+        try:
+            with open(ruta_diario, 'r', encoding='utf-8') as f:
+                diario = json.load(f)
+
+            if ruta_wav.exists():
+                # Los datos válidos son todo lo que hay tras la cabecera, en muestras completas
+                alineacion = diario['canales'] * 2
+                bytes_datos = max(ruta_wav.stat().st_size - TAM_CABECERA, 0)
+                bytes_datos -= bytes_datos % alineacion
+
+                if bytes_datos > 0:
+                    with open(ruta_wav, 'r+b') as f:
+                        f.truncate(TAM_CABECERA + bytes_datos)
+                        f.seek(0)
+                        f.write(_cabecera_wav(diario['fs'], diario['canales'], bytes_datos))
+                    duracion = bytes_datos / alineacion / diario['fs']
+                    print(f"🩹 Grabación recuperada: {ruta_wav} ({duracion:.1f}s)")
+                    recuperadas.append(str(ruta_wav))
+                else:
+                    ruta_wav.unlink()
+
+            ruta_diario.unlink()
+        except Exception as e:
+            print(f"⚠️ No se pudo recuperar {ruta_wav}: {e}")
+
+    return recuperadas
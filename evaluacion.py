@@ -0,0 +1,47 @@
+"""
+Evaluación de transcripciones - Tasa de error por palabra y utilidades de medición
+"""
+import re
+import sys
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+def memoria_pico_mb():
+    """RSS máximo del proceso en MB (resource en Unix, psutil en Windows si está instalado)"""
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux lo da en KB y macOS en bytes
+        return pico / 1024 / 1024 if sys.platform == "darwin" else pico / 1024
+    except ImportError:
+        if psutil is None:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / 1024 / 1024
+
+def normalizar(texto):
+    """Minúsculas y sin puntuación, para comparar solo las palabras"""
+    return re.sub(r"[^\w\s]", " ", texto.lower()).split()
+
+def tasa_error_palabras(referencia, hipotesis):
+    """WER: (sustituciones + borrados + inserciones) / palabras de la referencia"""
+    ref = normalizar(referencia)
+    hip = normalizar(hipotesis)
+    if not ref:
+        return 0.0 if not hip else 1.0
+
+    # Distancia de edición por palabras con una sola fila de la matriz
+    anterior = list(range(len(hip) + 1))
+    for i, palabra_ref in enumerate(ref, 1):
+        actual = [i] + [0] * len(hip)
+        for j, palabra_hip in enumerate(hip, 1):
+            actual[j] = min(
+                anterior[j] + 1,
+                actual[j - 1] + 1,
+                anterior[j - 1] + (palabra_ref != palabra_hip)
+            )
+        anterior = actual
+    return anterior[-1] / len(ref)
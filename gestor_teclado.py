@@ -2,17 +2,23 @@
 Gestor de atajos de teclado
 """
 import keyboard
-import threading
 
 class GestorTeclado:
     def __init__(self, config):
         self.config = config
         self.on_grabar = None  # Callback para grabar
         self.on_cerrar = None  # Callback para cerrar
+        self.on_cancelar = None  # Callback para cancelar la última transcripción
         self._activo = False
+        self._registrados = []  # Atajos añadidos, para poder cambiarlos en caliente
         
     def iniciar(self):
         """Inicia el gestor de teclado"""
+        self.registrar_atajos()
+        self.esperar()
+        
+    def registrar_atajos(self):
+        """Registra los atajos sin bloquear"""
         self._activo = True
         
         # Obtener atajos de la configuración
@@ -20,17 +26,40 @@ class GestorTeclado:
         atajo_cerrar = self.config['atajos']['cerrar']
         
         # Asignar los atajos de teclado
-        keyboard.add_hotkey(atajo_grabar, self._manejar_grabar)
-        keyboard.add_hotkey(atajo_cerrar, self._manejar_cerrar)
+        self._registrados.append(keyboard.add_hotkey(atajo_grabar, self._manejar_grabar))
+        self._registrados.append(keyboard.add_hotkey(atajo_cerrar, self._manejar_cerrar))
         
-        # Esperar eventos (bloquea)
+        # Atajo opcional para cancelar la transcripción en curso
+        atajo_cancelar = self.config['atajos'].get('cancelar')
+        if atajo_cancelar:
+            self._registrados.append(keyboard.add_hotkey(atajo_cancelar, self._manejar_cancelar))
+            
+    def recargar_atajos(self):
+        """Sustituye los atajos por los de la configuración actual"""
+        for atajo in self._registrados:
+            try:
+                keyboard.remove_hotkey(atajo)
+            except (KeyError, ValueError):
+                pass
+        self._registrados = []
+        self.registrar_atajos()
+        print(f"⌨️ Atajos actualizados: grabar {self.config['atajos']['grabar']}, "
+              f"cerrar {self.config['atajos']['cerrar']}")
+            
+    def esperar(self):
+        """Espera eventos de teclado (bloquea)"""
         keyboard.wait()
         
     def _manejar_grabar(self):
         """Maneja el atajo de grabación"""
         if self.on_grabar and self._activo:
-            # Ejecutar en un hilo separado para no bloquear
-            threading.Thread(target=self.on_grabar).start()
+            # El callback solo encola el evento en el despachador: no bloquea el hook
+            self.on_grabar()
+            
+    def _manejar_cancelar(self):
+        """Maneja el atajo de cancelación"""
+        if self.on_cancelar and self._activo:
+            self.on_cancelar()
             
     def _manejar_cerrar(self):
         """Maneja el atajo de cierre"""
@@ -41,6 +70,7 @@ class GestorTeclado:
     def detener(self):
         """Detiene el gestor y libera recursos"""
         self._activo = False
+        self._registrados = []
         try:
             keyboard.unhook_all()
         except Exception as e:
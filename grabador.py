@@ -3,52 +3,96 @@ Módulo de grabación de audio - Evolución de recorder.py
 """
 import sounddevice as sd
 import numpy as np
-import wave
 import os
+import threading
 from pathlib import Path
+from time import perf_counter
+
+from buffer_audio import BufferAudio
+from escritor_wav import EscritorWAV
+from procesamiento_audio import preparar_para_whisper
 
 class Grabador:
     def __init__(self, config):
         self.config = config
         # Variables globales para el control (mantener como el original)
         self.is_recording = False
-        self.fs = 44100  # Frecuencia de muestreo
-        self.audio_data = []
+        # Frecuencia de muestreo (16000 captura directamente en el formato de Whisper)
+        self.fs = config.get('frecuencia_muestreo', 44100)
+        self.audio = BufferAudio(self.fs)
+        self.escritor = None
+        self.filepath = None
+        self.desbordamientos = 0  # Bloques perdidos por el callback en la grabación actual
+        self.primer_bloque = None
+        self._detenido = threading.Event()
+        
+        # Modo de entrada siempre abierta: el stream no se abre al pulsar el atajo y los
+        # últimos preroll_ms antes de empezar se añaden al principio de la grabación
+        opciones = config.get('entrada_audio', {})
+        self.siempre_abierta = opciones.get('siempre_abierta', False)
+        self._stream = None
+        self._preroll = None
+        self._pos_preroll = 0
+        self._lleno_preroll = 0
+        self._volcar_preroll = False
+        if self.siempre_abierta:
+            muestras = int(self.fs * opciones.get('preroll_ms', 500) / 1000)
+            self._preroll = np.zeros((max(muestras, 1), 1), dtype=np.int16)
         
         # Asegurar que el directorio de salida existe
         self.directorio_salida = Path(config['directorio_salida'])
         self.directorio_salida.mkdir(exist_ok=True)
         
-    def start_recording(self):
-        """Inicia la grabación"""
+    def start_recording(self, filename="grabacion.wav"):
+        """Inicia la grabación y el volcado incremental a disco"""
+        # Buffer nuevo por grabación: la anterior puede seguir transcribiéndose
+        self.audio = BufferAudio(self.fs)
+        self.desbordamientos = 0
+        self.primer_bloque = None  # perf_counter del primer bloque capturado
+        self._detenido.clear()
+        self.filepath = self.directorio_salida / filename
+        
+        try:
+            self.escritor = EscritorWAV(self.filepath, self.audio)
+            self.escritor.iniciar()
+        except Exception as e:
+            print(f"❌ Error al crear archivo de audio: {e}")
+            self.escritor = None
+            
+        if self.siempre_abierta and not self.entrada_abierta():
+            self.abrir_entrada()  # P. ej. tras desconectar el micrófono
+        # El callback copia el pre-roll al buffer en su siguiente bloque, sin huecos ni solapes
+        self._volcar_preroll = self.entrada_abierta()
         self.is_recording = True
-        self.audio_data = []
         print("🎙️ Grabación iniciada. Pulsa Alt + Shift + X para detener.")
         
-    def stop_recording(self, filename="grabacion.wav"):
-        """Detiene la grabación y guarda el archivo"""
+    def detener_captura(self):
+        """Deja de acumular audio sin tocar el archivo"""
         self.is_recording = False
-        print("✅ Grabación detenida.")
+        self._detenido.set()
+        
+    def audio_para_whisper(self):
+        """Devuelve la grabación como float32 mono a 16 kHz, sin pasar por disco"""
+        return preparar_para_whisper(self.audio.leer(), self.fs)
         
-        # Construir ruta completa del archivo
-        filepath = self.directorio_salida / filename
+    def stop_recording(self):
+        """Detiene la grabación y cierra el archivo (solo falta el último volcado y la cabecera)"""
+        self.detener_captura()
+        print("✅ Grabación detenida.")
         
+        if not self.escritor:
+            return None
+            
         try:
-            # Convertir la lista de fragmentos en un array
-            if self.audio_data:
-                audio = np.concatenate(self.audio_data, axis=0)
-                
-                # Guardar el audio en un archivo WAV
-                with wave.open(str(filepath), 'wb') as f:
-                    f.setnchannels(1)
-                    f.setsampwidth(2)  # 16 bits = 2 bytes
-                    f.setframerate(self.fs)
-                    f.writeframes(audio.tobytes())
-                    
-                print(f"💾 Archivo guardado: {filepath}")
-                return str(filepath)
+            escritor, self.escritor = self.escritor, None
+            muestras = escritor.finalizar()
+            
+            if muestras > 0:
+                print(f"💾 Archivo guardado: {self.filepath}")
+                return str(self.filepath)
             else:
                 print("⚠️ No hay datos de audio para guardar")
+                os.remove(self.filepath)
                 return None
                 
         except Exception as e:
@@ -58,13 +102,78 @@ class Grabador:
     def audio_callback(self, indata, frames, time, status):
         """Callback para capturar audio"""
         if status:
+            if status.input_overflow:
+                self.desbordamientos += 1
             print(f"⚠️ Estado del audio: {status}")
             
         if self.is_recording:
-            self.audio_data.append(indata.copy())
+            if self.primer_bloque is None:
+                self.primer_bloque = perf_counter()
+            if self._volcar_preroll:
+                self._volcar_preroll = False
+                self._copiar_preroll()
+            self.audio.escribir(indata)
+        elif self._preroll is not None:
+            self._guardar_preroll(indata)
+            
+    def _guardar_preroll(self, datos):
+        """Escribe en el anillo de pre-roll sin reservar memoria (hilo de audio)"""
+        capacidad = len(self._preroll)
+        datos = datos[-capacidad:]
+        n = len(datos)
+        fin = self._pos_preroll + n
+        if fin <= capacidad:
+            self._preroll[self._pos_preroll:fin] = datos
+        else:
+            corte = capacidad - self._pos_preroll
+            self._preroll[self._pos_preroll:] = datos[:corte]
+            self._preroll[:fin - capacidad] = datos[corte:]
+        self._pos_preroll = fin % capacidad
+        self._lleno_preroll = min(capacidad, self._lleno_preroll + n)
+        
+    def _copiar_preroll(self):
+        """Añade el contenido del anillo, del más antiguo al más reciente, al buffer nuevo"""
+        if self._lleno_preroll < len(self._preroll):
+            self.audio.escribir(self._preroll[:self._lleno_preroll])
+        else:
+            self.audio.escribir(self._preroll[self._pos_preroll:])
+            self.audio.escribir(self._preroll[:self._pos_preroll])
+        self._pos_preroll = 0
+        self._lleno_preroll = 0
+            
+    def entrada_abierta(self):
+        """Indica si el stream permanente está abierto y capturando"""
+        return self._stream is not None and self._stream.active
+        
+    def abrir_entrada(self):
+        """Abre el stream permanente del modo siempre abierto; devuelve si se pudo"""
+        self.cerrar_entrada()
+        try:
+            self._stream = sd.InputStream(
+                samplerate=self.fs,
+                channels=1,
+                dtype=np.int16,
+                callback=self.audio_callback
+            )
+            self._stream.start()
+            print(f"🎧 Entrada de audio abierta (pre-roll de {len(self._preroll) * 1000 // self.fs} ms)")
+            return True
+        except Exception as e:
+            print(f"⚠️ No se pudo abrir la entrada permanente; se abrirá en cada grabación: {e}")
+            self._stream = None
+            return False
+            
+    def cerrar_entrada(self):
+        """Cierra el stream permanente"""
+        if self._stream is not None:
+            try:
+                self._stream.close()
+            except Exception as e:
+                print(f"⚠️ Error al cerrar la entrada de audio: {e}")
+            self._stream = None
             
     def iniciar_grabacion(self):
-        """Hilo de grabación continua"""
+        """Hilo de grabación: abre el stream y espera a la parada sin sondeo"""
         try:
             with sd.InputStream(
                 samplerate=self.fs, 
@@ -72,8 +181,7 @@ class Grabador:
                 dtype=np.int16, 
                 callback=self.audio_callback
             ):
-                while self.is_recording:
-                    sd.sleep(100)
+                self._detenido.wait()
         except Exception as e:
             print(f"❌ Error en la grabación: {e}")
             self.is_recording = False
\ No newline at end of file
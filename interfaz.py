@@ -5,6 +5,7 @@ import os
 import threading
 import queue
 import sys
+import time
 
 # Configurar variables de entorno para Tcl/Tk antes de importar tkinter
 if sys.platform == "win32":
@@ -35,12 +36,16 @@ class InterfazVisual:
         self.colores = {
             'idle': '#00FF00',      # Verde
             'grabando': '#FF0000',   # Rojo
+            'deteniendo': '#FF8000',  # Naranja
             'transcribiendo': '#0080FF'  # Azul
         }
         
         # Estado actual
         self.estado_actual = 'idle'
         
+        # Callback con los segundos entre el cambio de estado y su pintado
+        self.on_pintado = None
+        
         # Verificar disponibilidad de tkinter
         if not TKINTER_DISPONIBLE:
             print("ℹ️ Interfaz visual deshabilitada. La aplicación funcionará sin indicador visual.")
@@ -92,8 +97,10 @@ class InterfazVisual:
             self.canvas.bind("<ButtonPress-1>", self._iniciar_arrastre)
             self.canvas.bind("<B1-Motion>", self._arrastrar)
             
-            # Procesar comandos de la cola
-            self._procesar_cola()
+            # Los comandos despiertan al bucle de Tk con un evento virtual, sin sondeo.
+            # Lo encolado antes de arrancar el bucle se procesa en cuanto arranca
+            self.root.bind("<<Comando>>", lambda event: self._procesar_cola())
+            self.root.after_idle(self._procesar_cola)
             
             # Iniciar el bucle principal
             self.root.mainloop()
@@ -122,20 +129,32 @@ class InterfazVisual:
         self.config['interfaz']['posicion_y'] = y
         
     def _procesar_cola(self):
-        """Procesa comandos de la cola"""
+        """Procesa comandos de la cola (en el hilo de Tk)"""
         try:
             while True:
                 comando = self.cola_comandos.get_nowait()
                 if comando['tipo'] == 'estado':
                     self._cambiar_color(comando['valor'])
+                    if self.on_pintado:
+                        self.root.update_idletasks()
+                        self.on_pintado(time.perf_counter() - comando['marca'])
+                elif comando['tipo'] == 'mover':
+                    self.root.geometry(f"+{comando['x']}+{comando['y']}")
                 elif comando['tipo'] == 'cerrar':
-                    self.root.quit()
+                    # destroy y no solo quit: al ocultarlo en caliente la ventana debe desaparecer
+                    self.root.destroy()
                     return
         except queue.Empty:
             pass
             
-        if self._ejecutando:
-            self.root.after(100, self._procesar_cola)
+    def _despertar(self):
+        """Avisa al bucle de Tk de que hay comandos en la cola"""
+        if self.root is None:
+            return  # Aún no ha arrancado: los procesará al empezar
+        try:
+            self.root.event_generate("<<Comando>>", when="tail")
+        except (RuntimeError, tk.TclError):
+            pass  # El bucle no está en marcha (arrancando o cerrando)
             
     def _cambiar_color(self, estado):
         """Cambia el color del cuadrado"""
@@ -146,19 +165,40 @@ class InterfazVisual:
             )
             self.estado_actual = estado
             
-    def set_estado(self, estado):
-        """Cambia el estado de la interfaz"""
+    def set_estado(self, estado, marca=None):
+        """Cambia el estado de la interfaz; marca es el perf_counter del cambio de estado"""
         if TKINTER_DISPONIBLE and self._ejecutando:
-            self.cola_comandos.put({'tipo': 'estado', 'valor': estado})
+            self.cola_comandos.put({
+                'tipo': 'estado',
+                'valor': estado,
+                'marca': marca if marca is not None else time.perf_counter()
+            })
+            self._despertar()
         else:
             # Mostrar estado en consola como alternativa
             estados_emoji = {
                 'idle': '🟢',
                 'grabando': '🔴',
+                'deteniendo': '🟠',
                 'transcribiendo': '🔵'
             }
             print(f"{estados_emoji.get(estado, '⚪')} Estado: {estado}")
             
+    def aplicar_configuracion(self):
+        """Muestra, oculta o mueve el indicador según la configuración actual"""
+        opciones = self.config['interfaz']
+        if opciones['mostrar_indicador'] and not self._ejecutando:
+            self.iniciar()
+        elif not opciones['mostrar_indicador'] and self._ejecutando:
+            self.cerrar()
+        elif self._ejecutando:
+            self.cola_comandos.put({
+                'tipo': 'mover',
+                'x': opciones.get('posicion_x', 100),
+                'y': opciones.get('posicion_y', 100)
+            })
+            self._despertar()
+            
     def actualizar_tiempo(self, mensaje):
         """Actualiza el tooltip con el tiempo (para futuras mejoras)"""
         # Por ahora solo cambiamos el título de la ventana
@@ -171,5 +211,6 @@ class InterfazVisual:
         if self.root and TKINTER_DISPONIBLE:
             try:
                 self.cola_comandos.put({'tipo': 'cerrar'})
+                self._despertar()
             except:
                 pass
\ No newline at end of file
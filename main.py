@@ -2,6 +2,10 @@
 """
 Punto de entrada de la aplicación de grabación y transcripción v2.0
 """
+import time
+_INICIO = time.perf_counter()  # Antes de cualquier importación pesada
+
+import argparse
 import sys
 import os
 from pathlib import Path
@@ -11,14 +15,23 @@ Path("./grabaciones").mkdir(exist_ok=True)
 
 # Importar el controlador principal
 from controlador import ControladorPrincipal
+from utils import MedidorFases
 
 def main():
     """Función principal de la aplicación"""
+    parser = argparse.ArgumentParser(description="Grabación y transcripción con atajos de teclado")
+    parser.add_argument("--retranscribir", nargs="+", default=[], metavar="AUDIO",
+                        help="Grabaciones antiguas a transcribir de nuevo en segundo plano")
+    args = parser.parse_args()
+    
     print("🎙️ Iniciando aplicación de grabación y transcripción v2.0")
     
+    medidor = MedidorFases(_INICIO)
+    medidor.marcar("importaciones")
+    
     try:
-        controlador = ControladorPrincipal()
-        controlador.iniciar()
+        controlador = ControladorPrincipal(medidor)
+        controlador.iniciar(args.retranscribir)
     except KeyboardInterrupt:
         print("\n⚠️ Interrupción detectada")
         sys.exit(0)
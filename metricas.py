@@ -0,0 +1,137 @@
+"""
+Métricas - Tramos de tiempo por etapa en JSON lines y exportación opcional para Prometheus
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+CUBETAS = {
+    'tramo_segundos': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+    'rtf': (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5)
+}
+# Solo estas etiquetas pasan a Prometheus; el resto (p. ej. la grabación) solo va al JSONL
+ETIQUETAS_PROMETHEUS = ('tramo', 'modelo', 'resultado')
+PREFIJO = "transcriptor"
+
+class Metricas:
+    def __init__(self, config):
+        opciones = config.get('metricas', {})
+        self.activado = opciones.get('activado', False)
+        self.ruta_jsonl = Path(opciones.get('archivo_jsonl', './grabaciones/metricas.jsonl'))
+        ruta_prometheus = opciones.get('archivo_prometheus', '')
+        self.ruta_prometheus = Path(ruta_prometheus) if ruta_prometheus else None
+        self._lock = threading.Lock()
+        self._histogramas = {}  # (métrica, etiquetas) -> [cuentas por cubeta, suma, total]
+        self._contadores = {}   # (métrica, etiquetas) -> valor
+
+    @contextmanager
+    def tramo(self, nombre, **etiquetas):
+        """Mide el bloque y lo registra como tramo, también si lanza una excepción"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nombre, time.perf_counter() - inicio, **etiquetas)
+
+    def registrar(self, nombre, segundos, **etiquetas):
+        """Registra la duración de una etapa medida por otro medio"""
+        self.observar('tramo_segundos', segundos, tramo=nombre, **etiquetas)
+
+    def observar(self, metrica, valor, **etiquetas):
+        """Añade una observación al histograma de la métrica y al registro JSONL"""
+        if not self.activado:
+            return
+        clave = (metrica, self._etiquetas_prometheus(etiquetas))
+        with self._lock:
+            cuentas, suma, total = self._histogramas.get(clave, ([0] * len(CUBETAS[metrica]), 0.0, 0))
+            for i, limite in enumerate(CUBETAS[metrica]):
+                if valor <= limite:
+                    cuentas[i] += 1
+            self._histogramas[clave] = (cuentas, suma + valor, total + 1)
+            self._escribir({'metrica': metrica, 'valor': round(valor, 6), **etiquetas})
+
+    def contar(self, metrica, incremento=1, **etiquetas):
+        """Incrementa un contador (p. ej. desbordamientos del callback de audio)"""
+        if not self.activado:
+            return
+        clave = (metrica, self._etiquetas_prometheus(etiquetas))
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + incremento
+            self._escribir({'metrica': metrica, 'incremento': incremento, **etiquetas})
+
+    def registrar_inferencia(self, metadatos, **etiquetas):
+        """Tiempo de inferencia y RTF por modelo a partir de los metadatos del transcriptor"""
+        if metadatos.get('cache') or 'segundos' not in metadatos:
+            return  # Un acierto de caché no dice nada del modelo
+        modelo = metadatos.get('modelo')
+        self.registrar('inferencia', metadatos['segundos'], modelo=modelo, **etiquetas)
+        if 'vad_segundos' in metadatos:
+            self.registrar('vad', metadatos['vad_segundos'], **etiquetas)
+        if 'codificador_segundos' in metadatos:
+            # Con la caché del codificador, el coste de los reintentos se separa del primer intento
+            self.registrar('codificador', metadatos['codificador_segundos'], modelo=modelo, **etiquetas)
+            if metadatos.get('reintentos_decodificacion'):
+                self.registrar('reintentos_decodificacion', metadatos['reintentos_segundos'],
+                               modelo=modelo, **etiquetas)
+        if metadatos.get('rtf') is not None:
+            self.observar('rtf', metadatos['rtf'], modelo=modelo)
+
+    def _etiquetas_prometheus(self, etiquetas):
+        return tuple(sorted(
+            (k, str(v)) for k, v in etiquetas.items() if k in ETIQUETAS_PROMETHEUS and v is not None
+        ))
+
+    def _escribir(self, evento):
+        """Añade una línea al JSONL (llamar con el lock tomado)"""
+        try:
+            self.ruta_jsonl.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.ruta_jsonl, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'ts': datetime.now().isoformat(), **evento}, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"⚠️ Error al escribir métricas: {e}")
+
+    def exportar(self):
+        """Reescribe el archivo de texto para el colector textfile de node_exporter"""
+        if not self.activado or not self.ruta_prometheus:
+            return
+        with self._lock:
+            lineas = []
+            for metrica in CUBETAS:
+                series = [(e, v) for (m, e), v in self._histogramas.items() if m == metrica]
+                if not series:
+                    continue
+                nombre = f"{PREFIJO}_{metrica}"
+                lineas.append(f"# TYPE {nombre} histogram")
+                for etiquetas, (cuentas, suma, total) in series:
+                    for limite, cuenta in zip(CUBETAS[metrica], cuentas):
+                        lineas.append(f"{nombre}_bucket{_formato(etiquetas, le=limite)} {cuenta}")
+                    lineas.append(f"{nombre}_bucket{_formato(etiquetas, le='+Inf')} {total}")
+                    lineas.append(f"{nombre}_sum{_formato(etiquetas)} {suma}")
+                    lineas.append(f"{nombre}_count{_formato(etiquetas)} {total}")
+            for metrica in sorted({m for m, _ in self._contadores}):
+                nombre = f"{PREFIJO}_{metrica}_total"
+                lineas.append(f"# TYPE {nombre} counter")
+                for (m, etiquetas), valor in self._contadores.items():
+                    if m == metrica:
+                        lineas.append(f"{nombre}{_formato(etiquetas)} {valor}")
+
+        # Escritura atómica: el colector nunca debe leer un archivo a medias
+        try:
+            self.ruta_prometheus.parent.mkdir(parents=True, exist_ok=True)
+            temporal = self.ruta_prometheus.with_suffix('.tmp')
+            with open(temporal, 'w', encoding='utf-8') as f:
+                f.write("\n".join(lineas) + "\n")
+            os.replace(temporal, self.ruta_prometheus)
+        except OSError as e:
+            print(f"⚠️ Error al exportar métricas: {e}")
+
+def _formato(etiquetas, **extra):
+    """Etiquetas en la sintaxis de Prometheus: {a="1",b="2"}"""
+    pares = list(etiquetas) + [(k, str(v)) for k, v in extra.items()]
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pares) + "}"
@@ -0,0 +1,34 @@
+"""
+Perfiles de decodificación - Parámetros de model.transcribe por perfil, sobre parametros_whisper
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Parámetros que no son de decodificación y no deben llegar a model.transcribe
+CLAVES_INTERNAS = ('descripcion',)
+
+def nombres_perfiles(config):
+    """Perfiles disponibles en la configuración"""
+    return list(config.get('decodificacion', {}).get('perfiles', {}))
+
+def resolver_perfil(config, perfil=None):
+    """Nombre del perfil a usar: el pedido, o decodificacion.perfil si no se pide o no existe"""
+    opciones = config.get('decodificacion', {})
+    por_defecto = opciones.get('perfil', 'rapido_voraz')
+    if perfil and perfil not in opciones.get('perfiles', {}):
+        logger.warning(f"Perfil de decodificación desconocido '{perfil}'; se usa '{por_defecto}'")
+        return por_defecto
+    return perfil or por_defecto
+
+def parametros_decodificacion(config, perfil=None):
+    """Parámetros para model.transcribe: parametros_whisper con el perfil encima"""
+    perfiles = config.get('decodificacion', {}).get('perfiles', {})
+    perfil = resolver_perfil(config, perfil)
+    parametros = {**config.get('parametros_whisper', {}), **perfiles.get(perfil, {})}
+    for clave in CLAVES_INTERNAS:
+        parametros.pop(clave, None)
+    # En JSON la secuencia de temperaturas llega como lista; whisper la recorre como respaldo
+    if isinstance(parametros.get('temperature'), list):
+        parametros['temperature'] = tuple(parametros['temperature'])
+    return parametros
@@ -0,0 +1,240 @@
+"""
+Planificador de trabajos - Cola persistente con un único hilo de inferencia dueño del modelo
+"""
+import heapq
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import Future
+from datetime import datetime
+from pathlib import Path
+
+# Menor valor = más prioritario
+PRIORIDAD_STREAMING = 0     # Ventanas de la grabación en curso (solo en memoria)
+PRIORIDAD_DICTADO = 1       # Grabación recién terminada
+PRIORIDAD_RECUPERACION = 2  # Grabaciones reparadas tras un cierre inesperado
+PRIORIDAD_BACKLOG = 3       # Re-transcripción de grabaciones antiguas
+
+ESTADOS_ACTIVOS = ('pendiente', 'procesando')
+MAX_HISTORIAL = 50
+
+class PlanificadorTrabajos:
+    def __init__(self, procesar, ruta_cola):
+        self.procesar = procesar  # Función (trabajo, datos) ejecutada en el hilo de inferencia
+        self.ruta_cola = Path(ruta_cola)
+
+        self._trabajos = {}  # id -> registro persistible
+        self._datos = {}     # id -> datos solo en memoria (audio, sesión de streaming...)
+        self._heap = []
+        self._secuencia = 0
+        self._condicion = threading.Condition()
+        self._activo = False
+        self._hilo = None
+
+    def iniciar(self):
+        """Reanuda los trabajos pendientes de la sesión anterior y arranca el hilo de inferencia"""
+        reanudados = 0
+        with self._condicion:
+            for trabajo in self._leer_cola():
+                if trabajo['id'] in self._trabajos:
+                    continue
+                if trabajo['estado'] in ESTADOS_ACTIVOS:
+                    trabajo['estado'] = 'pendiente'
+                    reanudados += 1
+                    self._encolar(trabajo['id'], trabajo['prioridad'])
+                self._trabajos[trabajo['id']] = trabajo
+
+            if reanudados:
+                print(f"📋 Reanudando {reanudados} trabajos pendientes")
+                self._guardar_cola()
+            self._activo = True
+
+        self._hilo = threading.Thread(target=self._bucle, name="inferencia", daemon=True)
+        self._hilo.start()
+
+    def _leer_cola(self):
+        """Lee los trabajos persistidos en disco"""
+        try:
+            if self.ruta_cola.exists():
+                with open(self.ruta_cola, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"⚠️ Error al leer la cola de trabajos: {e}")
+        return []
+
+    def _guardar_cola(self):
+        """Persiste los trabajos activos y el historial reciente de forma atómica"""
+        activos = [t for t in self._trabajos.values() if t['estado'] in ESTADOS_ACTIVOS]
+        terminados = [t for t in self._trabajos.values() if t['estado'] not in ESTADOS_ACTIVOS]
+        terminados = sorted(terminados, key=lambda t: t['actualizado'])
+        for trabajo in terminados[:-MAX_HISTORIAL]:
+            del self._trabajos[trabajo['id']]
+        terminados = terminados[-MAX_HISTORIAL:]
+
+        try:
+            temporal = self.ruta_cola.with_suffix('.tmp')
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(activos + terminados, f, indent=2, ensure_ascii=False)
+            os.replace(temporal, self.ruta_cola)
+        except Exception as e:
+            print(f"⚠️ Error al guardar la cola de trabajos: {e}")
+
+    def _encolar(self, id_trabajo, prioridad):
+        """Inserta en el heap; dentro de una misma prioridad va primero el más reciente"""
+        self._secuencia += 1
+        heapq.heappush(self._heap, (prioridad, -self._secuencia, id_trabajo))
+        self._condicion.notify()
+
+    def _actualizar(self, trabajo, estado, error=None):
+        """Cambia el estado de un trabajo, lo persiste y lo informa"""
+        trabajo['estado'] = estado
+        trabajo['actualizado'] = datetime.now().isoformat()
+        if error:
+            trabajo['error'] = error
+        self._guardar_cola()
+        print(f"📋 Trabajo {trabajo['id']} ({Path(trabajo['audio_file']).name}): {estado}")
+
+    def enviar(self, audio_file, prioridad=PRIORIDAD_DICTADO, datos=None):
+        """Encola la transcripción de una grabación y devuelve el id del trabajo"""
+        with self._condicion:
+            # Una grabación recuperada puede estar ya en la cola persistida; si ahora llega con
+            # más prioridad (p. ej. una re-transcripción pendiente), el trabajo se adelanta
+            for trabajo in self._trabajos.values():
+                if trabajo['audio_file'] == audio_file and trabajo['estado'] in ESTADOS_ACTIVOS:
+                    if prioridad < trabajo['prioridad']:
+                        self.repriorizar(trabajo['id'], prioridad)
+                    return trabajo['id']
+
+            ahora = datetime.now().isoformat()
+            trabajo = {
+                'id': uuid.uuid4().hex[:8],
+                'audio_file': audio_file,
+                'prioridad': prioridad,
+                'estado': 'pendiente',
+                'creado': ahora,
+                'actualizado': ahora
+            }
+            self._trabajos[trabajo['id']] = trabajo
+            self._datos[trabajo['id']] = datos or {}
+            self._guardar_cola()
+            self._encolar(trabajo['id'], prioridad)
+            return trabajo['id']
+
+    def ejecutar(self, funcion, prioridad=PRIORIDAD_STREAMING):
+        """Ejecuta una función en el hilo de inferencia (no se persiste) y devuelve un Future"""
+        future = Future()
+        if threading.current_thread() is self._hilo:
+            # Desde el propio hilo de inferencia se ejecuta en línea para no bloquearse
+            self._resolver(future, funcion)
+            return future
+
+        with self._condicion:
+            self._secuencia += 1
+            heapq.heappush(self._heap, (prioridad, self._secuencia, (funcion, future)))
+            self._condicion.notify()
+        return future
+
+    def _resolver(self, future, funcion):
+        """Ejecuta la función y deja su resultado o excepción en el Future"""
+        if not future.set_running_or_notify_cancel():
+            return  # Cancelado mientras esperaba en la cola
+        try:
+            future.set_result(funcion())
+        except Exception as e:
+            future.set_exception(e)
+
+    def cancelar(self, id_trabajo):
+        """Cancela un trabajo pendiente, o descarta el resultado de uno en curso"""
+        with self._condicion:
+            trabajo = self._trabajos.get(id_trabajo)
+            if not trabajo or trabajo['estado'] not in ESTADOS_ACTIVOS:
+                return False
+            self._actualizar(trabajo, 'cancelado')
+            sesion = self._datos.pop(id_trabajo, {}).get('sesion')
+            if sesion:
+                sesion.cancelar()
+            return True
+
+    def cancelar_ultimo(self):
+        """Cancela el trabajo activo más reciente"""
+        with self._condicion:
+            activos = [t for t in self._trabajos.values() if t['estado'] in ESTADOS_ACTIVOS]
+        if activos:
+            return self.cancelar(max(activos, key=lambda t: t['creado'])['id'])
+        return False
+
+    def repriorizar(self, id_trabajo, prioridad):
+        """Cambia la prioridad de un trabajo pendiente"""
+        with self._condicion:
+            trabajo = self._trabajos.get(id_trabajo)
+            if not trabajo or trabajo['estado'] != 'pendiente':
+                return False
+            trabajo['prioridad'] = prioridad
+            self._guardar_cola()
+            # La entrada antigua del heap se ignora al no coincidir la prioridad
+            self._encolar(id_trabajo, prioridad)
+            return True
+
+    def esta_cancelado(self, id_trabajo):
+        """Indica si el trabajo se canceló (el hilo de inferencia lo consulta antes de publicar)"""
+        trabajo = self._trabajos.get(id_trabajo)
+        return trabajo is None or trabajo['estado'] == 'cancelado'
+
+    def estado(self, id_trabajo):
+        """Devuelve una copia del registro del trabajo"""
+        with self._condicion:
+            trabajo = self._trabajos.get(id_trabajo)
+            return dict(trabajo) if trabajo else None
+
+    def resumen(self):
+        """Número de trabajos por estado"""
+        with self._condicion:
+            conteo = {}
+            for trabajo in self._trabajos.values():
+                conteo[trabajo['estado']] = conteo.get(trabajo['estado'], 0) + 1
+            return conteo
+
+    def _siguiente(self):
+        """Espera y extrae la siguiente tarea válida del heap"""
+        with self._condicion:
+            while self._activo:
+                while self._heap:
+                    prioridad, _, elemento = heapq.heappop(self._heap)
+                    if not isinstance(elemento, str):
+                        return elemento
+                    trabajo = self._trabajos.get(elemento)
+                    if trabajo and trabajo['estado'] == 'pendiente' and trabajo['prioridad'] == prioridad:
+                        self._actualizar(trabajo, 'procesando')
+                        return trabajo
+                self._condicion.wait()
+            return None
+
+    def _bucle(self):
+        """Hilo de inferencia: único que usa el modelo"""
+        while True:
+            elemento = self._siguiente()
+            if elemento is None:
+                return
+            if isinstance(elemento, tuple):
+                self._resolver(elemento[1], elemento[0])
+                continue
+
+            trabajo = elemento
+            try:
+                self.procesar(trabajo, self._datos.get(trabajo['id'], {}))
+                with self._condicion:
+                    if trabajo['estado'] == 'procesando':
+                        self._actualizar(trabajo, 'completado')
+            except Exception as e:
+                print(f"❌ Error en el trabajo {trabajo['id']}: {e}")
+                with self._condicion:
+                    self._actualizar(trabajo, 'error', str(e))
+            finally:
+                self._datos.pop(trabajo['id'], None)
+
+    def detener(self):
+        """Detiene el hilo de inferencia; los trabajos pendientes quedan en disco"""
+        with self._condicion:
+            self._activo = False
+            self._condicion.notify_all()
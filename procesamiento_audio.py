@@ -0,0 +1,101 @@
+"""
+Procesamiento de audio - Conversión de las muestras capturadas al formato de Whisper
+"""
+import wave
+from functools import lru_cache
+from math import gcd
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+FS_WHISPER = 16000  # Frecuencia de muestreo que espera Whisper
+
+@lru_cache(maxsize=8)
+def _filtro_paso_bajo(fs_origen, fs_destino, n_coef=63):
+    """Coeficientes FIR (sinc con ventana de Hann) para evitar aliasing al bajar la frecuencia"""
+    corte = 0.45 * fs_destino / fs_origen  # 90% de Nyquist, normalizado a fs_origen
+    n = np.arange(n_coef) - (n_coef - 1) / 2
+    coef = 2 * corte * np.sinc(2 * corte * n) * np.hanning(n_coef)
+    return (coef / coef.sum()).astype(np.float32)
+
+def a_float32(audio):
+    """Convierte muestras int16 (o float) a un vector float32 mono en [-1, 1]"""
+    audio = np.asarray(audio).reshape(-1)
+    if audio.dtype == np.int16:
+        return audio.astype(np.float32) / 32768.0
+    return audio.astype(np.float32, copy=False)
+
+@lru_cache(maxsize=8)
+def _tabla_polifasica(fs_origen, fs_destino):
+    """Pesos de las muestras de entrada alrededor de cada fase de salida
+
+    Con fs_destino / fs_origen = fases / paso, la salida n cae en la entrada (n * paso) // fases
+    con fracción ((n * paso) % fases) / fases: solo hay `fases` juegos de pesos distintos, cada
+    uno con el filtro paso bajo y la interpolación lineal ya combinados.
+    """
+    comun = gcd(fs_origen, fs_destino)
+    paso, fases = fs_origen // comun, fs_destino // comun
+    if fs_destino < fs_origen:
+        filtro = _filtro_paso_bajo(fs_origen, fs_destino)
+    else:
+        filtro = np.ones(1, dtype=np.float32)  # Subir la frecuencia no necesita filtro
+    fraccion = (np.arange(fases) / fases).astype(np.float32)[:, None]
+    pesos = np.append(filtro, 0) * (1 - fraccion) + np.insert(filtro, 0, 0) * fraccion
+    # Orden de las fases dentro de un bloque: la salida j usa la fase (j * paso) % fases
+    desplazamientos = np.arange(fases) * paso
+    return (paso, fases, pesos[desplazamientos % fases].astype(np.float32),
+            desplazamientos // fases, (len(filtro) - 1) // 2)
+
+def _leer_tramo(audio, desde, hasta):
+    """Muestras [desde, hasta) de un array o de un BufferAudio, sin copiar el resto"""
+    if hasattr(audio, 'leer'):
+        return audio.leer(desde, hasta).reshape(-1)
+    return np.asarray(audio).reshape(-1)[desde:hasta]
+
+def remuestrear(audio, fs_origen, fs_destino=FS_WHISPER, salidas_por_bloque=1 << 17):
+    """Cambia la frecuencia de muestreo con un filtro polifásico, por bloques
+
+    Calcula solo las muestras de salida (no el filtro sobre toda la entrada) y recorre la
+    entrada por bloques: la memoria extra no depende de la duración de la grabación. Acepta un
+    array int16/float o un BufferAudio.
+    """
+    if fs_origen == fs_destino or len(audio) == 0:
+        return a_float32(_leer_tramo(audio, 0, len(audio)))
+
+    paso, fases, pesos, desplazamientos, retardo = _tabla_polifasica(fs_origen, fs_destino)
+    taps = pesos.shape[1]
+    total = len(audio)
+    salida = np.empty(int(total * fs_destino / fs_origen), dtype=np.float32)
+    # Bloques de un número entero de ciclos de fases: todos empiezan en una muestra exacta
+    bloque = -(-salidas_por_bloque // fases) * fases
+
+    for inicio in range(0, len(salida), bloque):
+        fin = min(len(salida), inicio + bloque)
+        # Entrada que cubre el bloque, con ceros fuera de la grabación
+        desde = inicio * paso // fases - retardo
+        hasta = (fin - 1) * paso // fases - retardo + taps
+        tramo = np.zeros(hasta - desde, dtype=np.float32)
+        a, b = max(desde, 0), min(hasta, total)
+        tramo[a - desde:b - desde] = a_float32(_leer_tramo(audio, a, b))
+
+        destino = salida[inicio:fin]
+        for fase in range(min(fases, fin - inicio)):
+            # Las salidas de una misma fase avanzan `paso` muestras de entrada cada una
+            n = -(-(fin - inicio - fase) // fases)
+            ventanas = as_strided(tramo[desplazamientos[fase]:], shape=(n, taps),
+                                  strides=(paso * tramo.itemsize, tramo.itemsize))
+            destino[fase::fases] = ventanas @ pesos[fase]
+    return salida
+
+def duracion_audio(audio):
+    """Duración en segundos de un array a 16 kHz o de un archivo WAV"""
+    if isinstance(audio, str):
+        try:
+            with wave.open(audio, 'rb') as f:
+                return f.getnframes() / f.getframerate()
+        except Exception:
+            return 0.0
+    return len(audio) / FS_WHISPER
+
+def preparar_para_whisper(audio, fs):
+    """Devuelve el audio como float32 mono a 16 kHz, listo para model.transcribe"""
+    return remuestrear(audio, fs, FS_WHISPER)
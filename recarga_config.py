@@ -0,0 +1,109 @@
+"""
+Recarga de la configuración - Vigila config.json y aplica los cambios sin reiniciar
+"""
+import copy
+import os
+import threading
+
+from utils import RUTA_CONFIGURACION, leer_configuracion
+
+ESPERA_ESTABLE = 0.2  # Segundos sin cambios en el archivo antes de leerlo (guardado a medias)
+
+# Secciones que el controlador aplica sin reiniciar: las demás se leen solo al arrancar
+SECCIONES_EN_CALIENTE = {
+    'atajos', 'formatos_salida', 'salidas', 'interfaz', 'notificar_cada_minutos',
+    'vad', 'transcripcion_streaming', 'parametros_whisper', 'decodificacion'
+}
+# Cambiarlas exige cargar otro modelo (en segundo plano; el actual sigue atendiendo)
+SECCIONES_MODELO = {'whisper_model', 'whisper_quantization', 'rendimiento_cpu'}
+
+def claves_cambiadas(anterior, nueva, prefijo=""):
+    """Rutas 'seccion.clave' cuyo valor cambió"""
+    cambiadas = set()
+    for clave in anterior.keys() | nueva.keys():
+        a, n = anterior.get(clave), nueva.get(clave)
+        if isinstance(a, dict) and isinstance(n, dict):
+            cambiadas |= claves_cambiadas(a, n, f"{prefijo}{clave}.")
+        elif a != n:
+            cambiadas.add(f"{prefijo}{clave}")
+    return cambiadas
+
+def actualizar_en_sitio(destino, origen):
+    """Copia origen sobre destino conservando los diccionarios anidados existentes
+
+    Los componentes guardan referencias a config y a sus secciones (p. ej. opciones_vad):
+    al mutarlas en vez de sustituirlas, ven los valores nuevos sin tener que recrearlos.
+    """
+    for clave in list(destino):
+        if clave not in origen:
+            del destino[clave]
+    for clave, valor in origen.items():
+        if isinstance(valor, dict) and isinstance(destino.get(clave), dict):
+            actualizar_en_sitio(destino[clave], valor)
+        else:
+            destino[clave] = copy.deepcopy(valor)
+
+def actualizar_secciones(destino, origen, secciones):
+    """Como actualizar_en_sitio, pero solo en las secciones indicadas; las demás no cambian"""
+    for seccion in secciones:
+        if seccion not in origen:
+            destino.pop(seccion, None)
+        elif isinstance(origen[seccion], dict) and isinstance(destino.get(seccion), dict):
+            actualizar_en_sitio(destino[seccion], origen[seccion])
+        else:
+            destino[seccion] = copy.deepcopy(origen[seccion])
+
+class VigilanteConfiguracion:
+    """Comprueba periódicamente config.json y avisa con la configuración nueva ya validada"""
+    def __init__(self, config, on_cambio, ruta=RUTA_CONFIGURACION, intervalo=1.0):
+        self.ruta = ruta
+        self.intervalo = intervalo
+        # Callback (nueva, claves_cambiadas); la aplicación la decide el controlador
+        self.on_cambio = on_cambio
+        self._actual = copy.deepcopy(config)
+        self._firma = self._leer_firma()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def _leer_firma(self):
+        """Fecha de modificación y tamaño: basta un stat por comprobación"""
+        try:
+            estado = os.stat(self.ruta)
+            return estado.st_mtime_ns, estado.st_size
+        except OSError:
+            return None
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._bucle, name="vigilante-config", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+
+    def _bucle(self):
+        while not self._detener.wait(self.intervalo):
+            firma = self._leer_firma()
+            if firma is None or firma == self._firma:
+                continue
+            # Los editores guardan en varios pasos: se espera a que el archivo deje de cambiar
+            while not self._detener.wait(ESPERA_ESTABLE):
+                siguiente = self._leer_firma()
+                if siguiente == firma:
+                    break
+                firma = siguiente
+            self._firma = firma
+            self.comprobar()
+
+    def comprobar(self):
+        """Lee y valida config.json; si cambió algo, llama a on_cambio. Devuelve las claves cambiadas"""
+        try:
+            nueva = leer_configuracion(self.ruta)
+        except Exception as e:
+            # Un error de sintaxis a medio editar no debe tumbar la aplicación
+            print(f"⚠️ config.json no válido, se mantiene la configuración actual: {e}")
+            return set()
+        cambiadas = claves_cambiadas(self._actual, nueva)
+        if cambiadas:
+            self._actual = copy.deepcopy(nueva)
+            self.on_cambio(nueva, cambiadas)
+        return cambiadas
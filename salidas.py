@@ -0,0 +1,115 @@
+"""
+Canal de salidas - Portapapeles inmediato y archivos, catálogo y notificaciones en segundo plano
+"""
+import queue
+import threading
+from contextlib import nullcontext
+from pathlib import Path
+
+from utils import copiar_al_portapapeles, guardar_transcripcion, notificar
+
+class NotificadorAgrupado:
+    """Junta los avisos que llegan en pocos segundos en una sola notificación"""
+    def __init__(self, ventana_segundos=2):
+        self.ventana = ventana_segundos
+        self._pendientes = []
+        self._lock = threading.Lock()
+        self._temporizador = None
+
+    def avisar(self, mensaje):
+        if self.ventana <= 0:
+            notificar(mensaje)
+            return
+        with self._lock:
+            self._pendientes.append(mensaje)
+            if self._temporizador is None:
+                self._temporizador = threading.Timer(self.ventana, self.vaciar)
+                self._temporizador.daemon = True
+                self._temporizador.start()
+
+    def vaciar(self):
+        """Envía los avisos acumulados"""
+        with self._lock:
+            mensajes, self._pendientes = self._pendientes, []
+            if self._temporizador is not None:
+                self._temporizador.cancel()
+                self._temporizador = None
+        if len(mensajes) == 1:
+            notificar(mensajes[0])
+        elif mensajes:
+            # Mensajes repetidos (p. ej. varias transcripciones listas) se cuentan
+            conteo = {}
+            for mensaje in mensajes:
+                conteo[mensaje] = conteo.get(mensaje, 0) + 1
+            notificar("\n".join(m if n == 1 else f"{m} (x{n})" for m, n in conteo.items()))
+
+class CanalSalidas:
+    def __init__(self, config, metricas=None):
+        self.config = config
+        self.metricas = metricas
+        opciones = config.get('salidas', {})
+        self.notificador = NotificadorAgrupado(opciones.get('agrupar_notificaciones_segundos', 2))
+
+        # Sumideros en orden: cada uno recibe el diccionario de la salida
+        self._sumideros = [('guardar_salidas', self._guardar_archivos)]
+        self._cola = queue.Queue()
+        self._hilo = threading.Thread(target=self._bucle, name="salidas", daemon=True)
+        self._hilo.start()
+
+    def aplicar_configuracion(self):
+        """Relee las opciones guardadas al crear el canal (los formatos se leen en cada salida)"""
+        self.notificador.ventana = self.config.get('salidas', {}).get('agrupar_notificaciones_segundos', 2)
+        
+    def agregar(self, nombre, funcion):
+        """Añade un sumidero que se ejecuta en segundo plano tras los anteriores"""
+        self._sumideros.append((nombre, funcion))
+
+    def publicar(self, texto, audio_file, metadatos=None, segmentos=None, portapapeles=True):
+        """Copia al portapapeles ya y deja el resto en cola; no vuelve a usar el modelo"""
+        salida = {
+            'texto': texto,
+            'audio_file': audio_file,
+            'grabacion': Path(audio_file).stem,
+            'metadatos': dict(metadatos or {}),
+            'segmentos': list(segmentos or [])
+        }
+        if portapapeles and self.config['formatos_salida']['clipboard']:
+            with self._tramo('portapapeles', salida):
+                copiar_al_portapapeles(texto)
+        self._cola.put(salida)
+
+    def notificar(self, mensaje):
+        """Aviso al usuario, agrupado con los que lleguen a la vez"""
+        self.notificador.avisar(mensaje)
+
+    def detener(self, timeout=10):
+        """Termina de escribir lo pendiente y envía los avisos acumulados"""
+        self._cola.put(None)
+        self._hilo.join(timeout)
+        self.notificador.vaciar()
+
+    def _bucle(self):
+        """Hilo de salidas: los archivos y el resto nunca retrasan el siguiente trabajo"""
+        while True:
+            salida = self._cola.get()
+            if salida is None:
+                return
+            for nombre, funcion in self._sumideros:
+                try:
+                    with self._tramo(nombre, salida):
+                        funcion(salida)
+                except Exception as e:
+                    print(f"⚠️ Error en la salida '{nombre}': {e}")
+            self.notificar("La transcripción está lista para pegar.")
+
+    def _guardar_archivos(self, salida):
+        guardar_transcripcion(
+            salida['texto'], salida['audio_file'], self.config,
+            salida['metadatos'], salida['segmentos']
+        )
+
+    def _tramo(self, nombre, salida):
+        """Tramo de métricas de un sumidero (sin métricas, un contexto vacío)"""
+        if self.metricas is None:
+            return nullcontext()
+        return self.metricas.tramo(nombre, grabacion=salida['grabacion'])
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Transcripción por lotes - Transcribe una carpeta de grabaciones con un pool de procesos
+
+Uso:
+    python transcribir_lote.py grabaciones/
+    python transcribir_lote.py "grabaciones/2025-06-*.wav" --procesos 8 --modelo small
+"""
+import argparse
+import glob
+import json
+import os
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from utils import EXTENSIONES_SALIDA, cargar_configuracion, extensiones_activadas, guardar_transcripcion
+
+# Estado de cada proceso del pool: el modelo se carga una sola vez por proceso
+_transcriptor = None
+_config = None
+
+def _inicializar_proceso(config):
+    """Carga el modelo en el proceso (con los hilos limitados en config['rendimiento_cpu'])"""
+    global _transcriptor, _config
+    from transcriptor import Transcriptor
+
+    _config = config
+    _transcriptor = Transcriptor(config)
+
+def _transcribir_archivo(ruta):
+    """Transcribe un archivo en el proceso del pool y guarda las salidas junto al audio"""
+    inicio = time.perf_counter()
+    texto = _transcriptor.transcribir_audio(ruta)
+    if texto:
+        config = {**_config, 'directorio_salida': str(Path(ruta).parent)}
+        guardar_transcripcion(texto, ruta, config, _transcriptor.ultimos_metadatos,
+                              _transcriptor.ultimos_segmentos)
+    return {
+        'ruta': ruta,
+        'estado': 'ok' if texto else 'vacio',
+        'segundos': time.perf_counter() - inicio
+    }
+
+def duracion_wav(ruta):
+    """Duración en segundos leída de la cabecera del WAV"""
+    try:
+        with wave.open(ruta, 'rb') as f:
+            return f.getnframes() / f.getframerate()
+    except Exception:
+        return 0.0
+
+def buscar_archivos(origen):
+    """Lista los WAV de un directorio (recursivo) o de un patrón glob"""
+    if os.path.isdir(origen):
+        rutas = Path(origen).rglob("*.wav")
+    else:
+        rutas = (Path(r) for r in glob.glob(origen, recursive=True))
+    return sorted(str(r) for r in rutas if r.is_file())
+
+def tiene_salidas(ruta, config):
+    """Indica si ya existen todas las salidas activadas para el archivo"""
+    ruta = Path(ruta)
+    return all(ruta.with_suffix(ext).exists() for ext in extensiones_activadas(config))
+
+def leer_checkpoint(ruta_checkpoint):
+    """Devuelve las rutas ya procesadas según el checkpoint"""
+    procesados = set()
+    if os.path.exists(ruta_checkpoint):
+        with open(ruta_checkpoint, 'r', encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    registro = json.loads(linea)
+                except json.JSONDecodeError:
+                    continue  # Última línea cortada por una interrupción
+                if registro['estado'] in ('ok', 'vacio'):
+                    procesados.add(registro['ruta'])
+    return procesados
+
+def main():
+    """Punto de entrada del modo por lotes"""
+    parser = argparse.ArgumentParser(description="Transcribe por lotes una carpeta de grabaciones")
+    parser.add_argument("origen", help="Directorio (se recorre recursivamente) o patrón glob")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count(),
+                        help="Procesos del pool (por defecto, uno por núcleo)")
+    parser.add_argument("--hilos", type=int, default=1,
+                        help="Hilos de torch por proceso")
+    parser.add_argument("--modelo", help="Modelo Whisper (por defecto, el de config.json)")
+    parser.add_argument("--perfil", help="Perfil de decodificación (por defecto, decodificacion.perfil)")
+    parser.add_argument("--checkpoint", default="lote_checkpoint.jsonl",
+                        help="Archivo de progreso para reanudar")
+    args = parser.parse_args()
+
+    config = cargar_configuracion()
+    if args.modelo:
+        config['whisper_model'] = args.modelo
+    if args.perfil:
+        config['decodificacion']['perfil'] = args.perfil
+    # El lote ya reparte archivos entre procesos: sin pools anidados por archivo
+    config['transcripcion_paralela'] = {**config.get('transcripcion_paralela', {}), 'activado': False}
+    # Hilos por proceso limitados para no sobresuscribir la CPU
+    config['rendimiento_cpu'] = {**config.get('rendimiento_cpu', {}), 'hilos_intra': args.hilos}
+    # Sin portapapeles en modo lote: al menos se guarda el .txt
+    if not any(config['formatos_salida'].get(clave) for clave in EXTENSIONES_SALIDA):
+        config['formatos_salida']['txt_file'] = True
+
+    procesados = leer_checkpoint(args.checkpoint)
+    archivos = buscar_archivos(args.origen)
+    pendientes = [r for r in archivos if r not in procesados and not tiene_salidas(r, config)]
+    print(f"📂 {len(archivos)} archivos encontrados, {len(pendientes)} pendientes")
+    if not pendientes:
+        return
+
+    duraciones = {r: duracion_wav(r) for r in pendientes}
+    procesos = max(1, min(args.procesos, len(pendientes)))
+    print(f"⚙️ {procesos} procesos x {args.hilos} hilos, modelo '{config['whisper_model']}'")
+
+    inicio = time.perf_counter()
+    completados = 0
+    audio_segundos = 0.0
+    with ProcessPoolExecutor(
+        max_workers=procesos,
+        initializer=_inicializar_proceso,
+        initargs=(config,)
+    ) as pool, open(args.checkpoint, 'a', encoding='utf-8') as checkpoint:
+        futuros = {pool.submit(_transcribir_archivo, r): r for r in pendientes}
+        for futuro in as_completed(futuros):
+            ruta = futuros[futuro]
+            try:
+                registro = futuro.result()
+            except Exception as e:
+                registro = {'ruta': ruta, 'estado': 'error', 'error': str(e)}
+                print(f"❌ {ruta}: {e}")
+
+            checkpoint.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            checkpoint.flush()
+            if registro['estado'] != 'error':
+                completados += 1
+                audio_segundos += duraciones[ruta]
+            print(f"✅ [{completados}/{len(pendientes)}] {ruta}")
+
+    transcurrido = time.perf_counter() - inicio
+    horas = transcurrido / 3600
+    print(f"\n📊 {completados} archivos en {transcurrido:.1f}s")
+    print(f"   {completados / horas:.1f} archivos/hora")
+    print(f"   {audio_segundos / 3600 / horas:.2f} horas de audio/hora")
+
+if __name__ == "__main__":
+    main()
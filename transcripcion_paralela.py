@@ -0,0 +1,182 @@
+"""
+Transcripción paralela - Divide el audio largo en silencios y lo transcribe en un pool de procesos
+"""
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from procesamiento_audio import FS_WHISPER
+from vad import detectar_voz
+
+logger = logging.getLogger(__name__)
+
+# Estado de cada proceso del pool: los modelos se cargan una vez por proceso
+_modelos = {}
+_cuantizacion = "none"
+_codificador = None
+
+def _inicializar_proceso(opciones_cpu, cuantizacion, max_ventanas=0):
+    """Limita los hilos de torch del proceso para no sobresuscribir la CPU"""
+    global _cuantizacion, _codificador
+    from ajustes_cpu import aplicar_ajustes_cpu
+
+    _cuantizacion = cuantizacion
+    if max_ventanas:
+        from cache_codificador import CacheCodificador
+        _codificador = CacheCodificador(max_ventanas)
+    aplicar_ajustes_cpu(opciones_cpu)
+
+def _transcribir_fragmento(audio, modelo, parametros):
+    """Transcribe un fragmento en el proceso del pool y devuelve texto y segmentos"""
+    if modelo not in _modelos:
+        from cuantizacion import cargar_modelo_whisper
+        _modelos[modelo] = cargar_modelo_whisper(modelo, _cuantizacion)
+    if _codificador is None:
+        resultado = _modelos[modelo].transcribe(audio, **parametros)
+    else:
+        # Los reintentos de temperatura del fragmento no repiten el codificador
+        _codificador.reiniciar_estadisticas()
+        try:
+            with _codificador.envolver(_modelos[modelo]):
+                resultado = _modelos[modelo].transcribe(audio, **parametros)
+        finally:
+            _codificador.vaciar()
+    # Los tokens no hacen falta en el proceso principal: menos datos que serializar
+    segmentos = [{k: v for k, v in s.items() if k != 'tokens'} for s in resultado['segments']]
+    return {
+        'text': resultado['text'], 'segments': segmentos, 'language': resultado.get('language'),
+        'codificador': _codificador.resumen() if _codificador else None
+    }
+
+def dividir_en_silencios(audio, fragmento_segundos, solape_segundos=2.0, fs=FS_WHISPER):
+    """Fragmentos de unos fragmento_segundos cortados en pausas de la voz
+
+    Devuelve dicts con el rango a transcribir ('inicio', 'fin', con solape si el corte no cayó
+    en un silencio) y el rango propio ('desde', 'hasta') del que se quedan los segmentos.
+    """
+    total = len(audio)
+    objetivo = int(fragmento_segundos * fs)
+    if total <= objetivo * 3 // 2:
+        return [{'inicio': 0, 'fin': total, 'desde': 0, 'hasta': total}]
+
+    # Pausas de al menos 300 ms: el punto medio de cada una es un corte seguro
+    tramos = detectar_voz(audio, fs, relleno_ms=100, silencio_minimo_ms=300)
+    pausas = [(fin + inicio) // 2 for (_, fin), (inicio, _) in zip(tramos, tramos[1:])]
+
+    cortes = [0]
+    forzados = set()
+    while total - cortes[-1] > objetivo * 3 // 2:
+        deseado = cortes[-1] + objetivo
+        candidatos = [p for p in pausas if deseado - objetivo // 2 <= p <= deseado + objetivo // 2]
+        if candidatos:
+            cortes.append(min(candidatos, key=lambda p: abs(p - deseado)))
+        else:
+            # Habla continua: corte forzado con solape a ambos lados
+            cortes.append(deseado)
+            forzados.add(deseado)
+    cortes.append(total)
+
+    solape = int(solape_segundos * fs)
+    fragmentos = []
+    for desde, hasta in zip(cortes, cortes[1:]):
+        fragmentos.append({
+            'inicio': max(0, desde - solape) if desde in forzados else desde,
+            'fin': min(total, hasta + solape) if hasta in forzados else hasta,
+            'desde': desde,
+            'hasta': hasta
+        })
+    return fragmentos
+
+def unir_resultados(fragmentos, resultados, fs=FS_WHISPER):
+    """Une los resultados con los tiempos del audio completo y sin duplicar los solapes"""
+    segmentos = []
+    for fragmento, resultado in zip(fragmentos, resultados):
+        desplazamiento = fragmento['inicio'] / fs
+        desde, hasta = fragmento['desde'] / fs, fragmento['hasta'] / fs
+        for segmento in resultado['segments']:
+            segmento = dict(segmento)
+            segmento['start'] += desplazamiento
+            segmento['end'] += desplazamiento
+            for palabra in segmento.get('words', []):
+                palabra['start'] += desplazamiento
+                palabra['end'] += desplazamiento
+            # Cada segmento pertenece al fragmento donde cae su centro
+            centro = (segmento['start'] + segmento['end']) / 2
+            if desde <= centro < hasta:
+                segmento['id'] = len(segmentos)
+                segmentos.append(segmento)
+    return {
+        'text': "".join(s['text'] for s in segmentos),
+        'segments': segmentos,
+        'language': resultados[0].get('language') if resultados else None
+    }
+
+class TranscriptorParalelo:
+    def __init__(self, config):
+        opciones = config.get('transcripcion_paralela', {})
+        self.umbral_segundos = opciones.get('umbral_segundos', 300)
+        self.fragmento_segundos = opciones.get('fragmento_segundos', 60)
+        self.solape_segundos = opciones.get('solape_segundos', 2)
+        self.hilos = max(1, opciones.get('hilos_por_proceso', 2))
+        nucleos = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+        self.procesos = opciones.get('procesos', 0) or max(1, (nucleos or 1) // self.hilos)
+        self.cuantizacion = config.get('whisper_quantization', 'none')
+        self.opciones_cpu = {**config.get('rendimiento_cpu', {}), 'hilos_intra': self.hilos}
+        opciones_codificador = config.get('reutilizacion_codificador', {})
+        # 0 desactiva la caché del codificador en los procesos del pool
+        self.max_ventanas = 0
+        if opciones_codificador.get('activado'):
+            self.max_ventanas = opciones_codificador.get('max_ventanas', 16)
+        self._pool = None
+
+    def aplicable(self, duracion):
+        """Solo compensa a partir del umbral: por debajo, una llamada al modelo es más rápida"""
+        return self.procesos > 1 and duracion >= self.umbral_segundos
+
+    def _obtener_pool(self):
+        """Crea el pool la primera vez; los procesos conservan su modelo entre trabajos"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.procesos,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_inicializar_proceso,
+                initargs=(self.opciones_cpu, self.cuantizacion, self.max_ventanas)
+            )
+        return self._pool
+
+    def transcribir(self, audio, modelo, parametros):
+        """Transcribe un array float32 a 16 kHz (o una ruta) repartiendo los fragmentos"""
+        if isinstance(audio, str):
+            import whisper
+            audio = whisper.load_audio(audio)
+
+        inicio = time.perf_counter()
+        fragmentos = dividir_en_silencios(audio, self.fragmento_segundos, self.solape_segundos)
+        pool = self._obtener_pool()
+        futuros = [
+            pool.submit(_transcribir_fragmento, audio[f['inicio']:f['fin']], modelo, parametros)
+            for f in fragmentos
+        ]
+        resultados = [futuro.result() for futuro in futuros]
+        resultado = unir_resultados(fragmentos, resultados)
+        logger.info(
+            f"Transcripción paralela: {len(audio) / FS_WHISPER:.0f}s en {len(fragmentos)} fragmentos "
+            f"con {self.procesos} procesos x {self.hilos} hilos, {time.perf_counter() - inicio:.1f}s"
+        )
+        resumenes = [r['codificador'] for r in resultados if r.get('codificador')]
+        if resumenes:
+            logger.info(
+                f"Reintentos de decodificación en los fragmentos: "
+                f"{sum(r['reintentos_decodificacion'] for r in resumenes)} en "
+                f"{sum(r['reintentos_segundos'] for r in resumenes):.2f}s de CPU "
+                f"(codificador: {sum(r['codificador_segundos'] for r in resumenes):.2f}s)"
+            )
+        return resultado
+
+    def cerrar(self):
+        """Termina los procesos del pool y libera sus modelos"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,133 @@
+"""
+Transcripción en streaming - Transcribe la grabación en curso por ventanas solapadas
+"""
+import threading
+import logging
+from concurrent.futures import CancelledError
+
+from procesamiento_audio import preparar_para_whisper
+
+logger = logging.getLogger(__name__)
+
+OMITIDA = object()  # La sesión se detuvo antes de transcribir la ventana
+
+class SesionStreaming:
+    def __init__(self, grabador, transcriptor, config, planificador):
+        self.audio = grabador.audio  # Buffer de la grabación en curso
+        self.transcriptor = transcriptor
+        self.planificador = planificador
+        self.fs = grabador.fs
+
+        opciones = config.get('transcripcion_streaming', {})
+        self.ventana = opciones.get('ventana_segundos', 15)
+        self.margen = opciones.get('margen_segundos', 3)
+        self.intervalo = opciones.get('intervalo_segundos', 0.5)
+
+        # Primera muestra del audio aún no confirmado
+        self._inicio_pendiente = 0
+
+        self.segmentos = []
+        self._detener = threading.Event()
+        # Protege la comprobación de _detener y el envío al planificador frente a finalizar()
+        self._lock = threading.Lock()
+        self._pendiente = None  # Future de la ventana que espera al hilo de inferencia
+        self._hilo = None
+
+    def iniciar(self):
+        """Arranca el hilo que transcribe las ventanas a medida que llegan"""
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def _bucle(self):
+        """Transcribe cada ventana completa mientras dura la grabación"""
+        while not self._detener.wait(self.intervalo):
+            if self._muestras_pendientes() >= int(self.ventana * self.fs):
+                self._procesar_ventana(final=False)
+
+    def _muestras_pendientes(self):
+        """Muestras capturadas que aún no forman parte de un segmento confirmado"""
+        return len(self.audio) - self._inicio_pendiente
+
+    def _procesar_ventana(self, final):
+        """Transcribe una ventana y confirma los segmentos que no tocan el margen final"""
+        hasta = None if final else self._inicio_pendiente + int(self.ventana * self.fs)
+        audio = self.audio.leer(self._inicio_pendiente, hasta)
+        duracion = len(audio) / self.fs
+        inicio = self._inicio_pendiente / self.fs
+
+        audio = preparar_para_whisper(audio, self.fs)
+        resultado = self._transcribir(audio)
+        if resultado is OMITIDA:
+            return  # finalizar() la vuelve a procesar desde el hilo de inferencia
+        segmentos = resultado.get('segments', []) if resultado else []
+
+        if final:
+            confirmados = segmentos
+            avance = duracion
+        else:
+            # Los segmentos dentro del margen pueden estar cortados; se repiten en la siguiente ventana
+            limite = duracion - self.margen
+            confirmados = [s for s in segmentos if s['end'] <= limite]
+            if not confirmados and segmentos:
+                confirmados = segmentos[:1]
+            avance = confirmados[-1]['end'] if confirmados else limite
+            if avance <= 0:
+                avance = limite
+
+        for segmento in confirmados:
+            self.segmentos.append({
+                'start': segmento['start'] + inicio,
+                'end': segmento['end'] + inicio,
+                'text': segmento['text']
+            })
+
+        logger.info(
+            f"Ventana de {duracion:.1f}s en {inicio:.1f}s: "
+            f"{len(confirmados)} segmentos confirmados"
+        )
+        self._inicio_pendiente += int(avance * self.fs)
+
+    def _transcribir(self, audio):
+        """Transcribe en el hilo de inferencia del planificador, el único que usa el modelo"""
+        funcion = lambda: self.transcriptor.transcribir_resultado(audio)
+        if threading.current_thread() is not self._hilo:
+            return self.planificador.ejecutar(funcion).result()
+
+        # finalizar() se ejecuta en el hilo de inferencia y espera a este hilo: tras detener
+        # no se envía nada, y lo ya enviado se cancela, para no esperarse mutuamente
+        with self._lock:
+            if self._detener.is_set():
+                return OMITIDA
+            self._pendiente = self.planificador.ejecutar(funcion)
+        try:
+            return self._pendiente.result()
+        except CancelledError:
+            return OMITIDA
+        finally:
+            self._pendiente = None
+
+    def _detener_hilo(self):
+        """Marca la parada y cancela la ventana que aún no ha empezado a transcribirse"""
+        with self._lock:
+            self._detener.set()
+            if self._pendiente:
+                self._pendiente.cancel()
+
+    def finalizar(self):
+        """Detiene el streaming, transcribe solo la cola pendiente y devuelve el resultado fusionado"""
+        self._detener_hilo()
+        if self._hilo:
+            self._hilo.join()
+
+        # Si el hilo se retrasó pueden quedar varias ventanas completas
+        while self._muestras_pendientes() > int(self.ventana * self.fs):
+            self._procesar_ventana(final=False)
+        if self._muestras_pendientes() > 0:
+            self._procesar_ventana(final=True)
+
+        texto = "".join(s['text'] for s in self.segmentos).strip()
+        return {'text': texto, 'segments': self.segmentos}
+
+    def cancelar(self):
+        """Detiene el streaming sin procesar el audio pendiente"""
+        self._detener_hilo()
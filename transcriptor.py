@@ -1,58 +1,272 @@
 """
 Módulo de transcripción - Evolución de transcriber.py
 """
-import whisper
+import gc
 import os
+import sys
 import logging
+import threading
+import time
+
+from cache_codificador import CacheCodificador
+from cache_transcripciones import CacheTranscripciones
+from cascada_modelos import PoliticaCascada
+from cuantizacion import cargar_modelo_whisper
+from ajustes_cpu import aplicar_ajustes_cpu
+from perfiles_decodificacion import parametros_decodificacion, resolver_perfil
+from procesamiento_audio import duracion_audio
+from transcripcion_paralela import TranscriptorParalelo
+from vad import recortar_silencios
+
+# psutil es opcional: solo se usa para medir memoria y detectar presión de memoria
+try:
+    import psutil
+except ImportError:
+    psutil = None
 
 # Configurar logging para depuración
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+INTERVALO_GOBERNADOR = 30  # Segundos entre comprobaciones de inactividad y memoria
+
+def _memoria_proceso_mb():
+    """RSS del proceso en MB, o None si psutil no está disponible"""
+    if psutil is None:
+        return None
+    return psutil.Process().memory_info().rss / 1024 / 1024
+
 class Transcriptor:
-    def __init__(self, config):
+    def __init__(self, config, en_segundo_plano=False):
         self.config = config
         self.model = None
-        self._cargar_modelo()
+        # Modelo principal en memoria; tras cambiar config.json puede diferir de la configuración
+        # mientras el nuevo se carga
+        self.nombre_modelo = config.get('whisper_model', 'base')
+        self.cuantizacion = config.get('whisper_quantization', 'none')
+        # El modelo no es seguro entre hilos: streaming y transcripción final lo comparten
+        self._lock_modelo = threading.Lock()
+        self._lock_carga = threading.Lock()
+        self._modelo_listo = threading.Event()
+        self._error_carga = None
+        self._ultimo_uso = time.monotonic()
+        self.recargas = 0
+        
+        # Modelos adicionales de la cascada (el principal sigue en self.model)
+        self.politica = PoliticaCascada(config)
+        self._modelos_extra = {}
+        self.ultimos_metadatos = {}
+        self.ultimos_segmentos = []  # Segmentos del último transcribir_audio, para SRT/VTT/JSON
+        
+        # Salida del codificador por ventana: los reintentos de decodificación no la recalculan
+        self.codificador = None
+        opciones_codificador = config.get('reutilizacion_codificador', {})
+        if opciones_codificador.get('activado'):
+            self.codificador = CacheCodificador(opciones_codificador.get('max_ventanas', 16))
+        
+        # Recorte de silencios antes de la inferencia (solo audio en memoria)
+        self.opciones_vad = config.get('vad', {})
         
-    def _cargar_modelo(self):
+        # Grabaciones largas: fragmentos en paralelo en un pool de procesos con su propio modelo
+        self.paralelo = None
+        if config.get('transcripcion_paralela', {}).get('activado'):
+            self.paralelo = TranscriptorParalelo(config)
+        
+        if en_segundo_plano:
+            # Whisper y torch se importan y cargan sin bloquear el arranque
+            self._cargar_en_segundo_plano()
+        else:
+            self._cargar_modelo()
+            
+        # Descarga del modelo por inactividad o por falta de memoria del sistema
+        opciones_memoria = config.get('gestion_memoria', {})
+        self.minutos_inactividad = opciones_memoria.get('descargar_tras_minutos', 0)
+        self.umbral_memoria_mb = opciones_memoria.get('umbral_memoria_libre_mb', 0)
+        self._detener_gobernador = threading.Event()
+        if self.minutos_inactividad > 0 or self.umbral_memoria_mb > 0:
+            threading.Thread(target=self._gobernador, name="gobernador-memoria", daemon=True).start()
+        
+        # Caché de resultados por contenido del audio
+        self.cache = None
+        opciones_cache = config.get('cache_transcripciones', {})
+        if opciones_cache.get('activado'):
+            self.cache = CacheTranscripciones(
+                opciones_cache.get('directorio', './grabaciones/cache/'),
+                opciones_cache.get('max_mb', 200)
+            )
+        
+    def _cargar_modelo(self, relanzar=True):
         """Carga el modelo Whisper una sola vez"""
         try:
+            inicio = time.perf_counter()
             modelo_nombre = self.config.get('whisper_model', 'base')
-            print(f"🔄 Cargando modelo Whisper '{modelo_nombre}' en CPU...")
-            self.model = whisper.load_model(modelo_nombre, device="cpu")
-            print("✅ Modelo cargado correctamente")
+            cuantizacion = self.config.get('whisper_quantization', 'none')
+            print(f"🔄 Cargando modelo Whisper '{modelo_nombre}' en CPU ({cuantizacion})...")
+            # Importación diferida de whisper: arrastra torch (varios segundos)
+            aplicar_ajustes_cpu(self.config.get('rendimiento_cpu', {}))
+            self.model = cargar_modelo_whisper(modelo_nombre, cuantizacion)
+            self.nombre_modelo, self.cuantizacion = modelo_nombre, cuantizacion
+            self._ultimo_uso = time.monotonic()
+            print(f"✅ Modelo cargado correctamente ({time.perf_counter() - inicio:.1f}s)")
+            memoria = _memoria_proceso_mb()
+            if memoria is not None:
+                logger.info(f"Modelo residente; RSS del proceso: {memoria:.0f} MB")
         except Exception as e:
             logger.error(f"Error al cargar modelo: {e}")
-            raise
+            self._error_carga = e
+            if relanzar:
+                raise
+        finally:
+            self._modelo_listo.set()
             
-    def transcribir_audio(self, filename):
-        """Transcribe el archivo de audio"""
-        print("📝 Transcribiendo...")
+    def _cargar_en_segundo_plano(self):
+        """Lanza la carga del modelo en un hilo aparte"""
+        self._modelo_listo.clear()
+        self._error_carga = None
+        threading.Thread(
+            target=self._cargar_modelo, args=(False,), name="carga-modelo", daemon=True
+        ).start()
         
-        # Validar que el archivo existe
-        if not os.path.exists(filename):
-            logger.error(f"Archivo no encontrado: {filename}")
-            return ""
+    def precalentar(self):
+        """Recarga el modelo en segundo plano si se descargó (p. ej. al empezar a grabar)"""
+        with self._lock_carga:
+            if self.model is not None or not self._modelo_listo.is_set():
+                return  # Ya está en memoria o cargándose
+            self.recargas += 1
+            logger.info(f"Recargando modelo (recarga nº {self.recargas})")
+            self._cargar_en_segundo_plano()
             
-        # Validar tamaño del archivo
-        file_size = os.path.getsize(filename)
-        if file_size == 0:
-            logger.error("Archivo de audio vacío")
-            return ""
+    def recargar_modelo(self):
+        """Carga en segundo plano el modelo de la configuración actual y lo sustituye al terminar
+
+        El modelo anterior sigue atendiendo trabajos mientras tanto. Si estaba descargado por
+        inactividad no se carga nada: la próxima carga ya usa la configuración nueva.
+        """
+        def recargar():
+            self._modelo_listo.wait()  # Deja terminar una carga que ya estuviera en curso
+            if self.model is None:
+                return
+            modelo_nombre = self.config.get('whisper_model', 'base')
+            cuantizacion = self.config.get('whisper_quantization', 'none')
+            try:
+                inicio = time.perf_counter()
+                print(f"🔄 Cargando modelo Whisper '{modelo_nombre}' ({cuantizacion}) en segundo plano...")
+                aplicar_ajustes_cpu(self.config.get('rendimiento_cpu', {}))
+                nuevo = cargar_modelo_whisper(modelo_nombre, cuantizacion)
+            except Exception as e:
+                logger.error(f"Error al recargar el modelo; se mantiene '{self.nombre_modelo}': {e}")
+                return
+            with self._lock_modelo:
+                self.model = nuevo
+                self.nombre_modelo, self.cuantizacion = modelo_nombre, cuantizacion
+                self._modelos_extra.clear()
+                if self.paralelo:
+                    # Los procesos del pool tienen cargado el modelo anterior
+                    self.paralelo.cerrar()
+                    self.paralelo = TranscriptorParalelo(self.config)
+                self._ultimo_uso = time.monotonic()
+            gc.collect()
+            print(f"✅ Modelo '{modelo_nombre}' en uso ({time.perf_counter() - inicio:.1f}s)")
             
-        logger.info(f"Tamaño del archivo: {file_size} bytes")
+        threading.Thread(target=recargar, name="recarga-modelo", daemon=True).start()
+        
+    def descargar_modelo(self, motivo):
+        """Quita el modelo de memoria si no se está usando; se recarga al volver a necesitarlo"""
+        with self._lock_carga:
+            if not self._lock_modelo.acquire(blocking=False):
+                return False  # Transcripción en curso
+            try:
+                if self.model is None or not self._modelo_listo.is_set():
+                    return False
+                memoria_antes = _memoria_proceso_mb()
+                self.model = None
+                self._modelos_extra.clear()
+                if self.paralelo:
+                    self.paralelo.cerrar()
+                gc.collect()
+                # Solo si torch ya está importado: no se importa solo para liberar memoria
+                torch = sys.modules.get('torch')
+                if torch is not None and torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+            finally:
+                self._lock_modelo.release()
+                
+        memoria_despues = _memoria_proceso_mb()
+        if memoria_antes is not None:
+            logger.info(
+                f"Modelo descargado ({motivo}); RSS {memoria_antes:.0f} MB → {memoria_despues:.0f} MB"
+            )
+        else:
+            logger.info(f"Modelo descargado ({motivo})")
+        return True
+        
+    def _gobernador(self):
+        """Descarga el modelo tras un periodo de inactividad o si la memoria libre es escasa"""
+        while not self._detener_gobernador.wait(INTERVALO_GOBERNADOR):
+            inactivo = (time.monotonic() - self._ultimo_uso) / 60
+            if self.minutos_inactividad > 0 and inactivo >= self.minutos_inactividad:
+                self.descargar_modelo(f"{inactivo:.0f} min sin uso")
+            elif self.umbral_memoria_mb > 0 and psutil is not None:
+                libre = psutil.virtual_memory().available / 1024 / 1024
+                if libre < self.umbral_memoria_mb:
+                    self.descargar_modelo(f"memoria libre {libre:.0f} MB")
+                    
+    def esperar_modelo(self):
+        """Bloquea hasta que el modelo esté cargado; las grabaciones tempranas esperan aquí"""
+        if self.model is None and self._modelo_listo.is_set() and self._error_carga is None:
+            # Descargado por inactividad: se recarga bajo demanda
+            self.precalentar()
+        if not self._modelo_listo.is_set():
+            logger.info("Esperando a que termine la carga del modelo...")
+            self._modelo_listo.wait()
+        if self.model is None:
+            raise RuntimeError(f"El modelo no está disponible: {self._error_carga}")
+            
+    def elegir_modelo(self, audio):
+        """Modelo para este trabajo: por cascada si está activada, si no el configurado"""
+        if self.politica.activado:
+            return self.politica.elegir(duracion_audio(audio))
+        return self.nombre_modelo
+        
+    def transcribir_audio(self, audio, modelo=None, perfil=None):
+        """Transcribe una ruta de archivo o un array float32 a 16 kHz
+
+        perfil es un perfil de decodificacion.perfiles (por defecto, decodificacion.perfil).
+        """
+        print("📝 Transcribiendo...")
+        self.ultimos_segmentos = []
+        modelo = modelo or self.elegir_modelo(audio)
         
+        if isinstance(audio, str):
+            # Validar que el archivo existe
+            if not os.path.exists(audio):
+                logger.error(f"Archivo no encontrado: {audio}")
+                return ""
+                
+            # Validar tamaño del archivo
+            file_size = os.path.getsize(audio)
+            if file_size == 0:
+                logger.error("Archivo de audio vacío")
+                return ""
+                
+            logger.info(f"Tamaño del archivo: {file_size} bytes")
+        else:
+            # Audio en memoria: Whisper lo usa tal cual, sin ffmpeg
+            if len(audio) == 0:
+                logger.error("Audio vacío")
+                return ""
+                
+            logger.info(f"Duración del audio: {len(audio) / 16000:.1f}s")
+        
+        perfil = resolver_perfil(self.config, perfil)
+        parametros = parametros_decodificacion(self.config, perfil)
         try:
             # Transcripción optimizada usando el modelo cargado previamente
-            result = self.model.transcribe(
-                filename, 
-                language="es", 
-                fp16=False, 
-                temperature=0.0
-            )
+            result = self._transcribir(audio, modelo, **parametros)
+            self.ultimos_metadatos['perfil'] = perfil
             
             texto = result['text'].strip()
+            self.ultimos_segmentos = result.get('segments', [])
             
             # Log de segmentos para depuración si está vacío
             if not texto:
@@ -68,21 +282,158 @@ class Transcriptor:
             # Intentar recuperación con diferentes parámetros
             try:
                 logger.info("Intentando transcripción con parámetros alternativos...")
-                result = self.model.transcribe(
-                    filename,
-                    language="es",
-                    fp16=False,
-                    temperature=0.5,  # Mayor temperatura para más diversidad
-                    suppress_tokens=""  # No suprimir tokens
+                inicio = time.perf_counter()
+                result = self._transcribir(
+                    audio,
+                    modelo,
+                    **{
+                        **parametros,
+                        'temperature': 0.5,  # Mayor temperatura para más diversidad
+                        'suppress_tokens': ""  # No suprimir tokens
+                    }
                 )
                 texto = result['text'].strip()
-                logger.info("Transcripción alternativa exitosa")
+                self.ultimos_segmentos = result.get('segments', [])
+                self.ultimos_metadatos['perfil'] = perfil
+                # Coste del reintento aparte del intento fallido
+                self.ultimos_metadatos['reintento_segundos'] = round(time.perf_counter() - inicio, 2)
+                logger.info(
+                    f"Transcripción alternativa exitosa en {self.ultimos_metadatos['reintento_segundos']:.1f}s"
+                )
                 return texto
             except Exception as e2:
                 logger.error(f"Fallo en transcripción alternativa: {e2}")
                 return ""
+        finally:
+            self._vaciar_codificador()
+                
+    def transcribir_resultado(self, audio):
+        """Transcribe un array float32 a 16 kHz y devuelve el resultado completo (texto y segmentos)"""
+        try:
+            return self._transcribir(audio, None, **parametros_decodificacion(self.config))
+        except Exception as e:
+            logger.error(f"Error al transcribir audio en memoria: {e}")
+            return None
+        finally:
+            self._vaciar_codificador()
+            
+    def _vaciar_codificador(self):
+        """Las salidas del codificador solo sirven dentro del trabajo que las calculó"""
+        if self.codificador:
+            with self._lock_modelo:
+                self.codificador.vaciar()
+            
+    def _transcribir(self, audio, modelo, **parametros):
+        """Ejecuta model.transcribe consultando antes la caché de resultados"""
+        modelo_principal = self.nombre_modelo
+        modelo_nombre = modelo or modelo_principal
+        duracion = duracion_audio(audio)
+        self.ultimos_metadatos = {'modelo': modelo_nombre, 'duracion_audio': round(duracion, 2)}
+        
+        mapa = None
+        if self.opciones_vad.get('activado') and not isinstance(audio, str):
+            inicio = time.perf_counter()
+            audio, mapa, eliminados = recortar_silencios(audio, self.opciones_vad)
+            self.ultimos_metadatos['vad_segundos'] = round(time.perf_counter() - inicio, 4)
+            self.ultimos_metadatos['vad_segundos_eliminados'] = round(eliminados, 2)
+            duracion = duracion_audio(audio)
+        
+        clave = None
+        if self.cache:
+            inicio = time.perf_counter()
+            # Los pesos int8 dan resultados distintos: no comparten entrada con fp32
+            cuantizacion = self.cuantizacion
+            variante = modelo_nombre if cuantizacion == 'none' else f"{modelo_nombre}:{cuantizacion}"
+            clave = self.cache.calcular_clave(audio, variante, parametros)
+            resultado = self.cache.obtener(clave)
+            estadisticas = self.cache.estadisticas()
+            if resultado is not None:
+                logger.info(
+                    f"Caché: acierto en {(time.perf_counter() - inicio) * 1000:.1f} ms "
+                    f"({estadisticas['aciertos']} aciertos, {estadisticas['fallos']} fallos)"
+                )
+                self.ultimos_metadatos['cache'] = True
+                return mapa.remapear(resultado) if mapa else resultado
+            logger.info(
+                f"Caché: fallo ({estadisticas['aciertos']} aciertos, {estadisticas['fallos']} fallos)"
+            )
+            
+        # Solo la inferencia: sin la espera a la carga del modelo ni al lock
+        segundos = 0.0
+        resultado = None
+        if self.paralelo and self.paralelo.aplicable(duracion):
+            with self._lock_modelo:
+                inicio = time.perf_counter()
+                resultado = self.paralelo.transcribir(audio, modelo_nombre, parametros)
+                segundos = time.perf_counter() - inicio
+                self._ultimo_uso = time.monotonic()
+        while resultado is None:
+            if modelo_nombre == modelo_principal:
+                self.esperar_modelo()
+            with self._lock_modelo:
+                if modelo_nombre != modelo_principal:
+                    modelo_whisper = self._modelo_extra(modelo_nombre)
+                else:
+                    # El gobernador puede haberlo descargado entre la espera y el lock
+                    modelo_whisper = self.model
+                if modelo_whisper is not None:
+                    inicio = time.perf_counter()
+                    resultado = self._ejecutar_modelo(modelo_whisper, audio, parametros)
+                    segundos = time.perf_counter() - inicio
+                self._ultimo_uso = time.monotonic()
                 
+        self.politica.registrar(modelo_nombre, duracion, segundos)
+        self.ultimos_metadatos.update({
+            'segundos': round(segundos, 2),
+            'rtf': round(segundos / duracion, 3) if duracion else None
+        })
+        logger.info(
+            f"Trabajo con '{modelo_nombre}': {duracion:.1f}s de audio en {segundos:.1f}s"
+        )
+            
+        if clave:
+            self.cache.guardar(clave, resultado)
+        # Tiempos de los segmentos referidos al audio original, no al recortado
+        return mapa.remapear(resultado) if mapa else resultado
+            
+    def _ejecutar_modelo(self, modelo, audio, parametros):
+        """model.transcribe; con la caché del codificador, los reintentos solo repiten el decodificador"""
+        if not self.codificador:
+            return modelo.transcribe(audio, **parametros)
+        self.codificador.reiniciar_estadisticas()
+        try:
+            with self.codificador.envolver(modelo):
+                return modelo.transcribe(audio, **parametros)
+        finally:
+            # También si falla: el reintento de transcribir_audio sabrá cuánto se tiró
+            resumen = self.codificador.resumen()
+            self.ultimos_metadatos.update(resumen)
+            logger.info(
+                f"Codificador: {resumen['ventanas_codificadas']} ventanas en "
+                f"{resumen['codificador_segundos']:.2f}s ({resumen['ventanas_reutilizadas']} reutilizadas); "
+                f"decodificador: {resumen['decodificador_segundos']:.2f}s, de ellos "
+                f"{resumen['reintentos_decodificacion']} reintentos en {resumen['reintentos_segundos']:.2f}s"
+            )
+            
+    def _modelo_extra(self, nombre):
+        """Devuelve un modelo de la cascada distinto del principal, cargándolo si hace falta"""
+        if nombre not in self._modelos_extra:
+            if not self.politica.mantener_cargados:
+                # Modo intercambio: solo un modelo adicional en memoria a la vez
+                self._modelos_extra.clear()
+                gc.collect()
+            inicio = time.perf_counter()
+            self._modelos_extra[nombre] = cargar_modelo_whisper(
+                nombre, self.cuantizacion
+            )
+            logger.info(f"Modelo de cascada '{nombre}' cargado en {time.perf_counter() - inicio:.1f}s")
+        return self._modelos_extra[nombre]
+        
     def liberar_modelo(self):
         """Libera el modelo de la memoria"""
+        self._detener_gobernador.set()
         self.model = None
+        self._modelos_extra.clear()
+        if self.paralelo:
+            self.paralelo.cerrar()
         print("🗑️ Modelo liberado de la memoria.")
\ No newline at end of file
@@ -3,43 +3,224 @@ Utilidades - Fusión de clipboard.py, notifier.py y funciones de configuración
 """
 import json
 import os
+import time
 from pathlib import Path
 from datetime import datetime
 import pyperclip
 from plyer import notification
 
-def cargar_configuracion():
-    """Carga la configuración desde config.json"""
-    config_path = Path("config.json")
-    
-    # Configuración por defecto
-    config_default = {
+RUTA_CONFIGURACION = Path("config.json")
+
+def configuracion_por_defecto():
+    """Valores por defecto (un diccionario nuevo en cada llamada)"""
+    return {
         "atajos": {
             "grabar": "alt+shift+x",
-            "cerrar": "f8"
+            "cerrar": "f8",
+            "cancelar": "",
+            "antirrebote_ms": 250
         },
         "whisper_model": "base",
+        "whisper_quantization": "none",
+        "frecuencia_muestreo": 44100,
+        "entrada_audio": {
+            "siempre_abierta": False,
+            "preroll_ms": 500
+        },
         "directorio_salida": "./grabaciones/",
         "notificar_cada_minutos": 5,
         "formatos_salida": {
             "clipboard": True,
             "txt_file": True,
             "json_with_metadata": False,
-            "srt_subtitles": False
+            "srt_subtitles": False,
+            "vtt_subtitles": False
+        },
+        "salidas": {
+            "agrupar_notificaciones_segundos": 2
+        },
+        "vad": {
+            "activado": True,
+            "margen_db": 12,
+            "relleno_ms": 300,
+            "silencio_minimo_ms": 1000
+        },
+        "cascada_modelos": {
+            "activado": False,
+            "modelos": ["tiny", "base", "small"],
+            "latencia_objetivo_segundos": 5,
+            "mantener_cargados": True,
+            "borrador_rapido": False,
+            "modelo_borrador": "tiny"
+        },
+        "gestion_memoria": {
+            "descargar_tras_minutos": 30,
+            "umbral_memoria_libre_mb": 0
+        },
+        "rendimiento_cpu": {
+            "hilos_intra": 0,
+            "hilos_inter": 0,
+            "afinidad_cpu": []
+        },
+        "cache_transcripciones": {
+            "activado": True,
+            "directorio": "./grabaciones/cache/",
+            "max_mb": 200
+        },
+        "transcripcion_paralela": {
+            "activado": False,
+            "umbral_segundos": 300,
+            "fragmento_segundos": 60,
+            "solape_segundos": 2,
+            "procesos": 0,
+            "hilos_por_proceso": 2
+        },
+        "archivado": {
+            "activado": False,
+            "formato": "flac",
+            "bitrate_opus": "32k",
+            "conservar_dias": 0,
+            "max_gb": 0
+        },
+        "catalogo": {
+            "activado": True,
+            "ruta": "./grabaciones/catalogo.db"
+        },
+        "metricas": {
+            "activado": False,
+            "archivo_jsonl": "./grabaciones/metricas.jsonl",
+            "archivo_prometheus": ""
+        },
+        "recarga_configuracion": {
+            "activado": True,
+            "intervalo_segundos": 1
+        },
+        "demonio": {
+            "usar_demonio": False,
+            "host": "127.0.0.1",
+            "puerto": 8765,
+            "socket_unix": "",
+            "permisos_socket": "660",
+            "max_cola": 8,
+            "max_mb": 100,
+            "timeout_segundos": 300,
+            "reintentos_cola_llena": 3,
+            "rutas_permitidas": ["./grabaciones"]
+        },
+        "transcripcion_streaming": {
+            "activado": False,
+            "ventana_segundos": 15,
+            "margen_segundos": 3
         },
         "interfaz": {
             "mostrar_indicador": True,
             "posicion_x": 100,
             "posicion_y": 100
+        },
+        "parametros_whisper": {
+            "language": "es",
+            "task": "transcribe",
+            "temperature": 0.0,
+            "condition_on_previous_text": True,
+            "no_speech_threshold": 0.6,
+            "logprob_threshold": -1.0,
+            "compression_ratio_threshold": 2.4,
+            "fp16": False
+        },
+        "decodificacion": {
+            "perfil": "rapido_voraz",
+            "perfiles": {
+                "rapido_voraz": {
+                    "descripcion": "Búsqueda voraz a temperatura 0, sin reintentos",
+                    "temperature": 0.0
+                },
+                "equilibrado": {
+                    "descripcion": "Voraz con reintentos a más temperatura si el texto sale repetitivo o dudoso",
+                    "temperature": [0.0, 0.2, 0.4, 0.6],
+                    "best_of": 3
+                },
+                "preciso_haz": {
+                    "descripcion": "Búsqueda en haz de 5 con todos los reintentos de temperatura",
+                    "temperature": [0.0, 0.2, 0.4, 0.6, 0.8, 1.0],
+                    "beam_size": 5,
+                    "best_of": 5
+                }
+            }
+        },
+        "reutilizacion_codificador": {
+            "activado": True,
+            "max_ventanas": 16
         }
     }
+
+def fusionar_configuracion(base, cambios):
+    """Fusión profunda: las secciones anidadas conservan los valores de base que falten en cambios"""
+    resultado = dict(base)
+    for clave, valor in cambios.items():
+        if isinstance(valor, dict) and isinstance(resultado.get(clave), dict):
+            resultado[clave] = fusionar_configuracion(resultado[clave], valor)
+        else:
+            resultado[clave] = valor
+    return resultado
+
+# Secciones de contenido libre: solo se comprueba que sean objetos
+CLAVES_LIBRES = ("parametros_whisper", "perfiles")
+
+def _tipo_valido(valor, referencia):
+    """Mismo tipo que el valor por defecto (int y float son intercambiables, bool no)"""
+    if isinstance(referencia, bool) or isinstance(valor, bool):
+        return isinstance(valor, bool) and isinstance(referencia, bool)
+    if isinstance(referencia, (int, float)):
+        return isinstance(valor, (int, float))
+    return isinstance(valor, type(referencia))
+
+def validar_configuracion(config, referencia=None, prefijo=""):
+    """Lista de errores de tipo respecto a los valores por defecto (vacía si es válida)
+
+    Solo se comprueban las claves conocidas: las adicionales (p. ej. rtf_estimado) se aceptan.
+    """
+    referencia = configuracion_por_defecto() if referencia is None else referencia
+    errores = []
+    for clave, defecto in referencia.items():
+        if clave not in config:
+            continue
+        valor = config[clave]
+        if not _tipo_valido(valor, defecto):
+            errores.append(
+                f"{prefijo}{clave}: se esperaba {type(defecto).__name__}, no {type(valor).__name__}"
+            )
+        elif isinstance(defecto, dict) and clave not in CLAVES_LIBRES:
+            errores.extend(validar_configuracion(valor, defecto, f"{prefijo}{clave}."))
+    if not prefijo:
+        for atajo in ("grabar", "cerrar"):
+            if not config.get("atajos", {}).get(atajo, True):
+                errores.append(f"atajos.{atajo}: no puede estar vacío")
+        if "modelos" in config.get("cascada_modelos", {}) and not config["cascada_modelos"]["modelos"]:
+            errores.append("cascada_modelos.modelos: no puede estar vacío")
+        relleno = config.get("vad", {}).get("relleno_ms", 0)
+        if isinstance(relleno, (int, float)) and relleno < 0:
+            errores.append("vad.relleno_ms: no puede ser negativo")
+    return errores
+
+def leer_configuracion(config_path=RUTA_CONFIGURACION):
+    """Lee config.json fusionado con los valores por defecto; lanza ValueError si no es válido"""
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    if not isinstance(config, dict):
+        raise ValueError("config.json debe contener un objeto JSON")
+    errores = validar_configuracion(config)
+    if errores:
+        raise ValueError("; ".join(errores))
+    return fusionar_configuracion(configuracion_por_defecto(), config)
+
+def cargar_configuracion():
+    """Carga la configuración desde config.json"""
+    config_path = RUTA_CONFIGURACION
+    config_default = configuracion_por_defecto()
     
     try:
         if config_path.exists():
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                # Fusionar con valores por defecto para campos faltantes
-                return {**config_default, **config}
+            return leer_configuracion(config_path)
         else:
             # Crear archivo de configuración con valores por defecto
             with open(config_path, 'w', encoding='utf-8') as f:
@@ -51,6 +232,25 @@ def cargar_configuracion():
         print(f"⚠️ Error al cargar configuración: {e}")
         return config_default
 
+class MedidorFases:
+    """Mide la duración de las fases de arranque de la aplicación"""
+    def __init__(self, inicio=None):
+        self.inicio = inicio if inicio is not None else time.perf_counter()
+        self._ultimo = self.inicio
+        self.fases = []
+        
+    def marcar(self, nombre):
+        """Cierra la fase actual con el nombre indicado"""
+        ahora = time.perf_counter()
+        self.fases.append((nombre, ahora - self._ultimo))
+        self._ultimo = ahora
+        
+    def informe(self):
+        """Muestra cuánto tardó cada fase y el total desde el inicio"""
+        detalle = ", ".join(f"{nombre} {segundos * 1000:.0f} ms" for nombre, segundos in self.fases)
+        total = (self._ultimo - self.inicio) * 1000
+        print(f"⏱️ Arranque en {total:.0f} ms ({detalle})")
+
 def copiar_al_portapapeles(texto):
     """Copia texto al portapapeles"""
     try:
@@ -74,8 +274,48 @@ def notificar(mensaje):
     except Exception as e:
         print(f"⚠️ Error al mostrar notificación: {e}")
 
-def guardar_transcripcion(texto, audio_file, config):
-    """Guarda la transcripción en archivo(s) según la configuración"""
+def _marca_tiempo(segundos, separador):
+    """HH:MM:SS,mmm (SRT) o HH:MM:SS.mmm (VTT)"""
+    milisegundos = int(round(segundos * 1000))
+    horas, milisegundos = divmod(milisegundos, 3600000)
+    minutos, milisegundos = divmod(milisegundos, 60000)
+    segundos, milisegundos = divmod(milisegundos, 1000)
+    return f"{horas:02d}:{minutos:02d}:{segundos:02d}{separador}{milisegundos:03d}"
+
+def _cues(texto, segmentos, duracion=None):
+    """(inicio, fin, texto) de cada subtítulo; sin segmentos, uno solo con todo el texto"""
+    cues = [(s['start'], s['end'], s['text'].strip()) for s in segmentos or [] if s['text'].strip()]
+    return cues or [(0.0, duracion or 10.0, texto)]
+
+def generar_srt(texto, segmentos, duracion=None):
+    """Subtítulos SRT con los tiempos de los segmentos de Whisper"""
+    return "\n".join(
+        f"{i}\n{_marca_tiempo(inicio, ',')} --> {_marca_tiempo(fin, ',')}\n{linea}\n"
+        for i, (inicio, fin, linea) in enumerate(_cues(texto, segmentos, duracion), 1)
+    )
+
+def generar_vtt(texto, segmentos, duracion=None):
+    """Subtítulos WebVTT con los tiempos de los segmentos de Whisper"""
+    return "WEBVTT\n\n" + "\n".join(
+        f"{_marca_tiempo(inicio, '.')} --> {_marca_tiempo(fin, '.')}\n{linea}\n"
+        for inicio, fin, linea in _cues(texto, segmentos, duracion)
+    )
+
+# Archivo que genera cada formato de formatos_salida (el portapapeles no deja archivo)
+EXTENSIONES_SALIDA = {
+    'txt_file': '.txt',
+    'json_with_metadata': '.json',
+    'srt_subtitles': '.srt',
+    'vtt_subtitles': '.vtt'
+}
+
+def extensiones_activadas(config):
+    """Extensiones de las salidas en archivo activadas en formatos_salida"""
+    return [ext for clave, ext in EXTENSIONES_SALIDA.items() if config['formatos_salida'].get(clave)]
+
+def guardar_transcripcion(texto, audio_file, config, metadatos=None, segmentos=None):
+    """Guarda la transcripción en archivo(s) según la configuración, a partir de una sola inferencia"""
+    metadatos = metadatos or {}
     try:
         # Obtener el nombre base del archivo
         audio_path = Path(audio_file)
@@ -100,6 +340,13 @@ def guardar_transcripcion(texto, audio_file, config):
                 "duracion_caracteres": len(texto),
                 "palabras": len(texto.split())
             }
+            # Modelo elegido y tiempos del trabajo, si se conocen
+            metadata.update(metadatos)
+            if segmentos:
+                metadata["segmentos"] = [
+                    {"inicio": round(s['start'], 2), "fin": round(s['end'], 2), "texto": s['text'].strip()}
+                    for s in segmentos
+                ]
             with open(json_path, 'w', encoding='utf-8') as f:
                 json.dump(metadata, f, indent=2, ensure_ascii=False)
             print(f"📊 Metadata guardada en: {json_path}")
@@ -107,12 +354,17 @@ def guardar_transcripcion(texto, audio_file, config):
         # Guardar como subtítulos SRT
         if config['formatos_salida']['srt_subtitles']:
             srt_path = directorio / f"{base_name}.srt"
-            # Crear un SRT simple con todo el texto
-            srt_content = f"1\n00:00:00,000 --> 00:00:10,000\n{texto}\n"
             with open(srt_path, 'w', encoding='utf-8') as f:
-                f.write(srt_content)
+                f.write(generar_srt(texto, segmentos, metadatos.get('duracion_audio')))
             print(f"🎬 Subtítulos guardados en: {srt_path}")
             
+        # Guardar como subtítulos WebVTT
+        if config['formatos_salida'].get('vtt_subtitles'):
+            vtt_path = directorio / f"{base_name}.vtt"
+            with open(vtt_path, 'w', encoding='utf-8') as f:
+                f.write(generar_vtt(texto, segmentos, metadatos.get('duracion_audio')))
+            print(f"🎬 Subtítulos guardados en: {vtt_path}")
+            
     except Exception as e:
         print(f"❌ Error al guardar transcripción: {e}")
         